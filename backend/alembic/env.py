@@ -1,5 +1,6 @@
 from logging.config import fileConfig
 import os
+import sys
 
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
@@ -10,13 +11,17 @@ from alembic import context
 # access to the values within the .ini file in use.
 config = context.config
 
-# Interpret the config file for Python logging.
-fileConfig(config.config_file_name)
+# Interpret the config file for Python logging, if it configures any
+# (alembic.ini has no logging sections)
+if config.config_file_name is not None and config.file_config.has_section('formatters'):
+    fileConfig(config.config_file_name)
 
 # add your model's MetaData object here for 'autogenerate' support
-# Import the app and db to get the metadata
-import backend.app as app_module
-target_metadata = app_module.db.metadata
+# Only the models are needed: importing them builds no app and opens no
+# connection. Backend modules import each other flat, so put backend/ on the path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models import db  # noqa: E402
+target_metadata = db.metadata
 
 # Allow overriding the sqlalchemy URL using the environment variable
 # This lets CI or local envs set SQLALCHEMY_DATABASE_URI without editing alembic.ini
@@ -34,6 +39,14 @@ def run_migrations_offline():
 
 
 def run_migrations_online():
+    # schema.upgrade passes the connection it holds its locks on
+    connection = config.attributes.get('connection')
+    if connection is not None:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
     connectable = engine_from_config(
         config.get_section(config.config_ini_section),
         prefix='sqlalchemy.',
@@ -0,0 +1,84 @@
+"""tables the app created with db.create_all() before migrations
+
+Revision ID: 0001b_baseline_tables
+Revises: 0001_initial
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0001b_baseline_tables'
+down_revision = '0001_initial'
+branch_labels = None
+depends_on = None
+
+CREATED = ('user', 'listing', 'sign_up', 'review')
+
+
+def upgrade():
+    # Until the app factory, the app ran db.create_all() at import and never
+    # stamped the database, so these tables may already exist. Create only
+    # what is missing, and add the listing columns migrate_db.py used to add
+    inspector = sa.inspect(op.get_bind())
+    existing = set(inspector.get_table_names())
+    if 'user' not in existing:
+        op.create_table(
+            'user',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('email', sa.String(length=120), nullable=False, unique=True),
+            sa.Column('password_hash', sa.String(length=256), nullable=False),
+            sa.Column('role', sa.String(length=50), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+        )
+    if 'listing' not in existing:
+        op.create_table(
+            'listing',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('title', sa.String(length=200), nullable=False),
+            sa.Column('description', sa.Text(), nullable=True),
+            sa.Column('location', sa.String(length=200), nullable=True),
+            sa.Column('latitude', sa.Float(), nullable=True),
+            sa.Column('longitude', sa.Float(), nullable=True),
+            sa.Column('category', sa.String(length=100), nullable=True),
+            sa.Column('image_url', sa.String(length=500), nullable=True),
+            sa.Column('owner_id', sa.Integer(), sa.ForeignKey('user.id'), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+        )
+    else:
+        columns = {c['name'] for c in inspector.get_columns('listing')}
+        missing = [c for c in (sa.Column('category', sa.String(length=100), nullable=True),
+                               sa.Column('image_url', sa.String(length=500), nullable=True))
+                   if c.name not in columns]
+        if missing:
+            with op.batch_alter_table('listing') as batch_op:
+                for column in missing:
+                    batch_op.add_column(column)
+    if 'sign_up' not in existing:
+        op.create_table(
+            'sign_up',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), nullable=False),
+            sa.Column('listing_id', sa.Integer(), sa.ForeignKey('listing.id'), nullable=False),
+            sa.Column('status', sa.String(length=50), nullable=True),
+            sa.Column('message', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.UniqueConstraint('user_id', 'listing_id', name='_user_listing_uc'),
+        )
+    if 'review' not in existing:
+        op.create_table(
+            'review',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), nullable=False),
+            sa.Column('listing_id', sa.Integer(), sa.ForeignKey('listing.id'), nullable=False),
+            sa.Column('rating', sa.Integer(), nullable=False),
+            sa.Column('comment', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.UniqueConstraint('user_id', 'listing_id', name='_user_listing_review_uc'),
+        )
+
+
+def downgrade():
+    for table in reversed(CREATED):
+        op.drop_table(table)
@@ -0,0 +1,52 @@
+"""event table for locally ingested upstream events
+
+Revision ID: 0002_event_table
+Revises: 0001b_baseline_tables
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0002_event_table'
+down_revision = '0001b_baseline_tables'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'event',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('source', sa.String(length=50), nullable=False),
+        sa.Column('external_id', sa.String(length=100), nullable=False),
+        sa.Column('name', sa.String(length=300), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('url', sa.String(length=500), nullable=True),
+        sa.Column('venue', sa.String(length=200), nullable=True),
+        sa.Column('venue_address', sa.String(length=300), nullable=True),
+        sa.Column('city', sa.String(length=100), nullable=True),
+        sa.Column('state', sa.String(length=20), nullable=True),
+        sa.Column('category', sa.String(length=100), nullable=True),
+        sa.Column('start_local', sa.String(length=32), nullable=True),
+        sa.Column('start_time', sa.String(length=16), nullable=True),
+        sa.Column('start_at', sa.DateTime(), nullable=True),
+        sa.Column('image_url', sa.String(length=500), nullable=True),
+        sa.Column('latitude', sa.Float(), nullable=True),
+        sa.Column('longitude', sa.Float(), nullable=True),
+        sa.Column('fetched_at', sa.DateTime(), nullable=True),
+        sa.UniqueConstraint('source', 'external_id', name='_event_source_external_uc'),
+    )
+    op.create_index('ix_event_source', 'event', ['source'])
+    op.create_index('ix_event_city', 'event', ['city'])
+    op.create_index('ix_event_start_at', 'event', ['start_at'])
+    op.create_index('ix_event_city_start_at', 'event', ['city', 'start_at'])
+
+
+def downgrade():
+    op.drop_index('ix_event_city_start_at', table_name='event')
+    op.drop_index('ix_event_start_at', table_name='event')
+    op.drop_index('ix_event_city', table_name='event')
+    op.drop_index('ix_event_source', table_name='event')
+    op.drop_table('event')
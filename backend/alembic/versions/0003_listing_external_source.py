@@ -0,0 +1,45 @@
+"""listing source/external_id with unique index; content hashes
+
+Revision ID: 0003_listing_external_source
+Revises: 0002_event_table
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0003_listing_external_source'
+down_revision = '0002_event_table'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # migrate_db.py briefly added the listing columns and index outside
+    # alembic; add only what is missing
+    inspector = sa.inspect(op.get_bind())
+    columns = {c['name'] for c in inspector.get_columns('listing')}
+    missing = [c for c in (sa.Column('source', sa.String(length=50), nullable=True),
+                           sa.Column('external_id', sa.String(length=100), nullable=True),
+                           sa.Column('content_hash', sa.String(length=64), nullable=True))
+               if c.name not in columns]
+    if missing:
+        with op.batch_alter_table('listing') as batch_op:
+            for column in missing:
+                batch_op.add_column(column)
+    if 'ix_listing_source_external_id' not in {i['name'] for i in inspector.get_indexes('listing')}:
+        op.create_index('ix_listing_source_external_id', 'listing', ['source', 'external_id'], unique=True)
+    if 'content_hash' not in {c['name'] for c in inspector.get_columns('event')}:
+        with op.batch_alter_table('event') as batch_op:
+            batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('event') as batch_op:
+        batch_op.drop_column('content_hash')
+    op.drop_index('ix_listing_source_external_id', table_name='listing')
+    with op.batch_alter_table('listing') as batch_op:
+        batch_op.drop_column('content_hash')
+        batch_op.drop_column('external_id')
+        batch_op.drop_column('source')
@@ -0,0 +1,22 @@
+"""event (city, source, start_at) index for merged feed pagination
+
+Revision ID: 0004_event_feed_index
+Revises: 0003_listing_external_source
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0004_event_feed_index'
+down_revision = '0003_listing_external_source'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_event_city_source_start_at', 'event', ['city', 'source', 'start_at'])
+
+
+def downgrade():
+    op.drop_index('ix_event_city_source_start_at', table_name='event')
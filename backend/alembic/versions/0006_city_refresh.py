@@ -0,0 +1,32 @@
+"""city_refresh table tracking per-city background refreshes
+
+Revision ID: 0006_city_refresh
+Revises: 0005_job_table
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0006_city_refresh'
+down_revision = '0005_job_table'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'city_refresh',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=50), nullable=False),
+        sa.Column('city', sa.String(length=100), nullable=False),
+        sa.Column('state', sa.String(length=20), nullable=False),
+        sa.Column('refreshed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('kind', 'city', 'state', name='_city_refresh_uc'),
+    )
+
+
+def downgrade():
+    op.drop_table('city_refresh')
@@ -1,69 +1,92 @@
 ALLOWED_CATEGORIES = ['Community', 'Environment', 'Education', 'Health', 'Animals', 'Nightlife']
-import requests
+from providers import (
+    ProviderUnavailable, provider_get, provider_status, normalize_ticketmaster,
+    TICKETMASTER_URL, SEATGEEK_URL, SERPAPI_URL,
+)
+from circuit_breaker import breaker_states
+from ingest import IngestionScheduler, collect_events, configured_providers, ingest_categories, ingest_cities
+from upsert import content_hash, existing_hashes, upsert_by_external_id
+from dedup import dedupe_events
+from feed import InvalidCursor, as_utc, decode_cursor, encode_cursor, merge_page
+from jobs import JobQueue
+from llm import cached_generate, generate_descriptions, is_json, parse_json
+from llm_cache import get_llm_cache
 # Eventbrite Houston endpoint moved below after app initialization to ensure
 # Flask `app`, `request` and `jsonify` are available when the route is defined.
-from flask import Flask, request, jsonify, url_for
-from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_jwt_extended import JWTManager, jwt_required, get_jwt_identity
+from flask import Blueprint, Flask, Response, current_app, request, jsonify, send_file, url_for
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import configure_mappers
+from passwords import hash_password, needs_rehash, verify_password
+from user_cache import UserCache
+from revocation import RevocationList
+from auth_limits import check_auth_limits
+from mailer import mailer, smtp_configured
+from sqlite_profile import engine_options as sqlite_engine_options, is_sqlite_url
+from replicas import router as replica_router, stick_user, use_primary
+from query_stats import query_stats
+import schema
+import metrics
+from profiling import profiler as request_profiler
+from memory_diagnostics import GROUPINGS, TracingOff, memory_diagnostics
+from models import db, CityRefresh, Event, Item, Job, Listing, Review, RevokedToken, SignUp, User
+from flask_jwt_extended import JWTManager, jwt_required, get_jwt, get_jwt_identity, decode_token
 from auth import token_for
 from flask_cors import CORS
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from functools import partial, wraps
 import os
+import threading
+import weakref
 from itsdangerous import URLSafeTimedSerializer, SignatureExpired, BadSignature
-import smtplib
 from email.message import EmailMessage
 
 
-app = Flask(__name__)
 base_dir = os.path.abspath(os.path.dirname(__file__))
-# Load .env from repository root in development if python-dotenv is installed
-try:
-    from dotenv import load_dotenv
-
-    repo_root = os.path.abspath(os.path.join(base_dir, '..'))
-    load_dotenv(os.path.join(repo_root, '.env'))
-except Exception:
-    # python-dotenv not installed or .env missing; proceed with environment variables
-    pass
-
-# Allow overriding the database URL via environment (useful for CI or production)
-default_db = 'sqlite:///' + os.path.join(base_dir, 'data.db')
-app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('SQLALCHEMY_DATABASE_URI', default_db)
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-# Supabase connection pooling configuration for transaction mode (port 6543)
-# Configure SQLAlchemy engine options; adapt connect_args by driver
-db_url = app.config['SQLALCHEMY_DATABASE_URI']
-engine_options = {
-    'pool_pre_ping': True,
-    'pool_recycle': 300,
-    'pool_size': 5,
-    'max_overflow': 10,
-}
-
-# Use PostgreSQL-specific connect args only when using psycopg2
-if isinstance(db_url, str) and db_url.lower().startswith('postgresql'):
-    engine_options['connect_args'] = {
-        'connect_timeout': 10,
-        'options': '-c statement_timeout=30000',
-    }
-elif isinstance(db_url, str) and db_url.lower().startswith('sqlite'):
-    # SQLite does not accept the above options; leave empty or set sqlite-specific options
-    engine_options['connect_args'] = {}
 
-app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
-# Secret key used for serializer tokens and other Flask features
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key')
-app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', app.config['SECRET_KEY'])
-app.config['SECURITY_PASSWORD_SALT'] = os.environ.get('SECURITY_PASSWORD_SALT', 'dev-salt')
+# Routes and CLI commands; registered on an app by create_app()
+bp = Blueprint('api', __name__, cli_group=None)
+jwt = JWTManager()
+
+
+def load_env():
+    """Load .env from the repository root in development if python-dotenv is installed."""
+    try:
+        from dotenv import load_dotenv
+
+        repo_root = os.path.abspath(os.path.join(base_dir, '..'))
+        load_dotenv(os.path.join(repo_root, '.env'))
+    except Exception:
+        # python-dotenv not installed or .env missing; proceed with environment variables
+        pass
 
-CORS(app)
 
-db = SQLAlchemy(app)
-jwt = JWTManager(app)
+def database_engine_options(db_url):
+    """SQLAlchemy engine options for ``db_url``; adapt connect_args by driver."""
+    if is_sqlite_url(db_url):
+        # WAL, busy timeout and read pragmas are applied per connection by sqlite_profile
+        engine_options = sqlite_engine_options(db_url)
+    else:
+        # Supabase connection pooling configuration for transaction mode (port 6543)
+        engine_options = {
+            'pool_pre_ping': True,
+            'pool_recycle': 300,
+            'pool_size': 5,
+            'max_overflow': 10,
+        }
+        # Use PostgreSQL-specific connect args only when using psycopg2
+        if isinstance(db_url, str) and db_url.lower().startswith('postgresql'):
+            engine_options['connect_args'] = {
+                'connect_timeout': 10,
+                'options': '-c statement_timeout=30000',
+            }
+    if 'pool_size' in engine_options:
+        # Report checkout wait time and pool occupancy under /metrics
+        engine_options['poolclass'] = metrics.TimedQueuePool
+        engine_options['pool_logging_name'] = metrics.pool_label(db_url)
+    return engine_options
 
 
-def _warn_on_default_secrets():
+def _warn_on_default_secrets(app):
     """Log a warning if important secret env vars are left at their dev defaults.
 
     This is only advisory and will not stop the app from running. It's helpful
@@ -92,121 +115,185 @@ def _warn_on_default_secrets():
         )
 
 
-_warn_on_default_secrets()
-
-
-class User(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(256), nullable=False)
-    # simple role column for basic RBAC (default: "user")
-    role = db.Column(db.String(50), default='user')
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-    def to_dict(self):
-        return {"id": self.id, "email": self.email}
-
-
-class Listing(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(200), nullable=False)
-    description = db.Column(db.Text)
-    location = db.Column(db.String(200))
-    latitude = db.Column(db.Float, nullable=True)
-    longitude = db.Column(db.Float, nullable=True)
-    category = db.Column(db.String(100), nullable=True)  # See ALLOWED_CATEGORIES for valid values
-    image_url = db.Column(db.String(500), nullable=True)  # URL to listing image
-    owner_id = db.Column(db.Integer, db.ForeignKey('user.id'))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "title": self.title,
-            "description": self.description,
-            "location": self.location,
-            "latitude": self.latitude,
-            "longitude": self.longitude,
-            "category": self.category,
-            "image_url": self.image_url,
-            "owner_id": self.owner_id,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
-        }
+# /me and /refresh read users through this cache; any update or delete of a
+# User row in this process drops its entry
+user_cache = UserCache(ttl=float(os.environ.get('USER_CACHE_TTL', 60)))
 
 
-class Item(db.Model):
-    """Simple persistent items for the MVP /api/items endpoints."""
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(200), nullable=False)
-    description = db.Column(db.Text)
+def _collect_user_cache():
+    stats = user_cache.stats()
+    return metrics.hit_miss('user', stats['hits'], stats['misses'])
 
-    def to_dict(self):
-        return {"id": self.id, "name": self.name, "description": self.description}
 
+def _collect_llm_cache():
+    # the hit and miss counters live in the host-wide local store
+    llm_cache = get_llm_cache()
+    kinds = llm_cache.stats()['kinds'].values() if llm_cache else ()
+    return metrics.hit_miss('llm', sum(k['hits'] for k in kinds), sum(k['misses'] for k in kinds))
 
-class SignUp(db.Model):
-    """Track volunteer sign-ups for listings."""
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    listing_id = db.Column(db.Integer, db.ForeignKey('listing.id'), nullable=False)
-    status = db.Column(db.String(50), default='pending')  # pending, accepted, declined, cancelled
-    message = db.Column(db.Text)  # Optional message from volunteer
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    
-    # Add unique constraint to prevent duplicate sign-ups
-    __table_args__ = (db.UniqueConstraint('user_id', 'listing_id', name='_user_listing_uc'),)
-    
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "user_id": self.user_id,
-            "listing_id": self.listing_id,
-            "status": self.status,
-            "message": self.message,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
-        }
 
+metrics.registry.collector(_collect_user_cache)
+metrics.registry.collector(_collect_llm_cache, host=True)
 
-class Review(db.Model):
-    """User reviews for listings."""
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    listing_id = db.Column(db.Integer, db.ForeignKey('listing.id'), nullable=False)
-    rating = db.Column(db.Integer, nullable=False)  # 1-5 stars
-    comment = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    
-    # Add unique constraint to prevent multiple reviews from same user
-    __table_args__ = (db.UniqueConstraint('user_id', 'listing_id', name='_user_listing_review_uc'),)
-    
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "user_id": self.user_id,
-            "listing_id": self.listing_id,
-            "rating": self.rating,
-            "comment": self.comment,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
-        }
+
+@db.event.listens_for(User, 'after_update')
+@db.event.listens_for(User, 'after_delete')
+def _invalidate_cached_user(mapper, connection, target):
+    user_cache.invalidate(str(target.id))
+
+
+def cached_user(identity):
+    """``{"user": to_dict(), "role": ...}`` for a JWT identity, or None if no such user."""
+    key = str(identity)
+    data = user_cache.get(key)
+    if data is None:
+        try:
+            uid = int(identity)
+        except (TypeError, ValueError):
+            uid = identity
+        # Use Session.get() which is the modern SQLAlchemy API (avoids LegacyAPIWarning)
+        user = db.session.get(User, uid)
+        if not user:
+            return None
+        data = user_cache.set(key, {"user": user.to_dict(), "role": user.role})
+    return data
+
+
+revocation_list = RevocationList()
+revocation_list.init_app(db, RevokedToken)
+
+
+@jwt.token_in_blocklist_loader
+def check_if_token_revoked(jwt_header, jwt_payload):
+    return revocation_list.is_revoked(jwt_payload)
+
+
+def max_token_age():
+    """Longest lifetime of any JWT we issue, in seconds."""
+    refresh = current_app.config.get('JWT_REFRESH_TOKEN_EXPIRES', timedelta(days=30))
+    access = current_app.config.get('JWT_ACCESS_TOKEN_EXPIRES', timedelta(minutes=15))
+    return int(max(d.total_seconds() for d in (refresh, access) if d))
+
+
+EVENT_FIELDS = (
+    'name', 'description', 'url', 'venue', 'venue_address', 'city', 'state', 'category',
+    'start_local', 'start_time', 'start_at', 'image_url', 'latitude', 'longitude',
+)
+
+# Listing columns refreshed when the upstream event behind a listing changes
+LISTING_IMPORT_FIELDS = ('title', 'description', 'location', 'latitude', 'longitude', 'category', 'image_url')
 
 
 def get_serializer():
-    return URLSafeTimedSerializer(app.config['SECRET_KEY'])
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'])
+
 
+# Long-running /api/agent/* work runs on a bounded background pool
+job_queue = JobQueue()
 
-# Ensure database tables exist when the app starts. Using app.app_context()
-# is more robust than the before_first_request decorator which may not be
-# available in all runtime contexts.
-with app.app_context():
-    db.create_all()
 
+def store_events(events):
+    """Upsert normalized events keyed on (source, external_id).
 
-@app.route('/')
+    Unchanged events (same content hash) are skipped entirely. Returns the
+    created/updated/unchanged counts from ``upsert_by_external_id``.
+    """
+    now = datetime.utcnow()
+    rows = [
+        dict({f: e.get(f) for f in EVENT_FIELDS}, source=e['source'], external_id=e['external_id'],
+             content_hash=content_hash(e, EVENT_FIELDS), fetched_at=now)
+        for e in events
+    ]
+    result = upsert_by_external_id(db.session, Event, rows, EVENT_FIELDS + ('fetched_at',))
+    db.session.commit()
+    return result
+
+
+def run_event_ingestion(cities=None, categories=None, app=None):
+    """Fetch configured cities/categories from every provider and store them locally.
+
+    Runs in ``app``'s context, the current app by default (CLI, tests); the
+    scheduler thread passes its app explicitly.
+    """
+    app = app or current_app._get_current_object()
+    with app.app_context():
+        events, errors, stats = collect_events(cities, categories)
+        try:
+            counts = store_events(events)
+        except Exception:
+            db.session.rollback()
+            raise
+    summary = dict(counts, fetched=len(events), errors=errors, requests=stats)
+    app.logger.info("Event ingestion: %s", {k: v for k, v in summary.items() if k != 'errors'})
+    return summary
+
+
+@bp.cli.command('ingest-events')
+def ingest_events_command():
+    """Run one event ingestion pass (configure with INGEST_* env vars)."""
+    import json
+    print(json.dumps(run_event_ingestion(), indent=2))
+
+
+ingestion_scheduler = None
+
+
+def start_ingestion_scheduler(app):
+    """Start the periodic in-process ingestion thread (once per process)."""
+    global ingestion_scheduler
+    if ingestion_scheduler is None:
+        ingestion_scheduler = IngestionScheduler(partial(run_event_ingestion, app=app), logger=app.logger)
+        ingestion_scheduler.start()
+    return ingestion_scheduler
+
+
+def local_events_query(city, source=None, category=None, q=None):
+    """Upcoming locally ingested events for a city, soonest first."""
+    query = Event.query.filter(Event.city == (city or '').strip().lower())
+    query = query.filter(Event.start_at >= datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0))
+    if source:
+        query = query.filter(Event.source == source)
+    if category:
+        query = query.filter(Event.category == category)
+    if q:
+        query = query.filter(Event.name.ilike(f"%{q}%"))
+    return query.order_by(Event.start_at.asc(), Event.id.asc())
+
+
+def live_fallback_enabled():
+    """Proxy upstream when a city has not been ingested yet (EVENTS_LIVE_FALLBACK)."""
+    return os.environ.get('EVENTS_LIVE_FALLBACK', 'true').lower() in ('1', 'true', 'yes')
+
+
+def local_source_response(source, first_page=0, default_size=20):
+    """Serve a single-provider event listing from the local table, or None to go live.
+
+    ``page`` and ``size`` mean what they mean for the provider's live API:
+    ``first_page`` is the number of its first page (1 for SeatGeek).
+    """
+    city = request.args.get("city", "Houston")
+    query = local_events_query(city, source=source, category=request.args.get("category"),
+                               q=request.args.get("q"))
+    if live_fallback_enabled() and not query.first():
+        return None
+    size = request.args.get("size", default_size, type=int)
+    page = max(first_page, request.args.get("page", first_page, type=int))
+    total = query.count()
+    events = [e.to_dict() for e in query.offset((page - first_page) * size).limit(size)]
+    return jsonify({
+        "events": events,
+        "pagination": {"page": page, "size": size, "total": total},
+        "total": total,
+        "served_from": "local",
+    })
+
+
+@bp.route('/')
 def index():
     return jsonify({"message": "Tapin Backend API Root"})
 
 
-@app.route('/api/health', methods=['GET'])
+@bp.route('/api/health', methods=['GET'])
 def api_health():
     """Enhanced health check including database connectivity."""
     health_status = {"status": "ok", "components": {}}
@@ -216,7 +303,7 @@ def api_health():
         db.session.execute(db.text('SELECT 1'))
         health_status["components"]["database"] = {
             "status": "connected",
-            "uri_prefix": app.config['SQLALCHEMY_DATABASE_URI'][:20] + "...",
+            "uri_prefix": current_app.config['SQLALCHEMY_DATABASE_URI'][:20] + "...",
             "pool_size": db.engine.pool.size() if hasattr(db.engine.pool, 'size') else 'N/A'
         }
     except Exception as e:
@@ -227,17 +314,166 @@ def api_health():
         }
         return jsonify(health_status), 503
 
+    # Report provider circuit breakers that have seen traffic
+    breakers = breaker_states()
+    if breakers:
+        health_status["components"]["providers"] = breakers
+
     return jsonify(health_status), 200
 
 
-@app.route('/api/items', methods=['GET'])
+@bp.route('/api/metrics', methods=['GET'])
+def api_metrics():
+    """Operational counters: provider circuit state, remaining API quota per key, LLM cache hit rates, mail queue depth, replica health and per-endpoint SQL totals."""
+    llm_cache = get_llm_cache()
+    return jsonify({
+        "providers": provider_status(),
+        "llm_cache": llm_cache.stats() if llm_cache else None,
+        "mail": mailer.stats(),
+        "replicas": replica_router.status(),
+        "sql": query_stats.endpoint_stats(),
+    })
+
+
+def admin_required(fn):
+    """Require an access token of a user whose role is ``admin``."""
+    @wraps(fn)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        # Not cached_user: a demotion in another worker must apply at once
+        try:
+            user = db.session.get(User, int(get_jwt_identity()))
+        except (TypeError, ValueError):
+            user = None
+        if not user or user.role != 'admin':
+            return jsonify({"error": "admin only"}), 403
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+@bp.route('/api/admin/profile-token', methods=['POST'])
+@admin_required
+def issue_profile_token():
+    """Token that profiles any request sending it as X-Profile (or ?_profile=)."""
+    return jsonify({
+        "token": request_profiler.issue_token(get_jwt_identity()),
+        "header": "X-Profile",
+        "expires_in": request_profiler.token_max_age,
+    })
+
+
+@bp.route('/api/admin/profiles', methods=['GET'])
+@admin_required
+def list_profiles():
+    """Saved request profiles, newest first."""
+    return jsonify({"profiles": request_profiler.list(), "sample_rate": request_profiler.sample_rate})
+
+
+@bp.route('/api/admin/profiles/<artifact_id>', methods=['GET'])
+@admin_required
+def get_profile(artifact_id):
+    """Download a saved profile (pstats format), or ``?format=text`` for a summary."""
+    path = request_profiler.path(artifact_id)
+    if path is None:
+        return jsonify({"error": "profile not found"}), 404
+    if request.args.get('format') == 'text':
+        sort = request.args.get('sort', 'cumulative')
+        if sort not in ('cumulative', 'tottime', 'calls'):
+            return jsonify({"error": "sort must be cumulative, tottime or calls"}), 400
+        return Response(request_profiler.summary(path, sort=sort), content_type='text/plain; charset=utf-8')
+    return send_file(path, mimetype='application/octet-stream', as_attachment=True, download_name=artifact_id)
+
+
+def _memory_report_args():
+    """(limit, group_by) from the query string, or an error response."""
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 200)
+    except ValueError:
+        return None, None, (jsonify({"error": "limit must be an integer"}), 400)
+    group_by = request.args.get('group_by', 'lineno')
+    if group_by not in GROUPINGS:
+        return None, None, (jsonify({"error": f"group_by must be one of {', '.join(GROUPINGS)}"}), 400)
+    return limit, group_by, None
+
+
+@bp.route('/api/admin/tracemalloc', methods=['GET'])
+@admin_required
+def tracemalloc_status():
+    """Whether this worker traces allocations, its traced and peak bytes, and its snapshots."""
+    return jsonify(memory_diagnostics.status())
+
+
+@bp.route('/api/admin/tracemalloc/start', methods=['POST'])
+@admin_required
+def tracemalloc_start():
+    """Start tracing allocations in this worker, keeping ``frames`` frames per trace (default 1)."""
+    frames = (request.get_json(silent=True) or {}).get('frames', 1)
+    if not isinstance(frames, int) or not 1 <= frames <= 100:
+        return jsonify({"error": "frames must be an integer between 1 and 100"}), 400
+    return jsonify(memory_diagnostics.start(frames))
+
+
+@bp.route('/api/admin/tracemalloc/stop', methods=['POST'])
+@admin_required
+def tracemalloc_stop():
+    """Stop tracing and drop this worker's snapshots."""
+    return jsonify(memory_diagnostics.stop())
+
+
+@bp.route('/api/admin/tracemalloc/snapshots', methods=['POST'])
+@admin_required
+def tracemalloc_snapshot():
+    """Take a snapshot and return the top allocation sites."""
+    limit, group_by, error = _memory_report_args()
+    if error:
+        return error
+    try:
+        return jsonify(memory_diagnostics.take_snapshot(limit, group_by)), 201
+    except TracingOff:
+        return jsonify({"error": "tracemalloc is not running in this worker", "pid": os.getpid()}), 409
+
+
+@bp.route('/api/admin/tracemalloc/diff', methods=['GET'])
+@admin_required
+def tracemalloc_diff():
+    """Top allocation sites diffed between snapshots ``from`` and ``to`` (default: oldest and newest)."""
+    limit, group_by, error = _memory_report_args()
+    if error:
+        return error
+    report = memory_diagnostics.diff(request.args.get('from', type=int), request.args.get('to', type=int),
+                                     limit, group_by)
+    if report is None:
+        return jsonify({"error": "need two snapshots taken in this worker", "pid": os.getpid()}), 404
+    return jsonify(report)
+
+
+@bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Request latency, upstream calls, connection pools and cache hit counts of all workers, in Prometheus text format."""
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+
+def provider_unavailable_response(ex):
+    """503 response for a provider whose circuit breaker is open."""
+    resp = jsonify({
+        "error": str(ex),
+        "source": ex.source,
+        "unavailable": True,
+    })
+    resp.status_code = 503
+    if ex.retry_after:
+        resp.headers['Retry-After'] = str(int(ex.retry_after) + 1)
+    return resp
+
+
+@bp.route('/api/items', methods=['GET'])
 def api_list_items():
     # Return all items from the database
     items = Item.query.order_by(Item.id.asc()).all()
     return jsonify({"items": [i.to_dict() for i in items]}), 200
 
 
-@app.route('/api/items', methods=['POST'])
+@bp.route('/api/items', methods=['POST'])
 @jwt_required()
 def api_create_item():
     data = request.get_json() or {}
@@ -250,7 +486,26 @@ def api_create_item():
     return jsonify(item.to_dict()), 201
 
 
-@app.route('/register', methods=['POST'])
+def auth_rate_limited(endpoint):
+    """Refuse over-limit attempts at an auth endpoint with 429, before any password hashing."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            email = (request.get_json(silent=True) or {}).get('email')
+            retry_after = check_auth_limits(endpoint, request.remote_addr,
+                                            email if isinstance(email, str) else None)
+            if retry_after is not None:
+                resp = jsonify({"error": "too many attempts, try again later"})
+                resp.status_code = 429
+                resp.headers['Retry-After'] = str(retry_after)
+                return resp
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@bp.route('/register', methods=['POST'])
+@auth_rate_limited('register')
 def register_user():
     data = request.get_json() or {}
     email = data.get('email')
@@ -259,10 +514,12 @@ def register_user():
         return jsonify({"error": "email and password required"}), 400
     if User.query.filter_by(email=email).first():
         return jsonify({"error": "user already exists"}), 400
-    pw_hash = generate_password_hash(password)
+    pw_hash = hash_password(password)
     user = User(email=email, password_hash=pw_hash)
     db.session.add(user)
     db.session.commit()
+    # the new user's next reads (with the token below) must see this row
+    stick_user(user.id)
     # return both access and refresh tokens (identity stored as string)
     from auth import token_pair
 
@@ -270,137 +527,82 @@ def register_user():
     return jsonify({"message": "user created", "user": user.to_dict(), **tokens}), 201
 
 
-@app.route('/login', methods=['POST'])
+@bp.route('/login', methods=['POST'])
+@auth_rate_limited('login')
 def login_user():
     data = request.get_json() or {}
     email = data.get('email')
     password = data.get('password')
     user = User.query.filter_by(email=email).first()
-    if not user or not check_password_hash(user.password_hash, password):
+    if not user or not verify_password(user.password_hash, password):
         return jsonify({"error": "invalid credentials"}), 401
-    # return both access and refresh tokens to the client
-    from auth import token_pair
-
-    tokens = token_pair(user)
-
-    # --- Helper: Auto-populate Nightlife events for user's city on login ---
-    def auto_populate_nightlife_for_city(city, state):
-        """Call Gemini nightlife endpoint for the given city/state if no Nightlife listings exist."""
-        nightlife_exists = Listing.query.filter_by(category='Nightlife', location=city).first()
-        if nightlife_exists:
-            return False
-        from flask import current_app
-        with current_app.app_context():
-            try:
-                import google.generativeai as genai
-                from datetime import datetime as dt
-                gemini_key = os.environ.get('GEMINI_API_KEY')
-                if not gemini_key:
-                    return False
-                genai.configure(api_key=gemini_key)
-                model = genai.GenerativeModel('gemini-2.5-flash')
-                today = dt.now().strftime('%B %d, %Y')
-                prompt = (
-                    f"""
-                    Find 5 upcoming nightclub or nightlife events in {city}, {state}, United States, happening after {today}.
-                    For each event, return a JSON object with: name, date, venue, address, url (if available), and a 1-sentence description.
-                    Respond with ONLY a JSON array of event objects, no extra text.
-                    """
-                )
-                response = model.generate_content(prompt)
-                import json
-                events = json.loads(response.text.strip())
-                now = dt.now()
-                for e in events:
-                    name = e.get('name')
-                    date_str = e.get('date')
-                    venue = e.get('venue') or city
-                    url = e.get('url')
-                    description = e.get('description') or ''
-                    if not name or not date_str:
-                        continue
-                    try:
-                        event_date = dt.fromisoformat(date_str)
-                        if event_date.date() < now.date():
-                            continue
-                    except Exception:
-                        pass
-                    existing = Listing.query.filter_by(title=name, location=venue).first()
-                    if existing:
-                        continue
-                    listing = Listing(
-                        title=name[:200],
-                        description=f"{description}\n\nEvent URL: {url or ''}\nDate: {date_str}",
-                        location=venue,
-                        latitude=None,
-                        longitude=None,
-                        category='Nightlife',
-                        image_url=None,
-                        owner_id=None
-                    )
-                    db.session.add(listing)
-                db.session.commit()
-                return True
-            except Exception:
-                db.session.rollback()
-                return False
-
-    # Call the helper function to auto-populate nightlife events for the user's city
+    if needs_rehash(user.password_hash):
+        # Hashing parameters changed since this password was set; upgrade it
+        user.password_hash = hash_password(password)
+        db.session.commit()
+    # Nightlife listings for the user's city are refreshed in the background,
+    # at most once per NIGHTLIFE_REFRESH_TTL, so login never waits on Gemini
+    city = data.get('city') or request.args.get('city') or 'Houston'
+    state = data.get('state') or request.args.get('state') or 'TX'
     try:
-        city = request.args.get("city", "Houston")
-        state = request.args.get("state", "TX")
-        auto_populate_nightlife_for_city(city, state)
+        schedule_nightlife_refresh(city, state)
     except Exception as e:
-        app.logger.warning(f"Error in auto-populate nightlife: {e}")
+        db.session.rollback()
+        current_app.logger.warning(f"Error scheduling nightlife refresh: {e}")
+
+    stick_user(user.id)
+    # return both access and refresh tokens to the client
+    from auth import token_pair
 
-    # Try to auto-populate Nightlife events for user's city if provided
-    user_city = data.get('city') or 'Houston'
-    user_state = data.get('state') or 'TX'
-    auto_populate_nightlife_for_city(user_city, user_state)
     tokens = token_pair(user)
     return jsonify({"message": "login successful", "user": user.to_dict(), **tokens})
 
 
-@app.route('/refresh', methods=['POST'])
+@bp.route('/refresh', methods=['POST'])
 @jwt_required(refresh=True)
 def refresh_token():
     """Exchange a valid refresh token for a new access token."""
-    uid = get_jwt_identity()
-    try:
-        uid_int = int(uid)
-    except Exception:
-        uid_int = uid
-    user = db.session.get(User, uid_int)
-    if not user:
+    data = cached_user(get_jwt_identity())
+    if not data:
         return jsonify({"error": "user not found"}), 404
-    access_token = token_for(uid_int)
+    access_token = token_for(data["user"]["id"])
     return jsonify({"access_token": access_token})
 
 
-@app.route('/me', methods=['GET'])
+@bp.route('/logout', methods=['POST'])
+@jwt_required(verify_type=False)
+def logout():
+    """Revoke the presented token, plus the refresh token in the body if given."""
+    payload = get_jwt()
+    revocation_list.revoke_token(payload)
+    refresh = (request.get_json(silent=True) or {}).get('refresh_token')
+    if refresh:
+        try:
+            refresh_payload = decode_token(refresh)
+        except Exception:
+            return jsonify({"error": "invalid refresh token"}), 400
+        if refresh_payload.get('sub') != payload.get('sub'):
+            return jsonify({"error": "refresh token belongs to another user"}), 400
+        if not revocation_list.is_revoked(refresh_payload):
+            revocation_list.revoke_token(refresh_payload)
+    return jsonify({"message": "logged out"})
+
+
+@bp.route('/me', methods=['GET'])
 @jwt_required()
 def me():
-    uid = get_jwt_identity()
-    # convert back to int because tokens store identity as string
-    try:
-        uid_int = int(uid)
-    except Exception:
-        uid_int = uid
-    # Use Session.get() which is the modern SQLAlchemy API (avoids LegacyAPIWarning)
-    user = db.session.get(User, uid_int)
-    if not user:
+    data = cached_user(get_jwt_identity())
+    if not data:
         return jsonify({"error": "user not found"}), 404
-    return jsonify({"user": user.to_dict()})
+    return jsonify({"user": data["user"]})
 
 
 def send_reset_email(to_email, reset_url):
-    smtp_host = os.environ.get('SMTP_HOST')
-    if not smtp_host:
+    """Queue the reset email for background delivery; returns (queued, info)."""
+    if not smtp_configured():
         return False, 'SMTP not configured'
-    smtp_port = int(os.environ.get('SMTP_PORT', 587))
+    smtp_host = os.environ.get('SMTP_HOST')
     smtp_user = os.environ.get('SMTP_USER')
-    smtp_pass = os.environ.get('SMTP_PASS')
-    use_tls = os.environ.get('SMTP_USE_TLS', 'true').lower() in ('1', 'true', 'yes')
 
     msg = EmailMessage()
     msg['Subject'] = 'Tapin Password Reset'
@@ -408,22 +610,12 @@ def send_reset_email(to_email, reset_url):
     msg['To'] = to_email
     msg.set_content(f'Use the link to reset your password: {reset_url}')
 
-    try:
-        server = smtplib.SMTP(smtp_host, smtp_port, timeout=10)
-        server.ehlo()
-        if use_tls:
-            server.starttls()
-            server.ehlo()
-        if smtp_user and smtp_pass:
-            server.login(smtp_user, smtp_pass)
-        server.send_message(msg)
-        server.quit()
-        return True, 'sent'
-    except Exception as e:
-        return False, str(e)
+    mailer.enqueue(msg)
+    return True, 'queued'
 
 
-@app.route('/reset-password', methods=['POST'])
+@bp.route('/reset-password', methods=['POST'])
+@auth_rate_limited('reset')
 def reset_password():
     data = request.get_json() or {}
     email = data.get('email')
@@ -435,8 +627,8 @@ def reset_password():
         return jsonify({"message": "If an account exists for that email, a reset link has been sent."})
 
     serializer = get_serializer()
-    token = serializer.dumps(email, salt=app.config['SECURITY_PASSWORD_SALT'])
-    reset_url = url_for('confirm_reset', token=token, _external=True)
+    token = serializer.dumps(email, salt=current_app.config['SECURITY_PASSWORD_SALT'])
+    reset_url = url_for('.confirm_reset', token=token, _external=True)
 
     sent, info = send_reset_email(email, reset_url)
     if sent:
@@ -446,7 +638,7 @@ def reset_password():
         return jsonify({"message": "smtp not configured, returning reset link (dev)", "reset_url": reset_url, "error": info})
 
 
-@app.route('/reset-password/confirm/<token>', methods=['POST'])
+@bp.route('/reset-password/confirm/<token>', methods=['POST'])
 def confirm_reset(token):
     data = request.get_json() or {}
     new_password = data.get('password')
@@ -454,7 +646,7 @@ def confirm_reset(token):
         return jsonify({"error": "password required"}), 400
     serializer = get_serializer()
     try:
-        email = serializer.loads(token, salt=app.config['SECURITY_PASSWORD_SALT'], max_age=3600)
+        email = serializer.loads(token, salt=current_app.config['SECURITY_PASSWORD_SALT'], max_age=3600)
     except SignatureExpired:
         return jsonify({"error": "token expired"}), 400
     except BadSignature:
@@ -463,12 +655,14 @@ def confirm_reset(token):
     user = User.query.filter_by(email=email).first()
     if not user:
         return jsonify({"error": "no such user"}), 404
-    user.password_hash = generate_password_hash(new_password)
+    user.password_hash = hash_password(new_password)
     db.session.commit()
+    # Sessions opened with the old password end here
+    revocation_list.revoke_user(user.id, max_token_age())
     return jsonify({"message": "password updated"})
 
 
-@app.route('/listings', methods=['GET'])
+@bp.route('/listings', methods=['GET'])
 def get_listings():
     # Support simple filtering via query params: q (text search on title/description or category), location
     q = request.args.get('q', type=str)
@@ -491,7 +685,7 @@ def get_listings():
     return jsonify([l.to_dict() for l in listings])
 
 
-@app.route('/listings', methods=['POST'])
+@bp.route('/listings', methods=['POST'])
 @jwt_required()
 def create_listing():
     data = request.get_json() or {}
@@ -529,13 +723,13 @@ def create_listing():
     return jsonify(listing.to_dict()), 201
 
 
-@app.route('/listings/<int:id>', methods=['GET'])
+@bp.route('/listings/<int:id>', methods=['GET'])
 def get_listing_detail(id):
     listing = Listing.query.get_or_404(id)
     return jsonify(listing.to_dict())
 
 
-@app.route('/listings/<int:id>', methods=['PUT'])
+@bp.route('/listings/<int:id>', methods=['PUT'])
 @jwt_required()
 def update_listing(id):
     listing = Listing.query.get_or_404(id)
@@ -567,7 +761,7 @@ def update_listing(id):
     return jsonify(listing.to_dict())
 
 
-@app.route('/listings/<int:id>', methods=['DELETE'])
+@bp.route('/listings/<int:id>', methods=['DELETE'])
 @jwt_required()
 def delete_listing(id):
     listing = Listing.query.get_or_404(id)
@@ -580,7 +774,7 @@ def delete_listing(id):
     return jsonify({"message": "deleted"})
 
 
-@app.route('/listings/<int:id>/signup', methods=['POST'])
+@bp.route('/listings/<int:id>/signup', methods=['POST'])
 @jwt_required()
 def signup_for_listing(id):
     """Volunteer signs up for a listing."""
@@ -605,7 +799,7 @@ def signup_for_listing(id):
     return jsonify(signup.to_dict()), 201
 
 
-@app.route('/listings/<int:id>/signups', methods=['GET'])
+@bp.route('/listings/<int:id>/signups', methods=['GET'])
 @jwt_required()
 def get_listing_signups(id):
     """Get all sign-ups for a listing (owner only)."""
@@ -630,7 +824,7 @@ def get_listing_signups(id):
     return jsonify(results)
 
 
-@app.route('/signups/<int:id>', methods=['PUT'])
+@bp.route('/signups/<int:id>', methods=['PUT'])
 @jwt_required()
 def update_signup_status(id):
     """Update sign-up status (owner can accept/decline, volunteer can cancel)."""
@@ -662,7 +856,7 @@ def update_signup_status(id):
     return jsonify(signup.to_dict())
 
 
-@app.route('/listings/<int:id>/reviews', methods=['POST'])
+@bp.route('/listings/<int:id>/reviews', methods=['POST'])
 @jwt_required()
 def create_review(id):
     """Create a review for a listing."""
@@ -692,7 +886,7 @@ def create_review(id):
     return jsonify(review.to_dict()), 201
 
 
-@app.route('/listings/<int:id>/reviews', methods=['GET'])
+@bp.route('/listings/<int:id>/reviews', methods=['GET'])
 def get_listing_reviews(id):
     """Get all reviews for a listing."""
     listing = Listing.query.get_or_404(id)
@@ -710,7 +904,7 @@ def get_listing_reviews(id):
     return jsonify(results)
 
 
-@app.route('/listings/<int:id>/average-rating', methods=['GET'])
+@bp.route('/listings/<int:id>/average-rating', methods=['GET'])
 def get_listing_average_rating(id):
     """Get average rating for a listing."""
     listing = Listing.query.get_or_404(id)
@@ -726,7 +920,7 @@ def get_listing_average_rating(id):
     })
 
 
-@app.route('/api/events/eventbrite', methods=['GET'])
+@bp.route('/api/events/eventbrite', methods=['GET'])
 def get_eventbrite_events():
     """
     NOTE: Eventbrite deprecated their public events search API in 2020.
@@ -740,14 +934,16 @@ def get_eventbrite_events():
     }), 501
 
 
-@app.route('/api/events/ticketmaster', methods=['GET'])
+@bp.route('/api/events/ticketmaster', methods=['GET'])
 def get_ticketmaster_events():
-    """Fetch public events from Ticketmaster Discovery API."""
+    """Fetch public events from Ticketmaster (local ingested copy, else live Discovery API)."""
+    local = local_source_response("ticketmaster")
+    if local is not None:
+        return local
     tm_key = os.environ.get('TICKETMASTER_API_KEY')
     if not tm_key:
         return jsonify({"error": "Ticketmaster API key not configured"}), 500
 
-    url = "https://app.ticketmaster.com/discovery/v2/events"
     city = request.args.get("city", "Houston")
     state_code = request.args.get("state", "TX")
     params = {
@@ -763,9 +959,7 @@ def get_ticketmaster_events():
     }
     params = {k: v for k, v in params.items() if v}
     try:
-        resp = requests.get(url, params=params, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
+        data = provider_get("ticketmaster", TICKETMASTER_URL, params=params)
         events = []
         for e in data.get("_embedded", {}).get("events", []):
             venue_info = e.get("_embedded", {}).get("venues", [{}])[0]
@@ -786,18 +980,22 @@ def get_ticketmaster_events():
             "pagination": data.get("page", {}),
             "total": data.get("page", {}).get("totalElements", 0)
         })
+    except ProviderUnavailable as ex:
+        return provider_unavailable_response(ex)
     except Exception as ex:
         return jsonify({"error": str(ex), "source": "ticketmaster"}), 502
 
 
-@app.route('/api/events/seatgeek', methods=['GET'])
+@bp.route('/api/events/seatgeek', methods=['GET'])
 def get_seatgeek_events():
-    """Fetch public events from SeatGeek API."""
+    """Fetch public events from SeatGeek (local ingested copy, else live API)."""
+    local = local_source_response("seatgeek", first_page=1, default_size=25)
+    if local is not None:
+        return local
     client_id = os.environ.get('SEATGEEK_CLIENT_ID')
     if not client_id:
         return jsonify({"error": "SeatGeek client_id not configured"}), 500
 
-    url = "https://api.seatgeek.com/2/events"
     params = {
         "client_id": client_id,
         "venue.city": request.args.get("city", "Houston"),
@@ -811,9 +1009,7 @@ def get_seatgeek_events():
     params = {k: v for k, v in params.items() if v}
 
     try:
-        resp = requests.get(url, params=params, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
+        data = provider_get("seatgeek", SEATGEEK_URL, params=params)
         events = []
 
         for e in data.get("events", []):
@@ -841,127 +1037,152 @@ def get_seatgeek_events():
             },
             "total": data.get("meta", {}).get("total", 0)
         })
+    except ProviderUnavailable as ex:
+        return provider_unavailable_response(ex)
     except Exception as ex:
         return jsonify({"error": str(ex), "source": "seatgeek"}), 502
 
 
-@app.route('/api/events/all', methods=['GET'])
-def get_all_events():
-    """Aggregate events from all configured sources (Ticketmaster + SeatGeek)."""
-    from datetime import datetime as dt
-    all_events = []
-    errors = []
-    city = request.args.get("city", "Houston")
-    state = request.args.get("state", "TX")
+# Short prefixes used for event ids in the merged feed
+FEED_ID_PREFIXES = {"ticketmaster": "tm", "seatgeek": "sg"}
+
+
+def feed_event(data):
+    """Merged-feed representation of a normalized event dict."""
+    start_at = data.get("start_at")
+    return {
+        "id": f"{FEED_ID_PREFIXES.get(data['source'], data['source'])}_{data['external_id']}",
+        "source": data["source"],
+        "name": data.get("name"),
+        "start": data.get("start_local"),
+        "start_time": data.get("start_time"),
+        "start_at": start_at.isoformat() + 'Z' if start_at else None,
+        "url": data.get("url"),
+        "venue": data.get("venue"),
+        "image": data.get("image_url"),
+        "category": data.get("category"),
+    }
 
-    # Get current datetime for filtering
-    now = dt.now()
 
-    # Try Ticketmaster
-    tm_key = os.environ.get('TICKETMASTER_API_KEY')
-    if tm_key:
+def local_event_stream(city, source, position, batch_size):
+    """Upcoming local events for one source after ``position`` ([start_iso, id])."""
+    query = local_events_query(city, source=source)
+    if position:
+        last_start, last_id = datetime.fromisoformat(position[0]), int(position[1])
+        query = query.filter(db.or_(
+            Event.start_at > last_start,
+            db.and_(Event.start_at == last_start, Event.id > last_id),
+        ))
+    for ev in query.limit(batch_size):
+        data = {f: getattr(ev, f) for f in EVENT_FIELDS}
+        data.update(source=ev.source, external_id=ev.external_id)
+        yield as_utc(ev.start_at), [ev.start_at.isoformat(), ev.id], feed_event(data)
+
+
+def live_event_stream(source, city, state, position, page_size, errors, unavailable):
+    """Lazily page through a provider's upcoming events starting at ``position`` ([page, offset]).
+
+    Upstream failures end the stream and are reported through ``errors``.
+    """
+    credential, fetch_page, normalize, first_page = configured_providers()[source]
+    page, offset = position or (first_page, 0)
+    now = datetime.now(timezone.utc)
+    last_start = now
+    while True:
         try:
-            tm_url = "https://app.ticketmaster.com/discovery/v2/events"
-            tm_params = {
-                "apikey": tm_key,
-                "city": city,
-                "stateCode": state,
-                "size": 25,
-                "sort": "date,asc",
-            }
-            resp = requests.get(tm_url, params=tm_params, timeout=10)
-            resp.raise_for_status()
-            data = resp.json()
-            for e in data.get("_embedded", {}).get("events", []):
-                venue_info = e.get("_embedded", {}).get("venues", [{}])[0]
-                event_date = e.get("dates", {}).get("start", {}).get("localDate")
-
-                # Skip past events
-                if event_date:
-                    try:
-                        event_datetime = dt.fromisoformat(event_date)
-                        if event_datetime.date() < now.date():
-                            continue
-                    except (ValueError, AttributeError):
-                        pass  # Include event if date parsing fails
-
-                all_events.append({
-                    "id": f"tm_{e.get('id')}",
-                    "source": "ticketmaster",
-                    "name": e.get("name"),
-                    "start": event_date,
-                    "start_time": e.get("dates", {}).get("start", {}).get("localTime"),
-                    "url": e.get("url"),
-                    "venue": venue_info.get("name"),
-                    "image": e.get("images", [{}])[0].get("url") if e.get("images") else None,
-                })
+            raw, has_more = fetch_page(credential, city, state, page=page, size=page_size)
+        except ProviderUnavailable as ex:
+            # Circuit open: skip without waiting on the upstream timeout
+            unavailable.append(source)
+            errors.append({"source": source, "error": str(ex), "unavailable": True})
+            return
         except Exception as ex:
-            errors.append({"source": "ticketmaster", "error": str(ex)})
+            errors.append({"source": source, "error": str(ex)})
+            return
+        for idx in range(offset, len(raw)):
+            data = normalize(raw[idx], city=city.lower(), state=state)
+            start = as_utc(data["start_at"])
+            if start is not None and start.date() < now.date():
+                continue  # skip past events
+            # Keep the stream ordered even when a start time is missing
+            last_start = start or last_start
+            yield last_start, [page, idx + 1], feed_event(data)
+        if not has_more:
+            return
+        page, offset = page + 1, 0
+
+
+@bp.route('/api/events/all', methods=['GET'])
+def get_all_events():
+    """Merged, cursor-paginated feed of upcoming events from all providers.
 
-    # Try SeatGeek
-    sg_client_id = os.environ.get('SEATGEEK_CLIENT_ID')
-    if sg_client_id:
+    Query params: city, state, limit (default 25, max 100) and cursor (the
+    ``next_cursor`` from the previous page).
+    """
+    errors = []
+    unavailable = []
+    city = request.args.get("city", "Houston")
+    state = request.args.get("state", "TX")
+    limit = max(1, min(request.args.get("limit", 25, type=int), 100))
+    city_key = city.strip().lower()
+
+    cursor = request.args.get("cursor")
+    if cursor:
         try:
-            sg_url = "https://api.seatgeek.com/2/events"
-            sg_params = {
-                "client_id": sg_client_id,
-                "venue.city": city,
-                "venue.state": state,
-                "per_page": 25,
-                "sort": "datetime_utc.asc",
-            }
-            resp = requests.get(sg_url, params=sg_params, timeout=10)
-            resp.raise_for_status()
-            data = resp.json()
-            for e in data.get("events", []):
-                venue = e.get("venue", {})
-                event_datetime_str = e.get("datetime_local")
-
-                # Skip past events
-                if event_datetime_str:
-                    try:
-                        event_datetime = dt.fromisoformat(event_datetime_str.replace('Z', '+00:00'))
-                        if event_datetime < now:
-                            continue
-                    except (ValueError, AttributeError):
-                        pass  # Include event if date parsing fails
-
-                all_events.append({
-                    "id": f"sg_{e.get('id')}",
-                    "source": "seatgeek",
-                    "name": e.get("title"),
-                    "start": event_datetime_str,
-                    "url": e.get("url"),
-                    "venue": venue.get("name"),
-                    "image": e.get("performers", [{}])[0].get("image") if e.get("performers") else None,
-                })
-        except Exception as ex:
-            errors.append({"source": "seatgeek", "error": str(ex)})
+            cursor_state = decode_cursor(cursor)
+        except InvalidCursor as ex:
+            return jsonify({"error": f"invalid cursor: {ex}"}), 400
+        if cursor_state.get("city") != city_key:
+            return jsonify({"error": "invalid cursor: does not match city"}), 400
+        mode = cursor_state.get("mode")
+        positions = cursor_state["p"]
+        # live positions count in the upstream pages of the first request
+        page_size = cursor_state.get("ps", limit)
+    else:
+        # Serve from the locally ingested table when this city has been ingested
+        has_local = local_events_query(city).first() is not None
+        mode = "local" if has_local or not live_fallback_enabled() else "live"
+        positions = {}
+        page_size = limit
+
+    if mode == "local":
+        sources = sorted(s for (s,) in db.session.query(Event.source).filter(Event.city == city_key).distinct())
+        streams = {s: local_event_stream(city, s, positions.get(s), limit + 1) for s in sources}
+    else:
+        sources = sorted(configured_providers())
+        streams = {
+            s: live_event_stream(s, city, state, positions.get(s), page_size, errors, unavailable)
+            for s in sources
+        }
 
-    # Sort all events by start date
-    all_events.sort(key=lambda x: x.get("start", ""), reverse=False)
+    events, advanced, has_more = merge_page(streams, limit)
+    positions = dict(positions, **advanced)
 
-    sources = []
-    if tm_key:
-        sources.append("ticketmaster")
-    if sg_client_id:
-        sources.append("seatgeek")
+    # Merge the same event listed by several providers
+    events, merged = dedupe_events(events)
 
     return jsonify({
-        "events": all_events,
-        "total": len(all_events),
+        "events": events,
+        "total": len(events),
+        "duplicates_merged": merged,
+        "next_cursor": encode_cursor({"mode": mode, "city": city_key, "p": positions, "ps": page_size})
+        if has_more else None,
+        "has_more": has_more,
         "errors": errors if errors else None,
         "sources_queried": sources,
+        "unavailable_sources": unavailable,
+        "served_from": mode,
         "note": "Showing upcoming events only"
     })
 
 
-@app.route('/api/events/community', methods=['GET'])
+@bp.route('/api/events/community', methods=['GET'])
 def get_community_events():
     """Fetch community events using SerpApi Google Search."""
     serpapi_key = os.environ.get('SERPAPI_KEY')
     if not serpapi_key:
         return jsonify({"error": "SerpApi key not configured"}), 500
+    from requests.exceptions import RequestException
 
     try:
         from datetime import datetime as dt
@@ -970,8 +1191,6 @@ def get_community_events():
         state = request.args.get("state", "TX")
 
         # Search for community events using Google
-        url = "https://serpapi.com/search.json"
-
         params = {
             "engine": "google",
             "q": f"community events {city} {state}",
@@ -980,9 +1199,7 @@ def get_community_events():
             "api_key": serpapi_key
         }
 
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        data = provider_get("serpapi", SERPAPI_URL, params=params)
 
         events = []
         now = dt.now()
@@ -1011,354 +1228,510 @@ def get_community_events():
             "note": "Community events powered by Google Search"
         })
 
-    except requests.exceptions.RequestException as e:
+    except ProviderUnavailable as ex:
+        return provider_unavailable_response(ex)
+    except RequestException as e:
         return jsonify({"error": f"SerpApi error: {str(e)}"}), 500
     except Exception as e:
         return jsonify({"error": f"Error processing community events: {str(e)}"}), 500
 
 
-@app.route('/api/agent/populate-listings', methods=['POST'])
+def job_accepted_response(job):
+    """202 Accepted pointing the client at the job's status endpoint."""
+    status_url = url_for('.get_job_status', job_id=job.id)
+    resp = jsonify({"job_id": job.id, "status": job.status, "status_url": status_url})
+    resp.status_code = 202
+    resp.headers['Location'] = status_url
+    return resp
+
+
+@bp.route('/api/agent/jobs/<job_id>', methods=['GET'])
+@use_primary
+def get_job_status(job_id):
+    """Progress, counts and errors for a background agent job."""
+    job = db.session.get(Job, job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+
+@job_queue.task('populate_listings', resumable=True)
+def populate_listings_job(ctx):
+    from datetime import datetime as dt
+
+    # Category mapping: event categories to listing categories
+    category_map = {
+        'music': 'Community',
+        'sports': 'Community',
+        'arts': 'Community',
+        'theater': 'Community',
+        'family': 'Community',
+        'community': 'Community'
+    }
+
+    rows = []
+    skipped_events = []
+    today = dt.utcnow().date()
+
+    # Pull configured cities/categories from every provider concurrently and
+    # keep the local Event table fresh as a side effect
+    events, errors, _ = collect_events(ingest_cities(), ingest_categories())
+    store_events(events)
+    ctx.update(progress=50, fetched=len(events))
+
+    for e in events:
+        if not e.get("start_at"):
+            continue
+
+        # Skip past events
+        if e["start_at"].date() < today:
+            skipped_events.append(e.get("name"))
+            continue
+
+        event_url = e.get("url") or ""
+        city_name = (e.get("city") or "").title()
+        rows.append({
+            "source": e["source"],
+            "external_id": e["external_id"],
+            "content_hash": content_hash(e, EVENT_FIELDS),
+            "title": e.get("name", "Event")[:200],
+            "description": f"Event URL: {event_url}\n\nDate: {e.get('start_local') or e['start_at'].isoformat()}\n\nJoin this {e.get('category')} event in {city_name}!",
+            "location": e.get("venue") or f"{city_name}, {e.get('state')}",
+            "latitude": e.get("latitude"),
+            "longitude": e.get("longitude"),
+            "category": category_map.get(e.get("category"), 'Community'),
+            "image_url": e.get("image_url"),
+            "owner_id": None,  # System-generated listing
+        })
+
+    # Existing listings are matched on (source, external_id); unchanged ones are skipped
+    created = []
+    counts = upsert_by_external_id(db.session, Listing, rows, LISTING_IMPORT_FIELDS, created=created)
+    db.session.commit()
+    created_titles = [r["title"] for r in created][:5]
+
+    return {
+        "success": True,
+        "created": counts["created"],
+        "updated": counts["updated"],
+        "unchanged": counts["unchanged"],
+        "skipped_past_events": len(skipped_events),
+        "sample_created": created_titles,
+        "errors": errors or None,
+        "message": f"Successfully created {counts['created']} listings from future events"
+    }
+
+
+@bp.route('/api/agent/populate-listings', methods=['POST'])
 def populate_listings_from_events():
-    """AI agent to auto-populate listings from event APIs for future events only."""
-    try:
-        from datetime import datetime as dt
+    """AI agent to auto-populate listings from event APIs for future events only.
 
-        # Category mapping: event categories to listing categories
-        category_map = {
-            'music': 'Community',
-            'sports': 'Community',
-            'arts': 'Community',
-            'theater': 'Community',
-            'family': 'Community',
-            'community': 'Community'
-        }
+    Runs in the background; poll the returned status_url for progress.
+    """
+    return job_accepted_response(job_queue.submit('populate_listings'))
 
-        # Get all future events from Ticketmaster
-        tm_key = os.environ.get('TICKETMASTER_API_KEY')
-        sg_client_id = os.environ.get('SEATGEEK_CLIENT_ID')
 
-        created_listings = []
-        skipped_events = []
-        now = dt.now()
+@job_queue.task('ai_populate', resumable=True)
+def ai_populate_job(ctx):
+    import google.generativeai as genai
+    from datetime import datetime as dt
+
+    genai.configure(api_key=os.environ.get('GEMINI_API_KEY'))
+    model = genai.GenerativeModel('gemini-2.5-flash')
+
+    # Analyze current listings by category
+    all_listings = Listing.query.all()
+    category_counts = {}
+    for listing in all_listings:
+        cat = listing.category or 'Uncategorized'
+        category_counts[cat] = category_counts.get(cat, 0) + 1
+
+    # Ask Gemini which categories need more events
+    prompt = f"""Analyze these event category counts and suggest which 3 categories need more diversity:
+Categories: {category_counts}
 
-        # Fetch from Ticketmaster (multiple categories)
-        if tm_key:
-            for event_category in ['music', 'sports', 'arts', 'family']:
-                try:
-                    url = "https://app.ticketmaster.com/discovery/v2/events"
-                    params = {
-                        "apikey": tm_key,
-                        "city": "Houston",
-                        "stateCode": "TX",
-                        "classificationName": event_category,
-                        "size": 10,
-                        "sort": "date,asc"
-                    }
-
-                    response = requests.get(url, params=params, timeout=10)
-                    if response.ok:
-                        data = response.json()
-                        events = data.get("_embedded", {}).get("events", [])
-
-                        for e in events:
-                            # Parse event date
-                            start_date_str = e.get("dates", {}).get("start", {}).get("dateTime") or e.get("dates", {}).get("start", {}).get("localDate")
-                            if not start_date_str:
-                                continue
-
-                            # Skip past events
+Available event types: music concerts, sports games, theater shows, art exhibitions, family activities, community gatherings.
+
+Respond with ONLY a JSON array of 3 category names to prioritize, like: ["music", "sports", "family"]"""
+
+    try:
+        priority_categories = parse_json(cached_generate(model, prompt, 'priorities', validate=is_json))
+    except:
+        # Fallback if AI doesn't return valid JSON
+        priority_categories = ["music", "sports", "family"]
+
+    # Fetch events from priority categories (only with images)
+    tm_key = os.environ.get('TICKETMASTER_API_KEY')
+    created_listings = []
+    import_rows = []
+    pending = []
+    now = dt.now()
+
+    if tm_key:
+        for done, event_category in enumerate(priority_categories[:3]):  # Top 3 priorities
+            ctx.update(progress=10 + 30 * done, created=len(created_listings))
+            try:
+                params = {
+                    "apikey": tm_key,
+                    "city": "Houston",
+                    "stateCode": "TX",
+                    "classificationName": event_category,
+                    "size": 15,
+                    "sort": "date,asc"
+                }
+
+                data = provider_get("ticketmaster", TICKETMASTER_URL, params=params)
+                if data:
+                    events = data.get("_embedded", {}).get("events", [])
+
+                    candidates = []
+                    for e in events:
+                        # ONLY process events with images
+                        if not e.get("images"):
+                            continue
+
+                        # Skip past events
+                        start_date_str = e.get("dates", {}).get("start", {}).get("dateTime") or e.get("dates", {}).get("start", {}).get("localDate")
+                        if start_date_str:
                             try:
                                 event_date = dt.fromisoformat(start_date_str.replace('Z', '+00:00'))
                                 if event_date.date() < now.date():
-                                    skipped_events.append(e.get("name"))
                                     continue
                             except:
-                                pass  # Include if date parsing fails
-
-                            # Check if listing already exists
-                            event_url = e.get("url", "")
-                            existing = Listing.query.filter_by(description=f"Event URL: {event_url}").first()
-                            if existing:
-                                continue
-
-                            # Extract venue info
-                            venue = e.get("_embedded", {}).get("venues", [{}])[0]
-                            venue_name = venue.get("name", "Houston, TX")
-                            lat = venue.get("location", {}).get("latitude")
-                            lon = venue.get("location", {}).get("longitude")
-
-                            # Create listing from event
-                            listing = Listing(
-                                title=e.get("name", "Event")[:200],
-                                description=f"Event URL: {event_url}\n\nDate: {start_date_str}\n\nJoin this {event_category} event in Houston!",
-                                location=venue_name,
-                                latitude=float(lat) if lat else None,
-                                longitude=float(lon) if lon else None,
-                                category=category_map.get(event_category, 'Community'),
-                                image_url=e.get("images", [{}])[0].get("url") if e.get("images") else None,
-                                owner_id=None  # System-generated listing
-                            )
-
-                            db.session.add(listing)
-                            created_listings.append(listing.title)
-
-                except Exception as ex:
-                    print(f"Error fetching {event_category} events: {ex}")
-                    continue
-
-        # Commit all new listings
-        db.session.commit()
+                                pass
+                        candidates.append((e, start_date_str))
+
+                    # One existence query for the whole page; unchanged events skip the LLM call
+                    stored = existing_hashes(db.session, Listing, "ticketmaster", [str(e.get("id")) for e, _ in candidates])
+                    created_in_category = 0
+                    for e, start_date_str in candidates:
+                        normalized = normalize_ticketmaster(e, city="houston", state="TX", category=event_category)
+                        event_hash = content_hash(normalized, EVENT_FIELDS)
+                        if stored.get(normalized["external_id"]) == event_hash:
+                            continue
+                        pending.append((e, start_date_str, normalized, event_hash, event_category))
 
-        return jsonify({
-            "success": True,
-            "created": len(created_listings),
-            "skipped_past_events": len(skipped_events),
-            "sample_created": created_listings[:5],
-            "message": f"Successfully created {len(created_listings)} listings from future events"
+                        # Limit to 5 per category
+                        created_in_category += 1
+                        if created_in_category >= 5:
+                            break
+
+            except ProviderUnavailable:
+                break
+            except Exception as ex:
+                print(f"Error in AI agent for {event_category}: {ex}")
+                continue
+
+    # Describe every new event with a few batched Gemini requests instead of one call per event
+    ctx.update(progress=80)
+    descriptions = generate_descriptions(
+        model,
+        [{"id": n["external_id"], "name": e.get("name", "Event"), "category": cat} for e, _, n, _, cat in pending],
+        fallback=lambda ev: f"Join this {ev['category']} event in Houston!",
+    )
+    for e, start_date_str, normalized, event_hash, event_category in pending:
+        event_name = e.get("name", "Event")
+        event_url = e.get("url", "")
+
+        # Get best quality image
+        images = e.get("images", [])
+        best_image = max(images, key=lambda img: img.get("width", 0) * img.get("height", 0))
+
+        import_rows.append({
+            "source": "ticketmaster",
+            "external_id": normalized["external_id"],
+            "content_hash": event_hash,
+            "title": event_name[:200],
+            "description": f"{descriptions[normalized['external_id']]}\n\nEvent URL: {event_url}\nDate: {start_date_str}",
+            "location": normalized["venue"] or "Houston, TX",
+            "latitude": normalized["latitude"],
+            "longitude": normalized["longitude"],
+            "category": "Community",
+            "image_url": best_image.get("url"),
+            "owner_id": None,
         })
+        created_listings.append(event_name[:200])
 
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({"error": f"Agent error: {str(e)}"}), 500
+    upsert_by_external_id(db.session, Listing, import_rows, LISTING_IMPORT_FIELDS)
+    db.session.commit()
+
+    return {
+        "success": True,
+        "ai_analysis": {
+            "current_counts": category_counts,
+            "prioritized": priority_categories
+        },
+        "created": len(created_listings),
+        "listings": created_listings[:10],
+        "message": f"AI agent created {len(created_listings)} image-rich listings in priority categories"
+    }
 
 
-@app.route('/api/agent/ai-populate', methods=['POST'])
+@bp.route('/api/agent/ai-populate', methods=['POST'])
 def ai_populate_listings():
-    """AI-powered agent using Gemini to intelligently populate categories with image-rich events."""
-    try:
-        import google.generativeai as genai
-        from datetime import datetime as dt
+    """AI-powered agent using Gemini to intelligently populate categories with image-rich events.
 
-        gemini_key = os.environ.get('GEMINI_API_KEY')
-        if not gemini_key:
-            return jsonify({"error": "Gemini API key not configured"}), 500
+    Runs in the background; poll the returned status_url for progress.
+    """
+    if not os.environ.get('GEMINI_API_KEY'):
+        return jsonify({"error": "Gemini API key not configured"}), 500
+    return job_accepted_response(job_queue.submit('ai_populate'))
 
-        genai.configure(api_key=gemini_key)
-        model = genai.GenerativeModel('gemini-2.5-flash')
 
-        # Analyze current listings by category
-        all_listings = Listing.query.all()
-        category_counts = {}
-        for listing in all_listings:
-            cat = listing.category or 'Uncategorized'
-            category_counts[cat] = category_counts.get(cat, 0) + 1
+def city_refresh_key(city, state):
+    return city.strip().lower(), state.strip().upper()
 
-        # Ask Gemini which categories need more events
-        prompt = f"""Analyze these event category counts and suggest which 3 categories need more diversity:
-Categories: {category_counts}
 
-Available event types: music concerts, sports games, theater shows, art exhibitions, family activities, community gatherings.
+def claim_city_refresh(kind, city, state, ttl):
+    """Atomically claim a refresh of ``kind`` content for city/state.
 
-Respond with ONLY a JSON array of 3 category names to prioritize, like: ["music", "sports", "family"]"""
+    Returns False if the city was refreshed (or claimed by another request)
+    within the last ``ttl`` seconds. The claim stamps ``refreshed_at`` up
+    front so concurrent logins for the same city queue only one job.
+    """
+    city, state = city_refresh_key(city, state)
+    now = datetime.utcnow()
+    stale = db.or_(CityRefresh.refreshed_at.is_(None), CityRefresh.refreshed_at < now - timedelta(seconds=ttl))
+    claimed = CityRefresh.query.filter_by(kind=kind, city=city, state=state).filter(stale).update(
+        {'refreshed_at': now}, synchronize_session=False)
+    if claimed:
+        db.session.commit()
+        return True
+    if CityRefresh.query.filter_by(kind=kind, city=city, state=state).first():
+        db.session.rollback()
+        return False
+    try:
+        db.session.add(CityRefresh(kind=kind, city=city, state=state, refreshed_at=now))
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return False
+    return True
 
-        response = model.generate_content(prompt)
-        import json
-        try:
-            priority_categories = json.loads(response.text.strip())
-        except:
-            # Fallback if AI doesn't return valid JSON
-            priority_categories = ["music", "sports", "family"]
-
-        # Fetch events from priority categories (only with images)
-        tm_key = os.environ.get('TICKETMASTER_API_KEY')
-        created_listings = []
-        now = dt.now()
 
-        if tm_key:
-            for event_category in priority_categories[:3]:  # Top 3 priorities
-                try:
-                    url = "https://app.ticketmaster.com/discovery/v2/events"
-                    params = {
-                        "apikey": tm_key,
-                        "city": "Houston",
-                        "stateCode": "TX",
-                        "classificationName": event_category,
-                        "size": 15,
-                        "sort": "date,asc"
-                    }
-
-                    response_events = requests.get(url, params=response_events, timeout=10)
-                    if response_events.ok:
-                        data = response_events.json()
-                        events = data.get("_embedded", {}).get("events", [])
-
-                        for e in events:
-                            # ONLY process events with images
-                            if not e.get("images"):
-                                continue
-
-                            # Skip past events
-                            start_date_str = e.get("dates", {}).get("start", {}).get("dateTime") or e.get("dates", {}).get("start", {}).get("localDate")
-                            if start_date_str:
-                                try:
-                                    event_date = dt.fromisoformat(start_date_str.replace('Z', '+00:00'))
-                                    if event_date.date() < now.date():
-                                        continue
-                                except:
-                                    pass
-
-                            # Check if already exists
-                            event_url = e.get("url", "")
-                            existing = Listing.query.filter_by(description=f"Event URL: {event_url}").first()
-                            if existing:
-                                continue
-
-                            # Use Gemini to generate engaging description
-                            event_name = e.get("name", "Event")
-                            desc_prompt = f"Write a short, engaging 2-sentence description for this event: {event_name}. Make it exciting and community-focused."
+def set_city_refreshed(kind, city, state, when):
+    city, state = city_refresh_key(city, state)
+    row = CityRefresh.query.filter_by(kind=kind, city=city, state=state).first()
+    if row is None:
+        row = CityRefresh(kind=kind, city=city, state=state)
+        db.session.add(row)
+    row.refreshed_at = when
+    db.session.commit()
 
-                            try:
-                                desc_response = model.generate_content(desc_prompt)
-                                ai_description = desc_response.text.strip()
-                            except:
-                                ai_description = f"Join this {event_category} event in Houston!"
-
-                            # Extract venue
-                            venue = e.get("_embedded", {}).get("venues", [{}])[0]
-                            venue_name = venue.get("name", "Houston, TX")
-                            lat = venue.get("location", {}).get("latitude")
-                            lon = venue.get("location", {}).get("longitude")
-
-                            # Get best quality image
-                            images = e.get("images", [])
-                            best_image = max(images, key=lambda img: img.get("width", 0) * img.get("height", 0))
-
-                            listing = Listing(
-                                title=event_name[:200],
-                                description=f"{ai_description}\n\nEvent URL: {event_url}\nDate: {start_date_str}",
-                                location=venue_name,
-                                latitude=float(lat) if lat else None,
-                                longitude=float(lon) if lon else None,
-                                category="Community",
-                                image_url=best_image.get("url"),
-                                owner_id=None
-                            )
-
-                            db.session.add(listing)
-                            created_listings.append(listing.title)
-
-                            # Limit to 5 per category
-                            if len([l for l in created_listings if event_category in l.lower()]) >= 5:
-                                break
-
-                except Exception as ex:
-                    print(f"Error in AI agent for {event_category}: {ex}")
-                    continue
 
-        db.session.commit()
+def schedule_nightlife_refresh(city, state):
+    """Queue a Gemini nightlife refresh for city/state unless one ran within the TTL.
 
-        return jsonify({
-            "success": True,
-            "ai_analysis": {
-                "current_counts": category_counts,
-                "prioritized": priority_categories
-            },
-            "created": len(created_listings),
-            "listings": created_listings[:10],
-            "message": f"AI agent created {len(created_listings)} image-rich listings in priority categories"
-        })
+    Returns the queued job, or None if nothing was scheduled.
+    """
+    if not os.environ.get('GEMINI_API_KEY'):
+        return None
+    ttl = int(os.environ.get('NIGHTLIFE_REFRESH_TTL', 6 * 3600))
+    if not claim_city_refresh('nightlife', city, state, ttl):
+        return None
+    return job_queue.submit('gemini_nightlife', city=city, state=state)
 
-    except Exception as e:
+
+@job_queue.task('gemini_nightlife', resumable=True)
+def gemini_nightlife_job(ctx, city, state):
+    try:
+        result = populate_nightlife(ctx, city, state)
+    except Exception:
+        # Let the next login (or request) for this city try again
         db.session.rollback()
-        return jsonify({"error": f"AI Agent error: {str(e)}"}), 500
+        set_city_refreshed('nightlife', city, state, None)
+        raise
+    set_city_refreshed('nightlife', city, state, datetime.utcnow())
+    return result
+
+
+def populate_nightlife(ctx, city, state):
+    """Ask Gemini for upcoming nightlife events in city/state and add them as listings."""
+    import google.generativeai as genai
+    from datetime import datetime as dt
+
+    genai.configure(api_key=os.environ.get('GEMINI_API_KEY'))
+    model = genai.GenerativeModel('gemini-2.5-flash')
+
+    # Prompt Gemini to search for upcoming nightclub events in the city/state
+    today = dt.now().strftime('%B %d, %Y')
+    prompt = (
+        f"""
+        Find 5 upcoming nightclub or nightlife events in {city}, {state}, United States, happening after {today}.
+        For each event, return a JSON object with: name, date, venue, address, url (if available), and a 1-sentence description.
+        Respond with ONLY a JSON array of event objects, no extra text.
+        """
+    )
+
+    reply = cached_generate(model, prompt, 'nightlife', validate=is_json)
+    ctx.update(progress=50)
+    try:
+        events = parse_json(reply)
+    except Exception as ex:
+        raise ValueError(f"Gemini did not return valid JSON: {str(ex)}")
+
+    created = []
+    now = dt.now()
+    for e in events:
+        # Check for required fields
+        name = e.get('name')
+        date_str = e.get('date')
+        venue = e.get('venue') or city
+        address = e.get('address') or f"{city}, {state}"
+        url = e.get('url')
+        description = e.get('description') or ''
+
+        # Skip if missing name or date
+        if not name or not date_str:
+            continue
+
+        # Skip past events if date is parseable
+        try:
+            event_date = dt.fromisoformat(date_str)
+            if event_date.date() < now.date():
+                continue
+        except Exception:
+            pass  # If date can't be parsed, include anyway
+
+        # Check for duplicate (by name, date, and venue)
+        existing = Listing.query.filter_by(title=name, location=venue).first()
+        if existing:
+            continue
+
+        listing = Listing(
+            title=name[:200],
+            description=f"{description}\n\nEvent URL: {url or ''}\nDate: {date_str}",
+            location=venue,
+            latitude=None,
+            longitude=None,
+            category='Nightlife',
+            image_url=None,
+            owner_id=None
+        )
+        db.session.add(listing)
+        created.append(name)
 
+    db.session.commit()
+
+    return {
+        "success": True,
+        "created": len(created),
+        "listings": created,
+        "city": city,
+        "state": state,
+        "message": f"Added {len(created)} nightlife events for {city}, {state} via Gemini."
+    }
 
 
 # --- Gemini-powered Nightlife Event Enrichment Endpoint ---
-@app.route('/api/agent/gemini-nightlife-events', methods=['POST'])
+@bp.route('/api/agent/gemini-nightlife-events', methods=['POST'])
 def gemini_nightlife_events():
     """
     Use Gemini to search for local nightclub events in a given city/state and add them as local listings.
     Request JSON: {"city": "CityName", "state": "StateCode"}
+    Runs in the background; poll the returned status_url for progress.
     """
-    try:
-        import google.generativeai as genai
-        from datetime import datetime as dt
+    if not os.environ.get('GEMINI_API_KEY'):
+        return jsonify({"error": "Gemini API key not configured"}), 500
 
-        gemini_key = os.environ.get('GEMINI_API_KEY')
-        if not gemini_key:
-            return jsonify({"error": "Gemini API key not configured"}), 500
-
-        data = request.get_json() or {}
-        city = data.get('city', 'Houston')
-        state = data.get('state', 'TX')
-        if not city or not state:
-            return jsonify({"error": "city and state required"}), 400
-
-        genai.configure(api_key=gemini_key)
-        model = genai.GenerativeModel('gemini-2.5-flash')
-
-        # Prompt Gemini to search for upcoming nightclub events in the city/state
-        today = dt.now().strftime('%B %d, %Y')
-        prompt = (
-            f"""
-            Find 5 upcoming nightclub or nightlife events in {city}, {state}, United States, happening after {today}.
-            For each event, return a JSON object with: name, date, venue, address, url (if available), and a 1-sentence description.
-            Respond with ONLY a JSON array of event objects, no extra text.
-            """
-        )
+    data = request.get_json() or {}
+    city = data.get('city', 'Houston')
+    state = data.get('state', 'TX')
+    if not city or not state:
+        return jsonify({"error": "city and state required"}), 400
+    return job_accepted_response(job_queue.submit('gemini_nightlife', city=city, state=state))
 
-        response = model.generate_content(prompt)
-        import json
-        try:
-            events = json.loads(response.text.strip())
-        except Exception as ex:
-            return jsonify({"error": f"Gemini did not return valid JSON: {str(ex)}", "raw": response.text}), 502
 
-        created = []
-        now = dt.now()
-        for e in events:
-            # Check for required fields
-            name = e.get('name')
-            date_str = e.get('date')
-            venue = e.get('venue') or city
-            address = e.get('address') or f"{city}, {state}"
-            url = e.get('url')
-            description = e.get('description') or ''
-
-            # Skip if missing name or date
-            if not name or not date_str:
-                continue
+# Apps whose engines a forked child must drop. The fork hook is registered
+# once per process; weak references let discarded apps (tests) go away
+_fork_apps = weakref.WeakSet()
 
-            # Skip past events if date is parseable
-            try:
-                event_date = dt.fromisoformat(date_str)
-                if event_date.date() < now.date():
-                    continue
-            except Exception:
-                pass  # If date can't be parsed, include anyway
-
-            # Check for duplicate (by name, date, and venue)
-            existing = Listing.query.filter_by(title=name, location=venue).first()
-            if existing:
-                continue
 
-            listing = Listing(
-                title=name[:200],
-                description=f"{description}\n\nEvent URL: {url or ''}\nDate: {date_str}",
-                location=venue,
-                latitude=None,
-                longitude=None,
-                category='Nightlife',
-                image_url=None,
-                owner_id=None
-            )
-            db.session.add(listing)
-            created.append(name)
+def _dispose_engines_after_fork():
+    """Drop pooled connections inherited from the parent in forked workers.
 
-        db.session.commit()
+    With ``gunicorn --preload`` the app is built once and the workers fork
+    from it; a connection shared across processes corrupts both ends, so the
+    child forgets the parent's pool (without closing it) and opens its own.
+    """
+    for app in list(_fork_apps):
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+    replica_router.dispose(close=False)
+
+
+if hasattr(os, 'register_at_fork'):  # Windows has no fork
+    os.register_at_fork(after_in_child=_dispose_engines_after_fork)
+
+
+def create_app(config=None):
+    """Build the Flask app.
+
+    Creating the app migrates the database to the latest alembic revision
+    (``schema.upgrade``) unless ``SCHEMA_UPGRADE=off``, for deployments that
+    run ``python manage.py upgrade`` themselves. ``config`` overrides the
+    settings read from the environment.
+    """
+    load_env()
+    app = Flask(__name__)
+    # Allow overriding the database URL via environment (useful for CI or production)
+    default_db = 'sqlite:///' + os.path.join(base_dir, 'data.db')
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('SQLALCHEMY_DATABASE_URI', default_db)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Secret key used for serializer tokens and other Flask features
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key')
+    app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', app.config['SECRET_KEY'])
+    app.config['SECURITY_PASSWORD_SALT'] = os.environ.get('SECURITY_PASSWORD_SALT', 'dev-salt')
+    # Requeue jobs orphaned by a previous process once this one starts serving
+    app.config['JOBS_RECOVER'] = os.environ.get('JOB_RECOVER', 'on').lower() not in ('0', 'off', 'false', 'no')
+    app.config['SCHEMA_UPGRADE'] = os.environ.get('SCHEMA_UPGRADE', 'on').lower() not in ('0', 'off', 'false', 'no')
+    app.config.update(config or {})
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS',
+                          database_engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+
+    # First, so request latency covers the hooks registered below
+    metrics.init_app(app)
+    # On-demand and sampled cProfile runs (see profiling.py)
+    request_profiler.init_app(app)
+    memory_diagnostics.init_app(app)
+    CORS(app)
+    db.init_app(app)
+    # Set up the model mappers now instead of on the first query, so forked
+    # workers inherit them; this needs no connection
+    configure_mappers()
+    jwt.init_app(app)
+    # Optional read replicas for GET traffic (see replicas.py)
+    replica_router.init_app(app, database_engine_options)
+    query_stats.init_app(app)
+    job_queue.init_app(app, db, Job)
+    app.register_blueprint(bp)
+    if app.config['SCHEMA_UPGRADE']:
+        with app.app_context():
+            schema.upgrade(db.engine)
+    _fork_apps.add(app)
+    _warn_on_default_secrets(app)
+
+    if os.environ.get('INGEST_IN_PROCESS', 'false').lower() in ('1', 'true', 'yes'):
+        start_ingestion_scheduler(app)
+    return app
+
+
+_app_lock = threading.Lock()
+
+
+def __getattr__(name):
+    # ``app`` (for ``flask --app app``, gunicorn ``app:app``, scripts and tests)
+    # is built on first access, so importing this module has no side effects
+    global app
+    if name != 'app':
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _app_lock:
+        if 'app' not in globals():
+            app = create_app()
+    return app
 
-        return jsonify({
-            "success": True,
-            "created": len(created),
-            "listings": created,
-            "city": city,
-            "state": state,
-            "message": f"Added {len(created)} nightlife events for {city}, {state} via Gemini."
-        })
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({"error": f"Gemini nightlife agent error: {str(e)}"}), 500
 
 if __name__ == '__main__':
+    app = create_app()
     app.run(debug=True, port=5000)
@@ -0,0 +1,141 @@
+"""Sliding-window attempt limits for the authentication endpoints.
+
+Password hashing is deliberately slow, so a burst of login attempts can use
+up a worker's CPU. Every attempt at ``/login``, ``/register`` and
+``/reset-password`` is first counted against per-IP and (where the request
+names one) per-email windows. Over-limit attempts are refused before any
+hash is computed.
+
+The window is the usual two-bucket approximation: the count of the previous
+fixed window is weighted by how much of it still overlaps the sliding
+window, and the current window may take whatever allowance is left.
+
+Counters live in each worker's memory, so a check is a few dict and list
+operations and takes no lock: an attempt appends to its window's list and
+takes it back if that went over the allowance. Concurrent attempts can only
+see a longer list than their own, so races refuse an attempt early and
+never let one through. The cost is that every worker keeps its own counts.
+With N workers a client spread across them gets up to N times the limit,
+but no worker hashes more than the limit.
+
+Set ``AUTH_RATE_LIMIT_BACKEND=local_store`` to count in the shared local
+store (``local_store``) instead, so the limits hold across all workers on
+the host. A check then reads the previous (closed) window and makes one
+conditional increment of the current one, a single write transaction.
+
+Limits are ``(attempts, window seconds)`` and can be overridden with
+``AUTH_RATE_LIMIT_<ENDPOINT>_<SCOPE>=<attempts>/<seconds>``, e.g.
+``AUTH_RATE_LIMIT_LOGIN_EMAIL=5/300``. ``AUTH_RATE_LIMIT=off`` disables
+them.
+"""
+import hashlib
+import math
+import os
+import time
+
+from local_store import get_store
+
+
+DEFAULT_LIMITS = {
+    'login': {'ip': (30, 60), 'email': (10, 300)},
+    'register': {'ip': (10, 3600)},
+    'reset': {'ip': (10, 3600), 'email': (5, 3600)},
+}
+SWEEP_SECONDS = 60
+
+# (key, window seconds, window number) -> one entry per attempt allowed in it
+_hits = {}
+_next_sweep = 0.0
+
+
+def _limit(endpoint, scope):
+    default = DEFAULT_LIMITS[endpoint][scope]
+    raw = os.environ.get(f'AUTH_RATE_LIMIT_{endpoint.upper()}_{scope.upper()}')
+    if not raw:
+        return default
+    try:
+        attempts, seconds = raw.split('/')
+        return int(attempts), float(seconds)
+    except ValueError:
+        return default
+
+
+def sliding_window_hit(hits, key, limit, window, now):
+    """Record one attempt for ``key`` in ``hits``; return (allowed, retry_after seconds)."""
+    current = int(now // window)
+    elapsed = (now % window) / window
+    previous = len(hits.get((key, window, current - 1), ()))
+    carried = previous * (1 - elapsed)
+    attempts = hits.setdefault((key, window, current), [])
+    attempts.append(now)
+    if len(attempts) <= max(0, math.floor(limit - carried)):
+        return True, 0.0
+    attempts.pop()
+    return False, _retry_after(limit, len(attempts), previous, elapsed, window)
+
+
+def store_window_hit(store, key, limit, window, now):
+    """Like ``sliding_window_hit``, counting in the shared local ``store``."""
+    current = int(now // window)
+    elapsed = (now % window) / window
+    # the previous window is closed, so reading it apart from the increment is safe
+    previous = store.get(f'{key}:{current - 1}', now=now)
+    carried = previous * (1 - elapsed)
+    allowed, count = store.incr(f'{key}:{current}', limit=max(0, math.floor(limit - carried)),
+                                ttl=2 * window, now=now)
+    if allowed:
+        return True, 0.0
+    return False, _retry_after(limit, count, previous, elapsed, window)
+
+
+def _retry_after(limit, count, previous, elapsed, window):
+    remaining = (1 - elapsed) * window
+    if count >= limit or not previous:
+        return remaining
+    # Wait until enough of the previous window's weight has slid out
+    wait = (1 - elapsed - (limit - 1 - count) / previous) * window
+    return min(remaining, max(0.0, wait))
+
+
+def _sweep(now):
+    """Drop windows that can no longer be counted."""
+    global _next_sweep
+    if now < _next_sweep:
+        return
+    _next_sweep = now + SWEEP_SECONDS
+    for key in list(_hits):
+        if key[2] < now // key[1] - 1:
+            _hits.pop(key, None)
+
+
+def clear():
+    global _next_sweep
+    _hits.clear()
+    _next_sweep = 0.0
+
+
+def _email_key(email):
+    return hashlib.sha256(email.strip().lower().encode('utf-8')).hexdigest()[:16]
+
+
+def check_auth_limits(endpoint, ip, email=None, now=None):
+    """Count an attempt at ``endpoint``; return None if allowed, else seconds to wait."""
+    if os.environ.get('AUTH_RATE_LIMIT', 'on').lower() in ('0', 'off', 'false', 'no'):
+        return None
+    now = time.time() if now is None else now
+    shared = os.environ.get('AUTH_RATE_LIMIT_BACKEND', 'memory').lower() == 'local_store'
+    if not shared:
+        _sweep(now)
+    keys = [('ip', ip or 'unknown')]
+    if email and 'email' in DEFAULT_LIMITS[endpoint]:
+        keys.append(('email', _email_key(email)))
+    for scope, value in keys:
+        limit, window = _limit(endpoint, scope)
+        key = f'auth:{endpoint}:{scope}:{value}'
+        if shared:
+            allowed, retry_after = store_window_hit(get_store(), key, limit, window, now)
+        else:
+            allowed, retry_after = sliding_window_hit(_hits, key, limit, window, now)
+        if not allowed:
+            return max(1, int(retry_after + 0.999))
+    return None
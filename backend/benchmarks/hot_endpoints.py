@@ -0,0 +1,356 @@
+"""Throughput and latency of the hot endpoints on seeded datasets.
+
+For each dataset size (listings, with users, sign-ups and reviews in
+proportion) a SQLite database is seeded by ``synthetic_data.py`` once and kept in ``--db-dir`` for
+later runs. Each scenario is then driven by ``--concurrency`` threads until
+``--requests`` requests are done or ``--max-seconds`` have passed:
+
+- ``listings``: ``GET /listings`` without filters;
+- ``listings_category``, ``listings_search``, ``listings_location``: the
+  same with ``q=<category>``, ``q=<word>`` and ``location=<city>``;
+- ``listing_detail``, ``reviews``, ``average_rating``: per-listing reads
+  of random listings;
+- ``login``: ``POST /login`` for seeded users;
+- ``register``: ``POST /register`` of new users;
+- ``listing_signup``: ``POST /listings/<id>/signup``.
+
+Requests go through the Flask test client in this process, or with
+``--url`` to a running server (start it against the database file printed
+by ``--seed-only``). Results, with p50/p95/p99 latency and requests per
+second, are written as JSON. ``--compare`` prints the change from an
+earlier results file and exits with status 1 when a scenario's p95 got
+worse by more than ``--tolerance``:
+
+    python benchmarks/hot_endpoints.py [--sizes 10k,100k,1m] [--concurrency 8]
+        [--scenarios listings,login] [--out results.json] [--compare old.json]
+"""
+import argparse
+import datetime
+import http.client
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+# Every client shares one IP, and login must not queue Gemini jobs
+os.environ.setdefault('AUTH_RATE_LIMIT', 'off')
+os.environ.setdefault('LOCAL_STORE', 'memory')
+os.environ.setdefault('LLM_CACHE', 'off')
+os.environ.setdefault('JOB_RECOVER', 'off')
+os.environ.setdefault('METRICS_DIR', 'off')
+os.environ['GEMINI_API_KEY'] = ''
+# the unfiltered listing scans would flood the output with slow-query warnings
+logging.getLogger('query_stats').setLevel(logging.ERROR)
+
+from synthetic_data import CATEGORY_WEIGHTS, SyntheticData  # noqa: E402
+
+PASSWORD = 'benchmark-pw'
+GENERATOR = SyntheticData(password=PASSWORD)
+CATEGORIES = list(CATEGORY_WEIGHTS)
+CITIES = [metro.name for metro in GENERATOR.metros]
+# words from the generator's titles and descriptions
+WORDS = ['cleanup', 'tutoring', 'garden', 'shelter', 'food', 'park', 'library', 'clinic']
+SCENARIOS = ('listings', 'listings_category', 'listings_search', 'listings_location', 'listing_detail',
+             'reviews', 'average_rating', 'login', 'register', 'listing_signup')
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    factor = {'k': 1000, 'm': 1000000}.get(text[-1], 1)
+    return int(float(text.rstrip('km')) * factor)
+
+
+def dataset_counts(listings):
+    """Users, sign-ups and reviews in proportion to ``listings``."""
+    return {"listings": listings, "users": max(100, listings // 10),
+            "signups": 2 * listings, "reviews": listings}
+
+
+# -- seeding -----------------------------------------------------------------
+
+def seed(db_path, listings):
+    from app import create_app, db
+
+    counts = dataset_counts(listings)
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}'})
+    with app.app_context():
+        db.create_all()
+        GENERATOR.load(db.session, counts["users"], listings, counts["signups"] / listings,
+                       counts["reviews"] / listings)
+        db.session.remove()
+        db.engine.dispose()
+
+
+def ensure_dataset(db_dir, listings, reseed=False):
+    os.makedirs(db_dir, exist_ok=True)
+    path = os.path.join(db_dir, f'listings-{listings}.db')
+    if reseed or not os.path.exists(path):
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        started = time.perf_counter()
+        seed(path, listings)
+        print(f"seeded {path} in {time.perf_counter() - started:.1f} s", flush=True)
+    return path
+
+
+# -- drivers -----------------------------------------------------------------
+
+class TestClientDriver:
+    """Requests through the Flask test client of an app in this process."""
+
+    def __init__(self, db_path):
+        from app import create_app
+        self.app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}'})
+        self._local = threading.local()
+
+    def request(self, method, path, body=None, headers=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        resp = client.open(path, method=method, json=body, headers=headers)
+        return resp.status_code, resp.get_json(silent=True)
+
+    def close(self):
+        from app import db
+        with self.app.app_context():
+            db.engine.dispose()
+
+
+class HttpDriver:
+    """Requests to a running server, one keep-alive connection per thread."""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self._local = threading.local()
+
+    def request(self, method, path, body=None, headers=None):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        headers = dict(headers or {})
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        try:
+            conn.request(method, path, body=payload, headers=headers)
+            resp = conn.getresponse()
+            data = resp.read()
+        except (OSError, http.client.HTTPException):
+            self._local.conn = None
+            conn.close()
+            raise
+        try:
+            return resp.status, json.loads(data) if data else None
+        except ValueError:
+            return resp.status, None
+
+    def close(self):
+        pass
+
+
+# -- scenarios ---------------------------------------------------------------
+
+def build_scenarios(driver, listings, concurrency, rnd):
+    """``{name: (make_request, expected_status)}``; ``make_request(i)`` returns request arguments."""
+    users = dataset_counts(listings)["users"]
+    run = uuid.uuid4().hex[:8]
+
+    # fresh users so sign-ups never collide with seeded ones
+    tokens = []
+    for i in range(concurrency):
+        status, body = driver.request('POST', '/register',
+                                      {"email": f"bench-{run}-{i}@example.com", "password": PASSWORD})
+        if status != 201:
+            raise SystemExit(f"could not register a benchmark user: {status} {body}")
+        tokens.append({'Authorization': f"Bearer {body['access_token']}"})
+    next_listing = iter(range(1, 10 ** 12))
+    lock = threading.Lock()
+
+    def signup(i):
+        with lock:
+            listing_id = (next(next_listing) - 1) % listings + 1
+        return 'POST', f'/listings/{listing_id}/signup', {"message": "benchmark"}, tokens[i % concurrency]
+
+    listing_id = lambda: rnd.randint(1, listings)  # noqa: E731
+    return {
+        'listings': (lambda i: ('GET', '/listings', None, None), 200),
+        'listings_category': (lambda i: ('GET', f'/listings?q={rnd.choice(CATEGORIES)}', None, None), 200),
+        'listings_search': (lambda i: ('GET', f'/listings?q={rnd.choice(WORDS)}', None, None), 200),
+        'listings_location': (lambda i: ('GET', f'/listings?location={rnd.choice(CITIES).replace(" ", "%20")}',
+                                         None, None), 200),
+        'listing_detail': (lambda i: ('GET', f'/listings/{listing_id()}', None, None), 200),
+        'reviews': (lambda i: ('GET', f'/listings/{listing_id()}/reviews', None, None), 200),
+        'average_rating': (lambda i: ('GET', f'/listings/{listing_id()}/average-rating', None, None), 200),
+        'login': (lambda i: ('POST', '/login', {"email": f"user{rnd.randint(1, users)}@example.com",
+                                                "password": PASSWORD}, None), 200),
+        'register': (lambda i: ('POST', '/register', {"email": f"new-{run}-{uuid.uuid4().hex}@example.com",
+                                                      "password": PASSWORD}, None), 201),
+        'listing_signup': (signup, 201),
+    }
+
+
+def percentile(sorted_values, q):
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    return statistics.quantiles(sorted_values, n=100, method='inclusive')[q - 1]
+
+
+def drive(driver, make_request, expected, concurrency, total, max_seconds):
+    latencies, errors = [], []
+    lock = threading.Lock()
+    issued = iter(range(total))
+    deadline = time.perf_counter() + max_seconds
+
+    def worker(i):
+        while time.perf_counter() < deadline:
+            with lock:
+                if next(issued, None) is None:
+                    return
+            method, path, body, headers = make_request(i)
+            started = time.perf_counter()
+            try:
+                status, _ = driver.request(method, path, body, headers)
+            except Exception as ex:  # a dropped connection counts as an error, not a crash
+                status = type(ex).__name__
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if status != expected:
+                    errors.append(status)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    ms = lambda s: round(s * 1000, 2)  # noqa: E731
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "error_statuses": sorted({str(e) for e in errors}),
+        "rps": round(len(latencies) / wall, 1) if wall else None,
+        "p50_ms": ms(percentile(latencies, 50)) if latencies else None,
+        "p95_ms": ms(percentile(latencies, 95)) if latencies else None,
+        "p99_ms": ms(percentile(latencies, 99)) if latencies else None,
+        "max_ms": ms(latencies[-1]) if latencies else None,
+    }
+
+
+# -- results -----------------------------------------------------------------
+
+def run_metadata(args):
+    try:
+        rev = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND,
+                             capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        rev = None
+    return {
+        "started_at": datetime.datetime.utcnow().isoformat() + 'Z',
+        "git_rev": rev,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "driver": args.url or 'test_client',
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "max_seconds": args.max_seconds,
+    }
+
+
+def compare(old, new, tolerance):
+    """Print p95 and throughput changes; return the scenarios whose p95 regressed."""
+    regressions = []
+    for size, scenarios in new["results"].items():
+        for name, result in scenarios.items():
+            before = old.get("results", {}).get(size, {}).get(name)
+            if not before or not before.get("p95_ms") or not result.get("p95_ms"):
+                continue
+            change = result["p95_ms"] / before["p95_ms"] - 1
+            rps_change = result["rps"] / before["rps"] - 1 if before.get("rps") else 0.0
+            flag = ''
+            if change > tolerance:
+                flag = '  REGRESSION'
+                regressions.append(f'{size}/{name}')
+            print(f"  {size:>8} {name:<18} p95 {before['p95_ms']:>9} -> {result['p95_ms']:>9} ms ({change:+.0%})"
+                  f"   rps {rps_change:+.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10k', help='comma-separated listing counts, e.g. 10k,100k,1m')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=500, help='requests per scenario')
+    parser.add_argument('--max-seconds', type=float, default=30, help='time budget per scenario')
+    parser.add_argument('--db-dir', default=os.path.join(tempfile.gettempdir(), 'tapin_bench'))
+    parser.add_argument('--reseed', action='store_true', help='rebuild the datasets even if present')
+    parser.add_argument('--seed-only', action='store_true', help='build the datasets and exit')
+    parser.add_argument('--url', help='drive a running server instead of an in-process app')
+    parser.add_argument('--out', help='results file (default: hot_endpoints-<time>.json)')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed p95 increase (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    sizes = [parse_size(s) for s in args.sizes.split(',')]
+
+    output = {"meta": run_metadata(args), "results": {}}
+    for listings in sizes:
+        db_path = ensure_dataset(args.db_dir, listings, args.reseed)
+        if args.seed_only:
+            continue
+        driver = HttpDriver(args.url) if args.url else TestClientDriver(db_path)
+        rnd = random.Random(listings)
+        available = build_scenarios(driver, listings, args.concurrency, rnd)
+        print(f"{listings} listings, {args.concurrency} concurrent clients", flush=True)
+        results = output["results"][str(listings)] = {}
+        for name in scenarios:
+            make_request, expected = available[name]
+            result = results[name] = drive(driver, make_request, expected, args.concurrency,
+                                           args.requests, args.max_seconds)
+            print(f"  {name:<18} {result['requests']:>6} req {result['rps']:>9} req/s   "
+                  f"p50 {result['p50_ms']} p95 {result['p95_ms']} p99 {result['p99_ms']} ms"
+                  f"{'   errors ' + str(result['errors']) if result['errors'] else ''}", flush=True)
+        driver.close()
+    if args.seed_only:
+        return
+
+    out = args.out or f"hot_endpoints-{datetime.datetime.utcnow():%Y%m%dT%H%M%S}.json"
+    with open(out, 'w') as f:
+        json.dump(output, f, indent=2)
+    print(f"results written to {out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        print(f"compared with {args.compare}:")
+        regressions = compare(old, output, args.tolerance)
+        if regressions:
+            print(f"p95 regressed by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
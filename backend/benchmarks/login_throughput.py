@@ -0,0 +1,103 @@
+"""Login throughput with password hashing inline vs. in the process pool.
+
+Runs concurrent logins through the Flask test client while another thread
+keeps calling a cheap endpoint, and reports login throughput plus the
+latency of the cheap requests (which is what suffers when hashing holds the
+GIL). Each configuration runs in a fresh interpreter against a throwaway
+SQLite database:
+
+    python benchmarks/login_throughput.py [--logins 200] [--threads 8] [--method scrypt]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_once(logins, threads):
+    sys.path.insert(0, BACKEND)
+    from app import app, db, User
+    from passwords import hash_password
+
+    with app.app_context():
+        db.create_all()
+        pw_hash = hash_password('benchmark-pw')
+        db.session.add_all([User(email=f'bench{i}@example.com', password_hash=pw_hash) for i in range(threads)])
+        db.session.commit()
+
+    done = threading.Event()
+    probe_latencies = []
+
+    def probe():
+        client = app.test_client()
+        while not done.is_set():
+            start = time.perf_counter()
+            client.get('/api/items')
+            probe_latencies.append(time.perf_counter() - start)
+            time.sleep(0.005)
+
+    def login_worker(i, count):
+        client = app.test_client()
+        for _ in range(count):
+            resp = client.post('/login', json={'email': f'bench{i}@example.com', 'password': 'benchmark-pw'})
+            assert resp.status_code == 200, resp.get_data(as_text=True)
+
+    prober = threading.Thread(target=probe)
+    prober.start()
+    per_thread = max(1, logins // threads)
+    workers = [threading.Thread(target=login_worker, args=(i, per_thread)) for i in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    prober.join()
+
+    probe_latencies.sort()
+    return {
+        "logins_per_sec": round(per_thread * threads / elapsed, 1),
+        "probe_p50_ms": round(statistics.median(probe_latencies) * 1000, 2),
+        "probe_p95_ms": round(probe_latencies[int(len(probe_latencies) * 0.95) - 1] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--method', default='scrypt', help='PASSWORD_HASH_METHOD to benchmark')
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1),
+                        help='PASSWORD_HASH_WORKERS for the pooled run')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_once(args.logins, args.threads)))
+        return
+
+    for label, workers in (('inline', 0), (f'pool({args.workers})', args.workers)):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ,
+                       PASSWORD_HASH_METHOD=args.method,
+                       PASSWORD_HASH_WORKERS=str(workers),
+                       SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                       LOCAL_STORE='memory', LLM_CACHE='off', GEMINI_API_KEY='')
+            out = subprocess.run(
+                [sys.executable, __file__, '--child', '--logins', str(args.logins), '--threads', str(args.threads)],
+                env=env, cwd=BACKEND, capture_output=True, text=True, check=True)
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{label:>10}: {result['logins_per_sec']:>7} logins/s   "
+              f"other requests p50 {result['probe_p50_ms']} ms, p95 {result['probe_p95_ms']} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Read/write throughput of a SQLite file under several worker processes.
+
+Each worker process opens its own SQLAlchemy engine (as a gunicorn worker
+would) and runs a mix of point reads and small write transactions against a
+shared database file for a fixed duration. The run is repeated with the
+legacy engine settings (rollback journal, no pragmas) and with the
+``sqlite_profile`` settings, and reports operations per second and how many
+operations failed with "database is locked":
+
+    python benchmarks/sqlite_concurrency.py [--workers 4] [--seconds 5] [--write-ratio 0.2]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+from sqlalchemy import create_engine, text  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+
+ROWS = 5000
+
+
+def make_engine(url, profile):
+    if profile:
+        import sqlite_profile
+        os.environ['SQLITE_BEGIN_MODE'] = 'immediate' if profile == 'immediate' else 'deferred'
+        return create_engine(url, **sqlite_profile.engine_options(url))
+    # What app.py configured before: Postgres pool settings, no pragmas
+    return create_engine(url, pool_pre_ping=True, pool_recycle=300, pool_size=5, max_overflow=10,
+                         connect_args={})
+
+
+def setup(url):
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text('DROP TABLE IF EXISTS item'))
+        conn.execute(text('CREATE TABLE item (id INTEGER PRIMARY KEY, name TEXT, hits INTEGER)'))
+        conn.execute(text('INSERT INTO item (id, name, hits) VALUES (:id, :name, 0)'),
+                     [{"id": i, "name": f"item {i}"} for i in range(ROWS)])
+    engine.dispose()
+
+
+def worker(url, profile, seconds, write_ratio, results):
+    if not profile:
+        import sqlite_profile  # noqa: F401  (listeners are global; keep them off for the legacy run)
+        os.environ['SQLITE_BEGIN_MODE'] = 'deferred'
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+        event.remove(Engine, 'connect', sqlite_profile._on_connect)
+    engine = make_engine(url, profile)
+    reads = writes = locked = 0
+    deadline = time.perf_counter() + seconds
+    rnd = random.Random(os.getpid())
+    while time.perf_counter() < deadline:
+        item_id = rnd.randrange(ROWS)
+        try:
+            if rnd.random() < write_ratio:
+                # read-then-write, like a request that loads a row and updates it
+                with engine.begin() as conn:
+                    conn.execute(text('SELECT hits FROM item WHERE id = :id'), {"id": item_id}).scalar()
+                    conn.execute(text('UPDATE item SET hits = hits + 1 WHERE id = :id'), {"id": item_id})
+                writes += 1
+            else:
+                with engine.connect() as conn:
+                    conn.execute(text('SELECT name, hits FROM item WHERE id = :id'), {"id": item_id}).first()
+                reads += 1
+        except OperationalError as ex:
+            if 'locked' not in str(ex) and 'busy' not in str(ex):
+                raise
+            locked += 1
+    results.put((reads, writes, locked))
+    engine.dispose()
+
+
+def run(profile, workers, seconds, write_ratio):
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        setup(url)
+        results = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=worker, args=(url, profile, seconds, write_ratio, results))
+                 for _ in range(workers)]
+        for p in procs:
+            p.start()
+        totals = [results.get() for _ in procs]
+        for p in procs:
+            p.join()
+    reads, writes, locked = (sum(col) for col in zip(*totals))
+    return reads / seconds, writes / seconds, locked
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    args = parser.parse_args()
+    for label, profile in (('legacy', None), ('wal', 'deferred'), ('wal+immediate', 'immediate')):
+        reads, writes, locked = run(profile, args.workers, args.seconds, args.write_ratio)
+        print(f"{label:>14}: {reads:9.0f} reads/s  {writes:8.0f} writes/s  {locked:6d} 'database is locked' errors")
+
+
+if __name__ == '__main__':
+    main()
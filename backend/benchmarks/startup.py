@@ -0,0 +1,67 @@
+"""Import time and cold start of the backend.
+
+Each run is a fresh interpreter (as a new gunicorn worker or a CLI script
+would be) that measures, against an empty SQLite file:
+
+- ``import app``: what every script, test run and alembic invocation pays;
+- ``app.app``: building the application object;
+- first request: ``GET /api/items``, including the first connection.
+
+Pass ``--backend`` to time another checkout of ``backend/`` (e.g. a
+``git worktree`` of an older revision) with the same script:
+
+    python benchmarks/startup.py [--runs 10] [--backend path/to/backend]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r'''
+import json, sys, time
+t0 = time.perf_counter()
+import app as module
+t1 = time.perf_counter()
+flask_app = module.app
+t2 = time.perf_counter()
+with flask_app.app_context():
+    module.db.create_all()  # not timed: stands in for an alembic-migrated database
+t3 = time.perf_counter()
+status = flask_app.test_client().get('/api/items').status_code
+t4 = time.perf_counter()
+json.dump({"import": t1 - t0, "app": t2 - t1, "first_request": t4 - t3, "status": status}, sys.stdout)
+'''
+
+
+def run_once(backend):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ,
+                   SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                   LOCAL_STORE='memory', LLM_CACHE='off', JOB_RECOVER='off')
+        out = subprocess.run([sys.executable, '-c', PROBE], cwd=backend, env=env,
+                             capture_output=True, text=True, check=True)
+    return json.loads(out.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--backend', default=BACKEND)
+    args = parser.parse_args()
+
+    runs = [run_once(args.backend) for _ in range(args.runs)]
+    print(f"{args.backend} ({args.runs} runs, median / max in ms)")
+    for key in ('import', 'app', 'first_request'):
+        values = [r[key] * 1000 for r in runs]
+        print(f"  {key:<14} {statistics.median(values):8.1f} {max(values):8.1f}")
+    total = [(r['import'] + r['app'] + r['first_request']) * 1000 for r in runs]
+    print(f"  {'cold start':<14} {statistics.median(total):8.1f} {max(total):8.1f}")
+
+
+if __name__ == '__main__':
+    main()
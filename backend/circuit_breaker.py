@@ -0,0 +1,202 @@
+"""Per-provider circuit breakers for outbound event API calls.
+
+Each external provider (Ticketmaster, SeatGeek, SerpApi, ...) gets its own
+breaker. The breaker watches the outcome of the most recent calls and, when
+the failure rate crosses a threshold, "opens" so that callers skip the
+provider immediately instead of waiting on a timeout. After a cool-down the
+breaker goes "half-open" and lets a limited number of probe requests through;
+a successful probe closes it again, a failed one re-opens it.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is attempted while the provider's circuit is open."""
+
+    def __init__(self, name, retry_after=None):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"{name} is temporarily unavailable (circuit open)")
+
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker with a sliding window of recent calls.
+
+    - ``failure_rate``: fraction of failed calls (0..1) that trips the breaker.
+    - ``minimum_calls``: the window must hold at least this many outcomes
+      before the failure rate is evaluated.
+    - ``window_size``: number of most recent outcomes considered.
+    - ``reset_timeout``: seconds to stay open before allowing probes.
+    - ``half_open_max_calls``: concurrent probe requests allowed when half-open.
+    """
+
+    def __init__(self, name, failure_rate=0.5, minimum_calls=5, window_size=20,
+                 reset_timeout=30.0, half_open_max_calls=1, clock=time.monotonic):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.minimum_calls = minimum_calls
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window_size)
+        self._state = CLOSED
+        self._opened_at = None
+        self._probes_in_flight = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        # Caller must hold the lock. Transition open -> half-open lazily once
+        # the reset timeout has elapsed.
+        if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probes_in_flight = 0
+        return self._state
+
+    def allow_request(self):
+        """Return True if a call may proceed right now.
+
+        In the half-open state this reserves one of the probe slots, so every
+        allowed call must be followed by ``record_success`` or ``record_failure``.
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self._probes_in_flight < self.half_open_max_calls:
+                self._probes_in_flight += 1
+                return True
+            return False
+
+    def retry_after(self):
+        """Seconds until the breaker will allow a probe (0 if not open)."""
+        with self._lock:
+            if self._current_state() != OPEN:
+                return 0
+            return max(0.0, self.reset_timeout - (self._clock() - self._opened_at))
+
+    def record_success(self):
+        with self._lock:
+            if self._current_state() == HALF_OPEN:
+                # Probe succeeded: close and start with a clean window
+                self._state = CLOSED
+                self._outcomes.clear()
+                self._probes_in_flight = 0
+                return
+            self._outcomes.append(True)
+
+    def record_failure(self):
+        with self._lock:
+            state = self._current_state()
+            if state == HALF_OPEN:
+                self._trip()
+                return
+            self._outcomes.append(False)
+            if len(self._outcomes) >= self.minimum_calls:
+                failures = self._outcomes.count(False)
+                if failures / len(self._outcomes) >= self.failure_rate:
+                    self._trip()
+
+    def release(self):
+        """Give back a slot taken by ``allow_request`` without recording an outcome."""
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes_in_flight > 0:
+                self._probes_in_flight -= 1
+
+    def _trip(self):
+        self._state = OPEN
+        self._opened_at = self._clock()
+        self._probes_in_flight = 0
+        self._outcomes.clear()
+
+    def reset(self):
+        with self._lock:
+            self._state = CLOSED
+            self._opened_at = None
+            self._probes_in_flight = 0
+            self._outcomes.clear()
+
+    def call(self, fn, *args, **kwargs):
+        """Run ``fn`` through the breaker, raising CircuitOpenError if open."""
+        if not self.allow_request():
+            raise CircuitOpenError(self.name, self.retry_after())
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def snapshot(self):
+        with self._lock:
+            state = self._current_state()
+            failures = self._outcomes.count(False)
+            return {
+                "state": state,
+                "recent_calls": len(self._outcomes),
+                "recent_failures": failures,
+            }
+
+
+_breakers = {}
+_registry_lock = threading.Lock()
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def get_breaker(name):
+    """Return the process-wide breaker for provider ``name``, creating it on first use.
+
+    Thresholds come from the environment; per-provider overrides use the
+    upper-cased provider name, e.g. ``CIRCUIT_SEATGEEK_RESET_TIMEOUT``.
+    """
+    breaker = _breakers.get(name)
+    if breaker is not None:
+        return breaker
+    with _registry_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            prefix = f"CIRCUIT_{name.upper()}_"
+
+            def setting(key, default):
+                return _env_float(prefix + key, _env_float('CIRCUIT_' + key, default))
+
+            breaker = CircuitBreaker(
+                name,
+                failure_rate=setting('FAILURE_RATE', 0.5),
+                minimum_calls=int(setting('MINIMUM_CALLS', 5)),
+                window_size=int(setting('WINDOW_SIZE', 20)),
+                reset_timeout=setting('RESET_TIMEOUT', 30.0),
+                half_open_max_calls=int(setting('HALF_OPEN_MAX_CALLS', 1)),
+            )
+            _breakers[name] = breaker
+    return breaker
+
+
+def breaker_states():
+    """Return a snapshot of every breaker created so far, keyed by provider."""
+    return {name: b.snapshot() for name, b in list(_breakers.items())}
+
+
+def reset_all():
+    """Close every breaker (used by tests and admin tooling)."""
+    for b in list(_breakers.values()):
+        b.reset()
@@ -0,0 +1,103 @@
+"""Cursor-paginated, k-way merged event feed across providers.
+
+Each provider contributes a stream of events already sorted by their UTC
+start time. ``merge_page`` lazily merges the streams with a heap and takes
+one page, so the work per page is proportional to the page size and the
+number of providers, never to how far the user has scrolled. The position
+reached in every provider stream is returned so it can be packed into an
+opaque cursor for the next request.
+"""
+import base64
+import heapq
+import json
+from datetime import datetime, timezone
+from itertools import islice
+
+
+# 2: live cursors carry the upstream page size their positions count in
+CURSOR_VERSION = 2
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    """The client sent a cursor we did not issue (or for a different query)."""
+
+
+def as_utc(value):
+    """Return ``value`` as a timezone-aware UTC datetime (naive values are UTC)."""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def encode_cursor(state):
+    raw = json.dumps(dict(state, v=CURSOR_VERSION), separators=(',', ':'), sort_keys=True)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _is_count(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
+
+def _valid_position(mode, position):
+    """Local positions are ``[start_iso, event_id]``, live ones ``[page, offset]``."""
+    if not isinstance(position, list) or len(position) != 2 or not _is_count(position[1]):
+        return False
+    if mode == 'live':
+        return _is_count(position[0])
+    try:
+        datetime.fromisoformat(position[0])
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def decode_cursor(token):
+    """Decode a cursor produced by ``encode_cursor``; raise InvalidCursor otherwise.
+
+    The state is checked as well as decoded, so a tampered or stale cursor
+    is rejected here instead of failing wherever its positions are used.
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError, UnicodeError) as ex:
+        raise InvalidCursor('malformed cursor') from ex
+    if not isinstance(state, dict) or state.get('v') != CURSOR_VERSION or not isinstance(state.get('p'), dict):
+        raise InvalidCursor('unsupported cursor')
+    mode = state.get('mode')
+    if mode not in ('local', 'live') or not isinstance(state.get('city'), str):
+        raise InvalidCursor('unsupported cursor')
+    if not all(isinstance(source, str) and _valid_position(mode, position)
+               for source, position in state['p'].items()):
+        raise InvalidCursor('bad position')
+    if mode == 'live':
+        page_size = state.get('ps')
+        if not _is_count(page_size) or not 1 <= page_size <= MAX_PAGE_SIZE:
+            raise InvalidCursor('bad page size')
+    return state
+
+
+def merge_page(streams, limit):
+    """Take the next ``limit`` events from the merged provider streams.
+
+    ``streams`` maps a source name to an iterator of
+    ``(start_utc, position, event)`` tuples in ascending start order, where
+    ``position`` is an opaque JSON-able marker meaning "resume after this
+    event". Returns ``(events, positions, has_more)``; ``positions`` only
+    contains sources that advanced during this page.
+    """
+    def keyed(source, stream):
+        for seq, (start, position, event) in enumerate(stream):
+            yield (start, source, seq), source, position, event
+
+    merged = heapq.merge(*(keyed(s, it) for s, it in streams.items()), key=lambda item: item[0])
+    taken = list(islice(merged, limit + 1))
+    has_more = len(taken) > limit
+    events, positions = [], {}
+    for _, source, position, event in taken[:limit]:
+        events.append(event)
+        positions[source] = position
+    return events, positions, has_more
@@ -0,0 +1,185 @@
+"""Background ingestion of upstream events into the local Event table.
+
+The ingestion worker pulls every configured (city, category) pair from each
+configured provider concurrently, following pages until the provider runs
+out of results, the per-target page limit is hit or the provider's
+per-run request quota is spent. Fetching happens on a thread pool; the
+caller persists the normalized events (see ``store_events`` in app.py) so
+that all database writes stay on a single thread.
+
+Configuration (environment):
+  INGEST_CITIES        "City,ST;City,ST" pairs (default: "Houston,TX")
+  INGEST_CATEGORIES    comma-separated categories (default: music,sports,arts,family)
+  INGEST_MAX_PAGES     pages per provider/city/category (default: 3)
+  INGEST_PAGE_SIZE     events per page (default: 50)
+  INGEST_MAX_REQUESTS  upstream requests per provider per run (default: 60)
+  INGEST_WORKERS       concurrent fetches (default: 4)
+  INGEST_INTERVAL      seconds between scheduled runs (default: 900)
+
+With ``INGEST_IN_PROCESS`` every gunicorn worker starts a scheduler. A run
+first claims a lease in the shared local store that expires on a timer, 0.9
+of an interval after the claim, not when the run ends. Ticks of other
+workers within that time are skipped. A run that outlasts the lease can
+overlap the next one, which only repeats the upsert of the same events.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from local_store import get_store
+from providers import (
+    ProviderUnavailable,
+    fetch_seatgeek_page,
+    fetch_ticketmaster_page,
+    normalize_seatgeek,
+    normalize_ticketmaster,
+)
+
+
+DEFAULT_CITIES = 'Houston,TX'
+DEFAULT_CATEGORIES = 'music,sports,arts,family'
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def ingest_cities():
+    """Return the configured [(city, state), ...] targets."""
+    cities = []
+    for pair in os.environ.get('INGEST_CITIES', DEFAULT_CITIES).split(';'):
+        if not pair.strip():
+            continue
+        city, _, state = pair.partition(',')
+        cities.append((city.strip(), state.strip()))
+    return cities
+
+
+def ingest_categories():
+    raw = os.environ.get('INGEST_CATEGORIES', DEFAULT_CATEGORIES)
+    return [c.strip() for c in raw.split(',') if c.strip()]
+
+
+def configured_providers():
+    """Return {provider: (credential, page_fetcher, normalizer, first_page)} for configured keys."""
+    providers = {}
+    tm_key = os.environ.get('TICKETMASTER_API_KEY')
+    if tm_key:
+        providers['ticketmaster'] = (tm_key, fetch_ticketmaster_page, normalize_ticketmaster, 0)
+    sg_client_id = os.environ.get('SEATGEEK_CLIENT_ID')
+    if sg_client_id:
+        providers['seatgeek'] = (sg_client_id, fetch_seatgeek_page, normalize_seatgeek, 1)
+    return providers
+
+
+class RequestBudget:
+    """Thread-safe count of upstream requests a provider may still make in this run."""
+
+    def __init__(self, limit):
+        self.remaining = limit
+        self._lock = threading.Lock()
+
+    def take(self):
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+def fetch_target(provider, credential, fetch_page, normalize, first_page,
+                 city, state, category, budget, max_pages=None, page_size=None):
+    """Fetch and normalize every page for one provider/city/category target."""
+    max_pages = max_pages or _env_int('INGEST_MAX_PAGES', 3)
+    page_size = page_size or _env_int('INGEST_PAGE_SIZE', 50)
+    events = []
+    page = first_page
+    for _ in range(max_pages):
+        if not budget.take():
+            break
+        raw, has_more = fetch_page(credential, city, state, category=category, page=page, size=page_size)
+        events.extend(normalize(e, city=city.lower(), state=state, category=category) for e in raw)
+        if not has_more:
+            break
+        page += 1
+    return events
+
+
+def collect_events(cities=None, categories=None, max_workers=None):
+    """Fetch all configured targets concurrently.
+
+    Returns (events, errors, stats): the normalized events, a list of
+    per-target error dicts and per-provider request counts.
+    """
+    cities = cities if cities is not None else ingest_cities()
+    categories = categories if categories is not None else ingest_categories()
+    providers = configured_providers()
+    budgets = {name: RequestBudget(_env_int('INGEST_MAX_REQUESTS', 60)) for name in providers}
+    max_requests = {name: b.remaining for name, b in budgets.items()}
+
+    targets = [
+        (name, city, state, category)
+        for name in providers
+        for city, state in cities
+        for category in categories
+    ]
+    events, errors = [], []
+    if not targets:
+        return events, errors, {}
+
+    with ThreadPoolExecutor(max_workers=max_workers or _env_int('INGEST_WORKERS', 4)) as pool:
+        futures = {
+            pool.submit(fetch_target, name, *providers[name], city, state, category, budgets[name]): (name, city, category)
+            for name, city, state, category in targets
+        }
+        for future, (name, city, category) in futures.items():
+            try:
+                events.extend(future.result())
+            except ProviderUnavailable as ex:
+                errors.append({"source": name, "city": city, "category": category, "error": str(ex), "unavailable": True})
+            except Exception as ex:
+                errors.append({"source": name, "city": city, "category": category, "error": str(ex)})
+
+    stats = {name: {"requests": max_requests[name] - budgets[name].remaining} for name in providers}
+    return events, errors, stats
+
+
+class IngestionScheduler(threading.Thread):
+    """Daemon thread that calls ``run`` every ``interval`` seconds until stopped.
+
+    Schedulers of other processes on the host share the runs: a tick only
+    runs if no other scheduler has run within the last interval.
+    """
+
+    def __init__(self, run, interval=None, logger=None):
+        super().__init__(name='event-ingestion', daemon=True)
+        self._run_once = run
+        self.interval = interval or _env_int('INGEST_INTERVAL', 900)
+        self.logger = logger
+        self._stop_event = threading.Event()
+        self.last_run = None
+
+    def run(self):
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            try:
+                if self._claim_interval():
+                    self.last_run = self._run_once()
+            except Exception as ex:
+                if self.logger:
+                    self.logger.warning("Event ingestion run failed: %s", ex)
+            elapsed = time.monotonic() - started
+            self._stop_event.wait(max(0.0, self.interval - elapsed))
+
+    def _claim_interval(self):
+        """True if no scheduler on this host has started a run in the last interval."""
+        # A bit under one interval, so this thread's own next tick finds it expired
+        claimed, _ = get_store().incr('ingest:run', limit=1, ttl=0.9 * self.interval)
+        return claimed
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,230 @@
+"""Background job queue for long-running agent work.
+
+Jobs are persisted as rows of the ``Job`` model so their state survives a
+restart and can be read by any worker. Submitting a job stores it as
+``queued`` and hands it to a bounded thread pool; the handler runs inside an
+app context and reports progress through ``JobContext.update``.
+
+When a process starts serving (on its first request), ``recover`` looks at
+jobs that were queued or running in a process that no longer exists (the
+owner records host, pid and a random boot id, so a restarted container
+whose app got the same pid does not pass for the old process):
+handlers registered with ``resumable=True`` are queued again, everything
+else is marked ``failed`` so clients never wait on a job nobody is running.
+
+Set ``JOBS_EAGER`` in the app config to run jobs inline (used by tests),
+``JOBS_RECOVER`` to False to skip the automatic recovery, and
+``JOB_WORKERS`` in the environment to size the pool (default 2). A job that
+has already been started ``JOB_MAX_ATTEMPTS`` times (default 3) is failed
+rather than resumed, so a job that crashes its worker cannot loop forever.
+"""
+import json
+import os
+import socket
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from uuid import uuid4
+
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+
+_boot = (None, None)
+
+
+def _boot_id():
+    """Random id of this process, so a later process reusing its pid is told apart."""
+    global _boot
+    if _boot[0] != os.getpid():  # first call, or a forked child
+        _boot = (os.getpid(), uuid4().hex[:12])
+    return _boot[1]
+
+
+def _worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{_boot_id()}"
+
+
+def _owner_alive(owner):
+    """True if ``owner`` ("host:pid:boot") is a live process on this host (or another host).
+
+    A container restart brings the app back with the same hostname and pid,
+    so a pid that exists is not enough: if it is this process's pid, the
+    boot id must be this process's too. Owners written before boot ids
+    ("host:pid") with this pid are from an earlier process.
+    """
+    if not owner:
+        return False
+    host, _, rest = owner.partition(':')
+    pid, _, boot = rest.partition(':')
+    if host != socket.gethostname():
+        # Can't see other hosts' processes; leave their jobs alone
+        return True
+    try:
+        pid = int(pid)
+    except ValueError:
+        return False
+    if pid == os.getpid():
+        return boot == _boot_id()
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobContext:
+    """Handle passed to job handlers for progress reporting."""
+
+    def __init__(self, queue, job_id):
+        self._queue = queue
+        self.job_id = job_id
+
+    def update(self, progress=None, **counts):
+        """Persist progress (0-100) and merge ``counts`` into the job's result."""
+        job = self._queue.db.session.get(self._queue.model, self.job_id)
+        if progress is not None:
+            job.progress = max(0, min(100, int(progress)))
+        if counts:
+            result = json.loads(job.result or '{}')
+            result.update(counts)
+            job.result = json.dumps(result)
+        job.updated_at = datetime.utcnow()
+        self._queue.db.session.commit()
+
+
+class JobQueue:
+    def __init__(self, max_workers=None, max_attempts=None):
+        self.max_workers = max_workers or int(os.environ.get('JOB_WORKERS', 2))
+        self.max_attempts = max_attempts or int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+        self.handlers = {}
+        self.app = self.db = self.model = None
+        self._executor = None
+        self._recovered_pid = None
+        self.recovery = None  # Future of the startup recovery, if started
+
+    def init_app(self, app, db, model):
+        self.app, self.db, self.model = app, db, model
+        app.before_request(self._recover_once)
+
+    def _recover_once(self):
+        # Deferred from startup so building the app never touches the
+        # database; runs on the pool, outside the request's session
+        if self._recovered_pid == os.getpid() or not self.app.config.get('JOBS_RECOVER', True):
+            return
+        self._recovered_pid = os.getpid()
+        self.recovery = self.executor.submit(self._recover_in_context)
+
+    def _recover_in_context(self):
+        with self.app.app_context():
+            try:
+                self.recover()
+            except Exception as ex:
+                self.app.logger.warning("Job recovery failed: %s", ex)
+            finally:
+                self.db.session.remove()
+
+    def task(self, name, resumable=False):
+        """Register ``fn(ctx, **params) -> dict`` as the handler for jobs of kind ``name``."""
+        def decorator(fn):
+            self.handlers[name] = (fn, resumable)
+            return fn
+        return decorator
+
+    @property
+    def executor(self):
+        # Created lazily (and per process) so forked workers get their own threads
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    def submit(self, kind, **params):
+        """Persist a queued job and schedule it; return the job row."""
+        if kind not in self.handlers:
+            raise KeyError(f"unknown job kind: {kind}")
+        job = self.model(id=uuid4().hex, kind=kind, status=QUEUED, params=json.dumps(params),
+                         submitted_by=_worker_id())
+        self.db.session.add(job)
+        self.db.session.commit()
+        self._dispatch(job.id)
+        return job
+
+    def _dispatch(self, job_id):
+        if self.app.config.get('JOBS_EAGER'):
+            self._run(job_id)
+        else:
+            self.executor.submit(self._run, job_id)
+
+    def _claim(self, job_id):
+        """Atomically move a queued job to running; False if someone else took it."""
+        claimed = self.model.query.filter_by(id=job_id, status=QUEUED).update({
+            'status': RUNNING,
+            'owner': _worker_id(),
+            'started_at': datetime.utcnow(),
+            'updated_at': datetime.utcnow(),
+            'attempts': self.model.attempts + 1,
+        })
+        self.db.session.commit()
+        return claimed == 1
+
+    def _run(self, job_id):
+        with self.app.app_context():
+            try:
+                if not self._claim(job_id):
+                    return
+                job = self.db.session.get(self.model, job_id)
+                handler, _ = self.handlers[job.kind]
+                result = handler(JobContext(self, job_id), **json.loads(job.params or '{}'))
+                job = self.db.session.get(self.model, job_id)
+                merged = json.loads(job.result or '{}')
+                merged.update(result or {})
+                job.result = json.dumps(merged)
+                job.status = SUCCEEDED
+                job.progress = 100
+            except Exception as ex:
+                self.db.session.rollback()
+                self.app.logger.warning("Job %s failed: %s\n%s", job_id, ex, traceback.format_exc())
+                job = self.db.session.get(self.model, job_id)
+                if job is None:
+                    return
+                job.status = FAILED
+                job.error = str(ex)[:2000]
+            job.finished_at = job.updated_at = datetime.utcnow()
+            self.db.session.commit()
+            self.db.session.remove()
+
+    def recover(self):
+        """Requeue or fail jobs orphaned by a previous process. Returns (requeued, failed)."""
+        requeued, failed = [], 0
+        for job in self.model.query.filter(self.model.status.in_(ACTIVE_STATES)).all():
+            if job.status == RUNNING and _owner_alive(job.owner):
+                continue
+            if job.status == QUEUED and job.owner is None and _owner_alive(job.submitted_by):
+                continue
+            handler = self.handlers.get(job.kind)
+            if handler and handler[1] and (job.attempts or 0) < self.max_attempts:
+                job.status, job.owner, job.submitted_by = QUEUED, None, _worker_id()
+                requeued.append(job.id)
+            else:
+                job.status = FAILED
+                job.error = 'interrupted by server restart'
+                if handler and handler[1]:
+                    job.error += f' (gave up after {job.attempts} attempts)'
+                job.finished_at = datetime.utcnow()
+                failed += 1
+        self.db.session.commit()
+        for job_id in requeued:
+            self._dispatch(job_id)
+        return len(requeued), failed
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
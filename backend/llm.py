@@ -0,0 +1,156 @@
+"""Gemini helpers shared by the agent jobs.
+
+Every ``generate_content`` call goes through ``generate`` so the number of
+requests in flight from one process stays under ``LLM_MAX_CONCURRENCY``
+(default 4), however many jobs are running.
+
+``generate_descriptions`` writes listing blurbs for many events at once:
+events are grouped into batches of ``LLM_BATCH_SIZE`` (default 10), each
+batch is one structured-output request that returns a JSON object mapping
+event id to description, and independent batches run concurrently. An event
+the model skipped, or a batch whose reply can't be parsed, gets the
+caller's fallback text instead of failing the run.
+
+``cached_generate`` and ``generate_descriptions`` consult the persistent
+response cache in ``llm_cache`` first; descriptions are cached per event, so
+only events that have not been described recently are sent to Gemini.
+"""
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_cache import cache_key, get_llm_cache, kind_ttl
+from metrics import upstream_call
+from upstream_replay import generate_content
+
+
+JSON_CONFIG = {"response_mime_type": "application/json"}
+
+
+def _env_int(name, default):
+    try:
+        return max(1, int(os.environ.get(name, default)))
+    except (TypeError, ValueError):
+        return default
+
+
+_slots = threading.BoundedSemaphore(_env_int('LLM_MAX_CONCURRENCY', 4))
+
+
+def generate(model, prompt, **kwargs):
+    """``model.generate_content`` limited to LLM_MAX_CONCURRENCY concurrent calls.
+
+    The call goes through ``upstream_replay`` so it can be recorded or replayed.
+    """
+    with _slots, upstream_call('gemini'):
+        return generate_content(model, prompt, **kwargs)
+
+
+def model_name(model):
+    return getattr(model, 'model_name', None) or type(model).__name__
+
+
+def cached_generate(model, prompt, kind, validate=None, **kwargs):
+    """Response text for ``prompt``, served from the LLM cache when possible.
+
+    ``kind`` selects the cache TTL and date bucket. Replies for which
+    ``validate(text)`` is false are returned but not cached.
+    """
+    cache = get_llm_cache()
+    key = cache_key(model_name(model), prompt, kind)
+    if cache is not None:
+        text = cache.get(key, kind)
+        if text is not None:
+            return text
+    text = generate(model, prompt, **kwargs).text
+    if cache is not None and (validate is None or validate(text)):
+        cache.put(key, kind, text, kind_ttl(kind))
+    return text
+
+
+def is_json(text):
+    try:
+        parse_json(text)
+    except ValueError:
+        return False
+    return True
+
+
+def parse_json(text):
+    """Parse a model reply as JSON, tolerating a surrounding ```json fence."""
+    text = (text or '').strip()
+    if text.startswith('```'):
+        text = text.split('\n', 1)[1] if '\n' in text else ''
+        text = text.rsplit('```', 1)[0]
+    return json.loads(text)
+
+
+def description_prompt(events):
+    lines = [f'- id: {e["id"]} | {e["name"]}' + (f' ({e["category"]})' if e.get("category") else '')
+             for e in events]
+    return (
+        "Write a short, engaging 2-sentence description for each of these events. "
+        "Make them exciting and community-focused.\n"
+        + "\n".join(lines)
+        + "\n\nRespond with ONLY a JSON object mapping each event id to its description, "
+        'like: {"<id>": "<description>"}'
+    )
+
+
+def single_description_prompt(event):
+    """Per-event prompt; also the cache identity of that event's description."""
+    return (f"Write a short, engaging 2-sentence description for this event: {event['name']}. "
+            "Make it exciting and community-focused.")
+
+
+def _describe_batch(model, batch, fallback):
+    try:
+        reply = parse_json(generate(model, description_prompt(batch), generation_config=JSON_CONFIG).text)
+    except Exception:
+        reply = {}
+    if not isinstance(reply, dict):
+        reply = {}
+    cache = get_llm_cache()
+    out = {}
+    for e in batch:
+        text = reply.get(str(e["id"]))
+        if isinstance(text, str) and text.strip():
+            out[e["id"]] = text.strip()
+            if cache is not None:
+                key = cache_key(model_name(model), single_description_prompt(e), 'description')
+                cache.put(key, 'description', out[e["id"]], kind_ttl('description'))
+        else:
+            out[e["id"]] = fallback(e)
+    return out
+
+
+def generate_descriptions(model, events, fallback, batch_size=None, max_workers=None):
+    """Return ``{event id: description}`` for ``events`` (dicts with id, name, category).
+
+    ``fallback(event)`` supplies the text for any event the model did not
+    describe.
+    """
+    descriptions = {}
+    cache = get_llm_cache()
+    if cache is not None:
+        misses = []
+        for e in events:
+            text = cache.get(cache_key(model_name(model), single_description_prompt(e), 'description'), 'description')
+            if text is None:
+                misses.append(e)
+            else:
+                descriptions[e["id"]] = text
+        events = misses
+    if not events:
+        return descriptions
+    batch_size = batch_size or _env_int('LLM_BATCH_SIZE', 10)
+    batches = [events[i:i + batch_size] for i in range(0, len(events), batch_size)]
+    if len(batches) == 1:
+        descriptions.update(_describe_batch(model, batches[0], fallback))
+        return descriptions
+    workers = min(len(batches), max_workers or _env_int('LLM_MAX_CONCURRENCY', 4))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='llm') as pool:
+        for result in pool.map(lambda b: _describe_batch(model, b, fallback), batches):
+            descriptions.update(result)
+    return descriptions
@@ -0,0 +1,150 @@
+"""Persistent, content-addressed cache of Gemini responses.
+
+Entries are keyed on a hash of the model name, the normalized prompt
+(whitespace collapsed, case folded) and a date bucket, so the same question
+asked on the same day is answered from disk rather than sent to Gemini
+again. Each prompt kind has its own TTL and bucket width (``PROMPT_KINDS``).
+The cache is bounded at ``LLM_CACHE_MAX_ENTRIES`` rows; inserting past the
+bound evicts the least recently used entries.
+
+Like ``local_store``, the cache is a SQLite file in WAL mode shared by every
+worker process on the host. Hit, miss and eviction counts are kept in the
+local store so ``/api/metrics`` reports them across workers.
+
+Configure with ``LLM_CACHE`` (``on``/``off``, default on),
+``LLM_CACHE_PATH`` (default: ``tapin_llm_cache.db`` in the temp dir),
+``LLM_CACHE_MAX_ENTRIES`` (default 5000) and ``LLM_CACHE_TTL_<KIND>``
+(seconds) to override a kind's TTL.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+
+from local_store import get_store
+
+
+DAY = 86400
+
+PROMPT_KINDS = {
+    # kind: (default ttl seconds, date bucket seconds)
+    'nightlife': (DAY, DAY),
+    'description': (30 * DAY, 30 * DAY),
+    'priorities': (6 * 3600, DAY),
+}
+DEFAULT_KIND = (DAY, DAY)
+
+
+def normalize_prompt(prompt):
+    return re.sub(r'\s+', ' ', prompt or '').strip().casefold()
+
+
+def cache_key(model_name, prompt, kind, now=None):
+    now = time.time() if now is None else now
+    _, bucket_seconds = PROMPT_KINDS.get(kind, DEFAULT_KIND)
+    bucket = int(now // bucket_seconds)
+    raw = '\x1f'.join([model_name or '', kind, str(bucket), normalize_prompt(prompt)])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def kind_ttl(kind):
+    ttl, _ = PROMPT_KINDS.get(kind, DEFAULT_KIND)
+    try:
+        return float(os.environ.get(f'LLM_CACHE_TTL_{kind.upper()}', ttl))
+    except (TypeError, ValueError):
+        return ttl
+
+
+class LLMCache:
+    def __init__(self, path, max_entries=5000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._conn().execute(
+            'CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, kind TEXT, response TEXT, '
+            'created REAL, expires REAL, last_used REAL)')
+        self._conn().execute('CREATE INDEX IF NOT EXISTS ix_llm_cache_last_used ON llm_cache (last_used)')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, kind, outcome):
+        get_store().incr(f'llm_cache:{outcome}:{kind}')
+
+    def get(self, key, kind, now=None):
+        """Cached response text for ``key``, or None (counted as a miss)."""
+        now = time.time() if now is None else now
+        conn = self._conn()
+        row = conn.execute('SELECT response, expires FROM llm_cache WHERE key = ?', (key,)).fetchone()
+        if row is None or row[1] <= now:
+            self._count(kind, 'miss')
+            return None
+        conn.execute('UPDATE llm_cache SET last_used = ? WHERE key = ?', (now, key))
+        self._count(kind, 'hit')
+        return row[0]
+
+    def put(self, key, kind, response, ttl, now=None):
+        now = time.time() if now is None else now
+        conn = self._conn()
+        conn.execute('INSERT OR REPLACE INTO llm_cache (key, kind, response, created, expires, last_used) '
+                     'VALUES (?, ?, ?, ?, ?, ?)', (key, kind, response, now, now + ttl, now))
+        self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute('DELETE FROM llm_cache WHERE expires <= ?', (now,))
+        excess = conn.execute('SELECT COUNT(*) FROM llm_cache').fetchone()[0] - self.max_entries
+        if excess > 0:
+            conn.execute('DELETE FROM llm_cache WHERE key IN '
+                         '(SELECT key FROM llm_cache ORDER BY last_used LIMIT ?)', (excess,))
+            get_store().incr('llm_cache:evicted', amount=excess)
+
+    def stats(self):
+        store = get_store()
+        kinds = {}
+        for kind in set(PROMPT_KINDS) | {k for (k,) in self._conn().execute('SELECT DISTINCT kind FROM llm_cache')}:
+            hits, misses = store.get(f'llm_cache:hit:{kind}'), store.get(f'llm_cache:miss:{kind}')
+            if hits or misses:
+                kinds[kind] = {"hits": hits, "misses": misses,
+                               "hit_rate": round(hits / (hits + misses), 3)}
+        return {
+            "entries": self._conn().execute('SELECT COUNT(*) FROM llm_cache').fetchone()[0],
+            "max_entries": self.max_entries,
+            "evicted": store.get('llm_cache:evicted'),
+            "kinds": kinds,
+        }
+
+    def clear(self):
+        self._conn().execute('DELETE FROM llm_cache')
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """Return the process-wide cache, or None when LLM_CACHE=off."""
+    global _cache
+    if os.environ.get('LLM_CACHE', 'on').lower() in ('0', 'off', 'false', 'no'):
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                path = os.environ.get('LLM_CACHE_PATH') or os.path.join(tempfile.gettempdir(), 'tapin_llm_cache.db')
+                _cache = LLMCache(path, max_entries=int(os.environ.get('LLM_CACHE_MAX_ENTRIES', 5000)))
+    return _cache
+
+
+def set_llm_cache(cache):
+    """Replace the process-wide cache (tests and embedding)."""
+    global _cache
+    _cache = cache
@@ -0,0 +1,226 @@
+"""Small host-local key/value store shared by all worker processes.
+
+Rate limiters and quota counters must agree across gunicorn workers, but
+they do not justify running Redis. ``SqliteStore`` keeps token buckets and
+counters in a SQLite file (WAL mode) and performs every read-modify-write
+inside a ``BEGIN IMMEDIATE`` transaction, so updates are atomic across
+processes on the same host. ``MemoryStore`` implements the same operations
+in-process for tests and single-worker development.
+
+Configure with ``LOCAL_STORE`` = ``sqlite`` (default) or ``memory`` and
+``LOCAL_STORE_PATH`` (default: ``tapin_local_store.db`` in the temp dir).
+
+Counters with a ttl (quotas, leases, read-your-writes pins) are dropped once
+they expire: every ``LOCAL_STORE_PURGE_EVERY`` increments (default 1000) a
+process deletes all expired counters in the same transaction.
+"""
+import itertools
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+
+def _purge_every():
+    try:
+        return max(1, int(os.environ.get('LOCAL_STORE_PURGE_EVERY', 1000)))
+    except ValueError:
+        return 1000
+
+
+def _refill(tokens, updated, rate, burst, now):
+    if tokens is None:
+        return float(burst)
+    return min(float(burst), tokens + max(0.0, now - updated) * rate)
+
+
+class MemoryStore:
+    """Process-local implementation of the store operations."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._counters = {}
+        self._writes = itertools.count(1)
+        self.purge_every = _purge_every()
+
+    def take_token(self, key, rate, burst, now=None):
+        """Take one token from bucket ``key``; return (allowed, seconds_until_next_token)."""
+        now = time.time() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (None, now))
+            tokens = _refill(tokens, updated, rate, burst, now)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return True, 0.0
+            self._buckets[key] = (tokens, now)
+            return False, (1 - tokens) / rate if rate > 0 else float('inf')
+
+    def bucket_level(self, key, rate, burst, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (None, now))
+            return _refill(tokens, updated, rate, burst, now)
+
+    def incr(self, key, limit=None, ttl=None, amount=1, now=None):
+        """Add ``amount`` to counter ``key`` unless that would exceed ``limit``.
+
+        Returns (allowed, value_after). Counters disappear ``ttl`` seconds
+        after they were created.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            value, expires = self._counters.get(key, (0, None))
+            if expires is not None and expires <= now:
+                value, expires = 0, None
+            if limit is not None and value + amount > limit:
+                return False, value
+            if expires is None and ttl is not None:
+                expires = now + ttl
+            self._counters[key] = (value + amount, expires)
+            if next(self._writes) % self.purge_every == 0:
+                self._purge(now)
+            return True, value + amount
+
+    def get(self, key, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            value, expires = self._counters.get(key, (0, None))
+            if expires is not None and expires <= now:
+                return 0
+            return value
+
+    def _purge(self, now):
+        self._counters = {key: entry for key, entry in self._counters.items()
+                          if entry[1] is None or entry[1] > now}
+
+    def purge_expired(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            self._purge(now)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+            self._counters.clear()
+
+
+class SqliteStore:
+    """Cross-process implementation backed by a SQLite file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._writes = itertools.count(1)
+        self.purge_every = _purge_every()
+        self._ensure_schema()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        # A connection must never be shared with a forked child
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _ensure_schema(self):
+        conn = self._conn()
+        conn.execute('CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)')
+        conn.execute('CREATE TABLE IF NOT EXISTS counters (key TEXT PRIMARY KEY, value INTEGER, expires REAL)')
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def take_token(self, key, rate, burst, now=None):
+        now = time.time() if now is None else now
+        with self._transaction() as conn:
+            row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens = _refill(row[0] if row else None, row[1] if row else now, rate, burst, now)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            conn.execute('INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)', (key, tokens, now))
+        if allowed:
+            return True, 0.0
+        return False, (1 - tokens) / rate if rate > 0 else float('inf')
+
+    def bucket_level(self, key, rate, burst, now=None):
+        now = time.time() if now is None else now
+        row = self._conn().execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+        return _refill(row[0] if row else None, row[1] if row else now, rate, burst, now)
+
+    def incr(self, key, limit=None, ttl=None, amount=1, now=None):
+        now = time.time() if now is None else now
+        with self._transaction() as conn:
+            row = conn.execute('SELECT value, expires FROM counters WHERE key = ?', (key,)).fetchone()
+            value, expires = row if row else (0, None)
+            if expires is not None and expires <= now:
+                value, expires = 0, None
+            if limit is not None and value + amount > limit:
+                return False, value
+            if expires is None and ttl is not None:
+                expires = now + ttl
+            conn.execute('INSERT OR REPLACE INTO counters (key, value, expires) VALUES (?, ?, ?)',
+                         (key, value + amount, expires))
+            if next(self._writes) % self.purge_every == 0:
+                self._purge(conn, now)
+        return True, value + amount
+
+    def get(self, key, now=None):
+        now = time.time() if now is None else now
+        row = self._conn().execute('SELECT value, expires FROM counters WHERE key = ?', (key,)).fetchone()
+        if not row or (row[1] is not None and row[1] <= now):
+            return 0
+        return row[0]
+
+    @staticmethod
+    def _purge(conn, now):
+        conn.execute('DELETE FROM counters WHERE expires IS NOT NULL AND expires <= ?', (now,))
+
+    def purge_expired(self, now=None):
+        now = time.time() if now is None else now
+        with self._transaction() as conn:
+            self._purge(conn, now)
+
+    def clear(self):
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM buckets')
+            conn.execute('DELETE FROM counters')
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Return the process-wide store configured by LOCAL_STORE / LOCAL_STORE_PATH."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if os.environ.get('LOCAL_STORE', 'sqlite').lower() == 'memory':
+                    _store = MemoryStore()
+                else:
+                    path = os.environ.get('LOCAL_STORE_PATH') or os.path.join(
+                        tempfile.gettempdir(), 'tapin_local_store.db')
+                    _store = SqliteStore(path)
+    return _store
+
+
+def set_store(store):
+    """Replace the process-wide store (tests and embedding)."""
+    global _store
+    _store = store
@@ -0,0 +1,208 @@
+"""Outbound mail queue with a pooled SMTP connection.
+
+Request handlers call ``mailer.enqueue(message)`` and return immediately. A
+background sender thread drains the queue in batches over one long-lived,
+authenticated SMTP connection, which is reopened only when the server drops
+it or it sits idle longer than ``SMTP_IDLE_TIMEOUT`` seconds (default 60).
+A message that fails to send is retried with exponential backoff
+(``MAIL_RETRY_BASE`` seconds, doubling, default 2) up to
+``MAIL_MAX_ATTEMPTS`` times (default 5).
+
+SMTP settings come from the environment when a connection is opened:
+``SMTP_HOST``, ``SMTP_PORT`` (587), ``SMTP_USER``, ``SMTP_PASS``,
+``SMTP_USE_TLS`` (true). ``SMTP_BATCH_SIZE`` (default 20) caps how many
+messages are sent per connection check.
+
+The queue lives in process memory: messages still queued when the process
+exits are lost, which is acceptable for reset links the user can request
+again.
+"""
+import heapq
+import logging
+import os
+import queue
+import random
+import smtplib
+import threading
+import time
+
+from metrics import upstream_call
+
+logger = logging.getLogger(__name__)
+
+
+def smtp_configured():
+    return bool(os.environ.get('SMTP_HOST'))
+
+
+def _env_number(name, default, cast=float):
+    try:
+        return cast(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+class Mailer:
+    def __init__(self, connect=None, clock=time.monotonic):
+        self._connect = connect or self._smtp_connect
+        self._clock = clock
+        self._queue = queue.Queue()
+        self._retries = []  # heap of (due, seq, attempts, message)
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._thread_pid = None
+        self._stopping = threading.Event()
+        self._conn = None
+        self._conn_used = 0.0
+        self._pending = 0  # enqueued but not yet sent or given up
+        self.sent = self.failed = self.retried = 0
+        self.last_error = None
+
+    # -- producer side ------------------------------------------------------
+
+    def enqueue(self, message):
+        """Queue an ``EmailMessage`` for background delivery."""
+        self._ensure_thread()
+        with self._lock:
+            self._pending += 1
+        self._queue.put((1, message))
+
+    def _ensure_thread(self):
+        with self._lock:
+            # A sender thread does not survive fork; start one per process
+            if self._thread is None or self._thread_pid != os.getpid() or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name='mailer', daemon=True)
+                self._thread_pid = os.getpid()
+                self._thread.start()
+
+    def stats(self):
+        with self._lock:
+            retrying, pending = len(self._retries), self._pending
+        return {
+            "queued": self._queue.qsize(),
+            "retrying": retrying,
+            "pending": pending,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "last_error": self.last_error,
+        }
+
+    def flush(self, timeout=10.0):
+        """Block until every queued message was sent or given up (tests and shutdown)."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if not self._pending:
+                return True
+            time.sleep(0.01)
+        return False
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._close()
+
+    # -- sender side --------------------------------------------------------
+
+    def _smtp_connect(self):
+        host = os.environ.get('SMTP_HOST')
+        port = _env_number('SMTP_PORT', 587, int)
+        user, password = os.environ.get('SMTP_USER'), os.environ.get('SMTP_PASS')
+        server = smtplib.SMTP(host, port, timeout=10)
+        server.ehlo()
+        if os.environ.get('SMTP_USE_TLS', 'true').lower() in ('1', 'true', 'yes'):
+            server.starttls()
+            server.ehlo()
+        if user and password:
+            server.login(user, password)
+        return server
+
+    def _connection(self):
+        idle = _env_number('SMTP_IDLE_TIMEOUT', 60)
+        if self._conn is not None and self._clock() - self._conn_used > idle:
+            self._close()
+        if self._conn is None:
+            self._conn = self._connect()
+        self._conn_used = self._clock()
+        return self._conn
+
+    def _close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                conn.quit()
+            except Exception:
+                pass
+
+    def _next_batch(self):
+        """Wait for work and return up to SMTP_BATCH_SIZE (attempts, message) pairs."""
+        batch_size = _env_number('SMTP_BATCH_SIZE', 20, int)
+        with self._lock:
+            wait = max(0.0, self._retries[0][0] - self._clock()) if self._retries else None
+        try:
+            first = self._queue.get(timeout=wait if wait is not None else 1.0)
+        except queue.Empty:
+            first = False
+        batch = [] if first is False or first is None else [first]
+        while len(batch) < batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                batch.append(item)
+        with self._lock:
+            now = self._clock()
+            while self._retries and self._retries[0][0] <= now and len(batch) < batch_size:
+                _, _, attempts, message = heapq.heappop(self._retries)
+                batch.append((attempts, message))
+        return batch
+
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = self._next_batch()
+            for attempts, message in batch:
+                self._send(attempts, message)
+        self._close()
+
+    def _send(self, attempts, message):
+        try:
+            with upstream_call('smtp'):
+                self._connection().send_message(message)
+            self.sent += 1
+            self._done()
+            return
+        except smtplib.SMTPRecipientsRefused as ex:
+            # Permanent for this message; the connection is still good
+            self._give_up(message, ex)
+            return
+        except Exception as ex:
+            # Connection-level failure: reconnect for the next attempt
+            self.last_error = str(ex)
+            self._close()
+        if attempts >= _env_number('MAIL_MAX_ATTEMPTS', 5, int):
+            self._give_up(message, self.last_error)
+            return
+        base = _env_number('MAIL_RETRY_BASE', 2.0)
+        delay = base * (2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+        with self._lock:
+            self._seq += 1
+            heapq.heappush(self._retries, (self._clock() + delay, self._seq, attempts + 1, message))
+            self.retried += 1
+
+    def _done(self):
+        with self._lock:
+            self._pending -= 1
+
+    def _give_up(self, message, error):
+        self._done()
+        self.failed += 1
+        self.last_error = str(error)
+        logger.warning("Giving up on mail to %s: %s", message.get('To'), error)
+
+
+mailer = Mailer()
@@ -36,8 +36,23 @@ def cli():
 @cli.command()
 @click.argument('rev', required=False, default='head')
 def upgrade(rev):
-    """Upgrade the DB to REV (default: head)."""
-    _run_alembic(f"-c {ALEMBIC_INI} upgrade {rev}")
+    """Upgrade the DB to REV (default: head).
+
+    A database created before migrations is stamped first (see schema.py).
+    """
+    from alembic.config import Config
+    from sqlalchemy import create_engine
+    import schema
+
+    # Relative SQLite paths in alembic.ini are relative to the repo root
+    os.chdir(REPO_ROOT)
+    url = os.environ.get('SQLALCHEMY_DATABASE_URI') or Config(str(ALEMBIC_INI)).get_main_option('sqlalchemy.url')
+    click.echo(f"Upgrading {url} to {rev}")
+    engine = create_engine(url)
+    try:
+        schema.upgrade(engine, rev)
+    finally:
+        engine.dispose()
 
 
 @cli.command()
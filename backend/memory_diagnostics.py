@@ -0,0 +1,179 @@
+"""Per-endpoint memory metrics and tracemalloc snapshots for the admin API.
+
+Two metrics are exported under ``GET /metrics``:
+
+- ``tapin_http_request_maxrss_growth_bytes_total{route}``, always on: how
+  much each route raised the worker's peak RSS (``ru_maxrss``). A route that
+  loads a whole table shows up the first time it pushes the high-water mark.
+  It costs one ``getrusage`` call before and after each request.
+- ``tapin_http_request_peak_memory_bytes{route}``, while tracemalloc is
+  tracing: the peak of Python allocations during the request, above what
+  was allocated when it started. Threads of the same worker share
+  tracemalloc's peak, so concurrent requests inflate each other's values.
+
+tracemalloc is started and stopped at runtime by ``/api/admin/tracemalloc``
+(or from boot with ``PYTHONTRACEMALLOC=<frames>``). Snapshots are kept in
+the worker's memory, the newest ``TRACEMALLOC_KEEP`` (default 5), and
+compared with ``diff``. All of this state belongs to one worker process;
+every response names the ``pid`` it came from.
+"""
+import itertools
+import linecache
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+
+from flask import g
+
+import metrics
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, so no RSS growth metric
+    resource = None
+
+BYTES_BUCKETS = (64 << 10, 256 << 10, 1 << 20, 4 << 20, 16 << 20, 64 << 20, 256 << 20, 1 << 30)
+# macOS reports ru_maxrss in bytes, Linux in kilobytes
+_MAXRSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+request_peak_memory = metrics.registry.histogram(
+    'tapin_http_request_peak_memory_bytes',
+    'Peak Python allocations during a request above its starting point (only while tracemalloc traces).',
+    ('route',), BYTES_BUCKETS)
+request_maxrss_growth = metrics.registry.counter(
+    'tapin_http_request_maxrss_growth_bytes_total', 'Bytes by which requests to a route raised the peak RSS.',
+    ('route',))
+
+GROUPINGS = ('lineno', 'filename', 'traceback')
+
+# allocations made by tracemalloc itself and by imports are noise in a diff
+_NOISE = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, linecache.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+class TracingOff(Exception):
+    pass
+
+
+def _maxrss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _MAXRSS_UNIT if resource else 0
+
+
+def _stat(stat):
+    frames = [{"file": f.filename, "line": f.lineno} for f in stat.traceback]
+    entry = {"size": stat.size, "count": stat.count, "where": frames[0] if frames else None}
+    if len(frames) > 1:
+        entry["traceback"] = frames
+    if hasattr(stat, 'size_diff'):
+        entry["size_diff"], entry["count_diff"] = stat.size_diff, stat.count_diff
+    return entry
+
+
+class MemoryDiagnostics:
+    def __init__(self, keep=None):
+        self.keep = int(keep if keep is not None else os.environ.get('TRACEMALLOC_KEEP', 5))
+        self._snapshots = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.before_request(self._before)
+        app.after_request(self._after)
+
+    # -- per-request metrics -------------------------------------------------
+
+    def _before(self):
+        g.memory_start = (_maxrss(), tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None)
+        if g.memory_start[1] is not None:
+            tracemalloc.reset_peak()
+
+    def _after(self, response):
+        start = g.pop('memory_start', None)
+        if start is None:
+            return response
+        maxrss, traced = start
+        route = metrics.request_route()
+        grown = _maxrss() - maxrss
+        if grown > 0:
+            request_maxrss_growth.inc(grown, route=route)
+        if traced is not None and tracemalloc.is_tracing():
+            request_peak_memory.observe(max(0, tracemalloc.get_traced_memory()[1] - traced), route=route)
+        return response
+
+    # -- tracing -------------------------------------------------------------
+
+    def start(self, frames=1):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        return self.status()
+
+    def stop(self):
+        tracemalloc.stop()
+        with self._lock:
+            self._snapshots.clear()
+        return self.status()
+
+    def status(self):
+        tracing = tracemalloc.is_tracing()
+        current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        with self._lock:
+            snapshots = [{"id": sid, "taken_at": taken_at, "traced_bytes": size}
+                         for sid, (_, taken_at, size) in self._snapshots.items()]
+        return {
+            "pid": os.getpid(),
+            "tracing": tracing,
+            "frames": tracemalloc.get_traceback_limit() if tracing else None,
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "max_rss_bytes": _maxrss(),
+            "snapshots": snapshots,
+        }
+
+    # -- snapshots -----------------------------------------------------------
+
+    def take_snapshot(self, limit=20, group_by='lineno'):
+        """Record a snapshot and return its id with its top ``limit`` allocation sites."""
+        if not tracemalloc.is_tracing():
+            raise TracingOff()
+        snapshot = tracemalloc.take_snapshot().filter_traces(_NOISE)
+        traced = tracemalloc.get_traced_memory()[0]
+        with self._lock:
+            sid = next(self._ids)
+            self._snapshots[sid] = (snapshot, time.time(), traced)
+            while len(self._snapshots) > self.keep:
+                self._snapshots.popitem(last=False)
+        return {"pid": os.getpid(), "id": sid, "traced_bytes": traced,
+                "top": [_stat(s) for s in snapshot.statistics(group_by)[:limit]]}
+
+    def diff(self, first=None, second=None, limit=20, group_by='lineno'):
+        """Allocation sites whose size changed most between two snapshots.
+
+        ``first`` defaults to the oldest kept snapshot, ``second`` to the
+        newest. Returns None if either id is unknown.
+        """
+        with self._lock:
+            ids = list(self._snapshots)
+            if len(ids) < 2 and (first is None or second is None):
+                return None
+            first = ids[0] if first is None else first
+            second = ids[-1] if second is None else second
+            if first not in self._snapshots or second not in self._snapshots:
+                return None
+            old, new = self._snapshots[first][0], self._snapshots[second][0]
+        stats = new.compare_to(old, group_by)
+        return {
+            "pid": os.getpid(), "from": first, "to": second,
+            "size_diff": sum(s.size_diff for s in stats),
+            "top": [_stat(s) for s in stats[:limit]],
+        }
+
+
+memory_diagnostics = MemoryDiagnostics()
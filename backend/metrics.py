@@ -0,0 +1,493 @@
+"""Prometheus text-format metrics (``GET /metrics``), aggregated across workers.
+
+Every gunicorn worker counts its own requests, so a scrape served by one of
+them must add up the others. Each process keeps its counters and histograms
+in memory and writes them every ``METRICS_FLUSH_INTERVAL`` seconds (default
+5, and at exit) to ``<pid>-<start>.json`` in ``METRICS_DIR`` (default:
+``tapin_metrics`` in the temp dir), where ``start`` is the process's start
+time (a random id where ``/proc`` is unavailable). A worker that gets the
+pid of one that exited writes a file of its own instead of overwriting the
+unfolded one, and a file counts as live only if its pid is running and was
+started at that time. A scrape merges the files of all processes with its
+own live values:
+
+- counters and histograms are summed over every file, including those of
+  workers that have exited, so totals never go backwards when gunicorn
+  recycles a worker. Files of dead workers are folded into ``archive.json``;
+- gauges (pool occupancy) are summed over live processes only;
+- host-wide values that every worker already shares (the LLM cache counters
+  in the local store) are read once by the scraping process.
+
+Set ``METRICS_DIR=off`` for in-process metrics only (tests, single worker).
+The prometheus_client package is not a dependency; this module implements
+the small part of its text format and multiprocess mode the app needs.
+"""
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from contextlib import contextmanager
+from uuid import uuid4
+
+from flask import g, request
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+try:
+    import fcntl
+except ImportError:  # Windows: dead worker files are kept instead of folded
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+ARCHIVE = 'archive.json'
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _process_start(pid):
+    """Start time of ``pid`` in clock ticks since boot (Linux), or None."""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # fields after the parenthesized command name; starttime is field 22
+    return stat.rpartition(')')[2].split()[19]
+
+
+_identity = (None, None)
+
+
+def process_id():
+    """``<pid>-<start>`` naming this process's metrics file."""
+    global _identity
+    if _identity[0] != os.getpid():  # first call, or a forked child
+        _identity = (os.getpid(), f'{os.getpid()}-{_process_start(os.getpid()) or uuid4().hex[:12]}')
+    return _identity[1]
+
+
+def _file_alive(stem):
+    """True if the process that wrote ``<stem>.json`` is still running."""
+    pid, _, start = stem.partition('-')
+    if not _pid_alive(int(pid)):
+        return False
+    current = _process_start(int(pid))
+    # without /proc there is nothing to compare; pid-only files predate start times
+    return current is None or start in ('', current)
+
+
+def _format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, registry, name, doc, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+
+    def key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def merge(self, into, value):
+        return into + value
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        self.registry._update(self, self.key(labels), lambda old: (old or 0) + amount)
+
+
+class Gauge(Metric):
+    """Set only by collectors: a point-in-time value per live process."""
+
+    kind = 'gauge'
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, doc, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, doc, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        # one count per bucket (the last is +Inf) followed by the sum
+        index = bisect_left(self.buckets, value)
+
+        def add(old):
+            old = old or [0] * (len(self.buckets) + 1) + [0.0]
+            old[index] += 1
+            old[-1] += value
+            return old
+        self.registry._update(self, self.key(labels), add)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def merge(self, into, value):
+        return [a + b for a, b in zip(into, value)]
+
+
+class Registry:
+    def __init__(self, directory=None, flush_interval=None):
+        if directory is None:
+            directory = os.environ.get('METRICS_DIR') or os.path.join(tempfile.gettempdir(), 'tapin_metrics')
+        self.directory = None if directory.lower() in ('off', 'memory', 'none') else directory
+        self.flush_interval = float(flush_interval if flush_interval is not None
+                                    else os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+        self.metrics = {}
+        self._collectors = []
+        self._values = {}
+        self._lock = threading.Lock()
+        self._flusher_pid = None
+        if hasattr(os, 'register_at_fork'):
+            # a forked worker starts from zero; its parent's counts are the parent's
+            os.register_at_fork(after_in_child=self._after_fork)
+        atexit.register(self.flush)
+
+    # -- definitions --------------------------------------------------------
+
+    def _add(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, doc, labelnames=()):
+        return self._add(Counter(self, name, doc, labelnames))
+
+    def gauge(self, name, doc, labelnames=()):
+        return self._add(Gauge(self, name, doc, labelnames))
+
+    def histogram(self, name, doc, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(self, name, doc, labelnames, buckets))
+
+    def collector(self, collect, host=False):
+        """Register ``collect()``, yielding ``(metric, labels, value)`` at snapshot time.
+
+        Process collectors report values of this process (written to its
+        file like any other sample); ``host`` collectors report values that
+        are already shared by every process and are only read by the scraper.
+        """
+        self._collectors.append((collect, host))
+
+    # -- recording ----------------------------------------------------------
+
+    def _update(self, metric, key, update):
+        if self._flusher_pid != os.getpid():
+            self._start_flusher()
+        with self._lock:
+            values = self._values.setdefault(metric.name, {})
+            values[key] = update(values.get(key))
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._values = {}
+        self._flusher_pid = None
+
+    def _start_flusher(self):
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        if self.directory is None:
+            return
+        threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Writing metrics failed")
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+
+    # -- snapshots and files ------------------------------------------------
+
+    def _run_collectors(self, host):
+        samples = {}
+        for collect, is_host in self._collectors:
+            if is_host != host:
+                continue
+            try:
+                for metric, labels, value in collect():
+                    values = samples.setdefault(metric.name, {})
+                    key = metric.key(labels)
+                    values[key] = metric.merge(values[key], value) if key in values else value
+            except Exception:
+                logger.exception("Metrics collector %r failed", collect)
+        return samples
+
+    def snapshot(self):
+        """This process's samples: ``{name: {label_values: value}}``."""
+        with self._lock:
+            samples = {name: {key: list(value) if isinstance(value, list) else value
+                              for key, value in values.items()}
+                       for name, values in self._values.items()}
+        self._merge(samples, self._run_collectors(host=False))
+        return samples
+
+    def _merge(self, into, samples, gauges=True):
+        for name, values in samples.items():
+            metric = self.metrics.get(name)
+            if metric is None or (metric.kind == 'gauge' and not gauges):
+                continue
+            target = into.setdefault(name, {})
+            for key, value in values.items():
+                key = tuple(key)
+                target[key] = metric.merge(target[key], value) if key in target else value
+
+    @staticmethod
+    def _encode(samples):
+        return {name: [[list(key), value] for key, value in values.items()] for name, values in samples.items()}
+
+    @staticmethod
+    def _decode(data):
+        return {name: {tuple(key): value for key, value in pairs} for name, pairs in data.items()}
+
+    def _write(self, filename, samples):
+        path = os.path.join(self.directory, filename)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self._encode(samples), f)
+        os.replace(tmp, path)
+
+    def _read(self, filename):
+        try:
+            with open(os.path.join(self.directory, filename)) as f:
+                return self._decode(json.load(f))
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            logger.warning("Skipping unreadable metrics file %s", filename)
+            return {}
+
+    def flush(self):
+        """Write this process's samples to ``<pid>-<start>.json``."""
+        if self.directory is None or self._flusher_pid != os.getpid():
+            return  # nothing recorded in this process
+        os.makedirs(self.directory, exist_ok=True)
+        self._write(f'{process_id()}.json', self.snapshot())
+
+    def _fold_dead(self, dead):
+        """Add the counters of exited workers to the archive and drop their files."""
+        if fcntl is None or not dead:
+            return
+        with open(os.path.join(self.directory, 'archive.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            archive = self._read(ARCHIVE)
+            folded = []
+            for filename in dead:
+                if not os.path.exists(os.path.join(self.directory, filename)):
+                    continue  # folded by another scrape meanwhile
+                self._merge(archive, self._read(filename), gauges=False)
+                folded.append(filename)
+            self._write(ARCHIVE, archive)
+            for filename in folded:
+                os.remove(os.path.join(self.directory, filename))
+
+    def collect(self):
+        """Samples of every process on this host, merged."""
+        samples = self.snapshot()
+        if self.directory is not None and os.path.isdir(self.directory):
+            me, dead = process_id(), []
+            for filename in os.listdir(self.directory):
+                stem, ext = os.path.splitext(filename)
+                if ext != '.json' or not stem.partition('-')[0].isdigit() or stem == me:
+                    continue
+                alive = _file_alive(stem)
+                self._merge(samples, self._read(filename), gauges=alive)
+                if not alive:
+                    dead.append(filename)
+            self._merge(samples, self._read(ARCHIVE), gauges=False)
+            try:
+                self._fold_dead(dead)
+            except OSError:
+                logger.exception("Folding metrics of exited workers failed")
+        self._merge(samples, self._run_collectors(host=True))
+        return samples
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        samples = self.collect()
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f'# HELP {name} {metric.doc}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for key, value in sorted(samples.get(name, {}).items()):
+                if metric.kind != 'histogram':
+                    lines.append(f'{name}{_labels(metric.labelnames, key)} {_format_value(value)}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float('inf'),), value[:-1]):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else _format_value(float(bound))
+                    lines.append(f'{name}_bucket{_labels(metric.labelnames, key, [("le", le)])} {cumulative}')
+                lines.append(f'{name}_sum{_labels(metric.labelnames, key)} {_format_value(value[-1])}')
+                lines.append(f'{name}_count{_labels(metric.labelnames, key)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+http_request_duration = registry.histogram(
+    'tapin_http_request_duration_seconds', 'Time to handle a request, by route template, method and status.',
+    ('route', 'method', 'status'))
+upstream_request_duration = registry.histogram(
+    'tapin_upstream_request_duration_seconds', 'Time of outbound calls to event, LLM and mail providers.',
+    ('provider',))
+upstream_errors = registry.counter(
+    'tapin_upstream_errors_total', 'Failed outbound calls, by provider and HTTP status class or exception type.',
+    ('provider', 'error'))
+pool_wait = registry.histogram(
+    'tapin_db_pool_wait_seconds', 'Time to check a connection out of the pool (its count is the checkouts).',
+    ('pool',), POOL_WAIT_BUCKETS)
+pool_checked_out = registry.gauge('tapin_db_pool_checked_out', 'Connections currently checked out.', ('pool',))
+pool_overflow = registry.gauge('tapin_db_pool_overflow', 'Connections open beyond pool_size.', ('pool',))
+pool_size = registry.gauge('tapin_db_pool_size', 'Configured pool size.', ('pool',))
+cache_requests = registry.counter(
+    'tapin_cache_requests_total', 'Cache lookups by cache and result (hit or miss).', ('cache', 'result'))
+
+
+# -- HTTP requests -----------------------------------------------------------
+
+def request_route():
+    """``route`` label for the current request: its URL rule, so ids don't multiply series."""
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+def init_app(app):
+    """Time every request of ``app``; register first so the timing covers the other hooks."""
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+
+    def record_request(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            http_request_duration.observe(time.perf_counter() - started, route=request_route(),
+                                          method=request.method, status=response.status_code)
+        return response
+
+    app.before_request(start_timer)
+    # after_request hooks run in reverse order of registration; this one runs last
+    app.after_request(record_request)
+
+
+# -- outbound calls ----------------------------------------------------------
+
+def error_kind(ex):
+    """Low-cardinality label for a failed call: ``429``, ``5xx``, ``4xx`` or the exception type."""
+    status = getattr(getattr(ex, 'response', None), 'status_code', None)
+    if status:
+        return '429' if status == 429 else f'{status // 100}xx'
+    return type(ex).__name__
+
+
+@contextmanager
+def upstream_call(provider):
+    """Time the enclosed call to ``provider`` and count it as failed if it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as ex:
+        upstream_errors.inc(provider=provider, error=error_kind(ex))
+        raise
+    finally:
+        upstream_request_duration.observe(time.perf_counter() - started, provider=provider)
+
+
+# -- connection pools ----------------------------------------------------------
+
+_pools = {}
+
+
+def pool_label(url):
+    """``pool`` label for an engine URL: host/database, or the SQLite file name."""
+    url = make_url(url)
+    if url.get_backend_name() == 'sqlite':
+        return os.path.basename(url.database or '') or 'memory'
+    return f'{url.host or "localhost"}/{url.database or ""}'
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection.
+
+    The ``pool`` label is the engine's ``pool_logging_name``. ``recreate``
+    (``engine.dispose()``, also after a fork) builds a new instance, which
+    replaces the old one as the source of the occupancy gauges.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics_label = self._orig_logging_name or 'default'
+        _pools[self.metrics_label] = weakref.ref(self)
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_wait.observe(time.perf_counter() - started, pool=self.metrics_label)
+
+
+def _collect_pools():
+    for label, ref in list(_pools.items()):
+        pool = ref()
+        if pool is None:
+            continue
+        yield pool_checked_out, {'pool': label}, pool.checkedout()
+        yield pool_overflow, {'pool': label}, max(0, pool.overflow())
+        yield pool_size, {'pool': label}, pool.size()
+
+
+registry.collector(_collect_pools)
+
+
+def hit_miss(cache, hits, misses):
+    """Collector samples for a cache that keeps its own hit and miss counts."""
+    yield cache_requests, {'cache': cache, 'result': 'hit'}, hits
+    yield cache_requests, {'cache': cache, 'result': 'miss'}, misses
@@ -1,5 +1,8 @@
 """
 Database migration script to add category and image_url columns to listing table
+
+Later schema changes are alembic revisions; apply them with
+``python manage.py upgrade``.
 """
 import sqlite3
 import os
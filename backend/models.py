@@ -0,0 +1,221 @@
+"""Database models.
+
+``db`` is created unbound and attached to an app by ``create_app`` in
+``app.py``, so importing the models (alembic, scripts, tests) builds no
+engine and opens no connection. The schema itself is managed by alembic
+(``python manage.py upgrade``).
+"""
+from datetime import datetime
+
+from flask_sqlalchemy import SQLAlchemy
+
+from replicas import RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+class User(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    email = db.Column(db.String(120), unique=True, nullable=False)
+    password_hash = db.Column(db.String(256), nullable=False)
+    # simple role column for basic RBAC (default: "user")
+    role = db.Column(db.String(50), default='user')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {"id": self.id, "email": self.email}
+
+
+class RevokedToken(db.Model):
+    """A revoked JWT (by jti), or all of a user's tokens issued before a cutoff."""
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(64), unique=True)
+    user_id = db.Column(db.String(64))
+    issued_before = db.Column(db.DateTime)  # set for user-wide revocations
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+
+class Listing(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text)
+    location = db.Column(db.String(200))
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+    category = db.Column(db.String(100), nullable=True)  # See ALLOWED_CATEGORIES for valid values
+    image_url = db.Column(db.String(500), nullable=True)  # URL to listing image
+    owner_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Provenance for system-generated listings imported from external events
+    source = db.Column(db.String(50), nullable=True)
+    external_id = db.Column(db.String(100), nullable=True)
+    content_hash = db.Column(db.String(64), nullable=True)  # hash of the upstream event fields
+
+    __table_args__ = (
+        db.Index('ix_listing_source_external_id', 'source', 'external_id', unique=True),
+    )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "title": self.title,
+            "description": self.description,
+            "location": self.location,
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "category": self.category,
+            "image_url": self.image_url,
+            "owner_id": self.owner_id,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+        }
+
+
+class Item(db.Model):
+    """Simple persistent items for the MVP /api/items endpoints."""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text)
+
+    def to_dict(self):
+        return {"id": self.id, "name": self.name, "description": self.description}
+
+
+class SignUp(db.Model):
+    """Track volunteer sign-ups for listings."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    listing_id = db.Column(db.Integer, db.ForeignKey('listing.id'), nullable=False)
+    status = db.Column(db.String(50), default='pending')  # pending, accepted, declined, cancelled
+    message = db.Column(db.Text)  # Optional message from volunteer
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Add unique constraint to prevent duplicate sign-ups
+    __table_args__ = (db.UniqueConstraint('user_id', 'listing_id', name='_user_listing_uc'),)
+    
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "listing_id": self.listing_id,
+            "status": self.status,
+            "message": self.message,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+        }
+
+
+class Review(db.Model):
+    """User reviews for listings."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    listing_id = db.Column(db.Integer, db.ForeignKey('listing.id'), nullable=False)
+    rating = db.Column(db.Integer, nullable=False)  # 1-5 stars
+    comment = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Add unique constraint to prevent multiple reviews from same user
+    __table_args__ = (db.UniqueConstraint('user_id', 'listing_id', name='_user_listing_review_uc'),)
+    
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "listing_id": self.listing_id,
+            "rating": self.rating,
+            "comment": self.comment,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+        }
+
+
+class Event(db.Model):
+    """Upstream events ingested locally so reads don't depend on third parties."""
+    id = db.Column(db.Integer, primary_key=True)
+    source = db.Column(db.String(50), nullable=False, index=True)  # ticketmaster, seatgeek
+    external_id = db.Column(db.String(100), nullable=False)
+    name = db.Column(db.String(300), nullable=False)
+    description = db.Column(db.Text)
+    url = db.Column(db.String(500))
+    venue = db.Column(db.String(200))
+    venue_address = db.Column(db.String(300))
+    city = db.Column(db.String(100), index=True)  # lower-cased ingestion city
+    state = db.Column(db.String(20))
+    category = db.Column(db.String(100))
+    start_local = db.Column(db.String(32))  # provider's local date/datetime string
+    start_time = db.Column(db.String(16))
+    start_at = db.Column(db.DateTime, index=True)  # UTC
+    image_url = db.Column(db.String(500))
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    content_hash = db.Column(db.String(64))
+    fetched_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('source', 'external_id', name='_event_source_external_uc'),
+        db.Index('ix_event_city_start_at', 'city', 'start_at'),
+        # keyset pagination of one provider's stream in the merged feed
+        db.Index('ix_event_city_source_start_at', 'city', 'source', 'start_at'),
+    )
+
+    def to_dict(self):
+        return {
+            "id": self.external_id,
+            "source": self.source,
+            "name": self.name,
+            "description": self.description,
+            "start": self.start_local,
+            "start_time": self.start_time,
+            "start_at": self.start_at.isoformat() + 'Z' if self.start_at else None,
+            "url": self.url,
+            "venue": self.venue,
+            "venue_address": self.venue_address,
+            "image": self.image_url,
+            "category": self.category,
+        }
+
+
+class CityRefresh(db.Model):
+    """When background content (e.g. Gemini nightlife listings) was last refreshed for a city."""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    city = db.Column(db.String(100), nullable=False)  # lower-cased
+    state = db.Column(db.String(20), nullable=False)  # upper-cased
+    refreshed_at = db.Column(db.DateTime)  # NULL until the first refresh succeeds
+
+    __table_args__ = (
+        db.UniqueConstraint('kind', 'city', 'state', name='_city_refresh_uc'),
+    )
+
+
+class Job(db.Model):
+    """Background agent job; state is persisted so it survives restarts."""
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)
+    params = db.Column(db.Text)  # JSON
+    progress = db.Column(db.Integer, default=0)
+    result = db.Column(db.Text)  # JSON counts reported by the handler
+    error = db.Column(db.Text)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    owner = db.Column(db.String(100))  # "host:pid:boot" of the worker running it
+    submitted_by = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        import json
+        iso = lambda d: d.isoformat() + 'Z' if d else None
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "params": json.loads(self.params or '{}'),
+            "progress": self.progress or 0,
+            "result": json.loads(self.result) if self.result else None,
+            "error": self.error,
+            "attempts": self.attempts,
+            "created_at": iso(self.created_at),
+            "started_at": iso(self.started_at),
+            "finished_at": iso(self.finished_at),
+        }
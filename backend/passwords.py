@@ -0,0 +1,143 @@
+"""Password hashing with configurable parameters, off the request thread.
+
+``PASSWORD_HASH_METHOD`` selects the algorithm and its cost:
+
+- ``scrypt`` (default) or ``scrypt:<n>:<r>:<p>``
+- ``pbkdf2`` or ``pbkdf2:<hash>:<iterations>``
+- ``argon2``, when the optional ``argon2-cffi`` package is installed (falls
+  back to scrypt otherwise); tune with ``ARGON2_TIME_COST``,
+  ``ARGON2_MEMORY_COST`` (KiB) and ``ARGON2_PARALLELISM``.
+
+Existing hashes in any of these formats keep verifying. ``needs_rehash``
+reports hashes made with other parameters so login can upgrade them.
+
+Hashing is deliberately CPU-heavy and holds the GIL, so one login would
+stall every other request on the same worker. ``hash_password`` and
+``verify_password`` therefore run in a bounded process pool of
+``PASSWORD_HASH_WORKERS`` processes (default: CPU count, at most 4). Set it
+to ``0`` to hash inline, e.g. in tests.
+"""
+import hmac
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+try:
+    from argon2 import PasswordHasher
+    from argon2.exceptions import InvalidHash, VerificationError
+except ImportError:  # argon2-cffi is optional
+    PasswordHasher = None
+
+logger = logging.getLogger(__name__)
+
+SCRYPT_DEFAULT = 'scrypt:32768:8:1'
+
+
+def configured_method():
+    """Canonical werkzeug method string (or 'argon2') for PASSWORD_HASH_METHOD."""
+    method = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt').strip().lower()
+    if method == 'argon2':
+        if PasswordHasher is not None:
+            return 'argon2'
+        logger.warning("PASSWORD_HASH_METHOD=argon2 but argon2-cffi is not installed; using scrypt")
+        return SCRYPT_DEFAULT
+    if method == 'scrypt':
+        return SCRYPT_DEFAULT
+    if method == 'pbkdf2':
+        return f'pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}'
+    if method.startswith('pbkdf2:') and method.count(':') == 1:
+        return f'{method}:{DEFAULT_PBKDF2_ITERATIONS}'
+    return method
+
+
+def _argon2_hasher():
+    return PasswordHasher(
+        time_cost=int(os.environ.get('ARGON2_TIME_COST', 3)),
+        memory_cost=int(os.environ.get('ARGON2_MEMORY_COST', 65536)),
+        parallelism=int(os.environ.get('ARGON2_PARALLELISM', 4)),
+    )
+
+
+def _hash(password, method):
+    if method == 'argon2':
+        return _argon2_hasher().hash(password)
+    return generate_password_hash(password, method=method)
+
+
+def _verify(pw_hash, password):
+    if pw_hash.startswith('$argon2'):
+        if PasswordHasher is None:
+            return False
+        try:
+            return _argon2_hasher().verify(pw_hash, password)
+        except (VerificationError, InvalidHash):
+            return False
+    return check_password_hash(pw_hash, password)
+
+
+def needs_rehash(pw_hash):
+    """True if ``pw_hash`` was not made with the currently configured method and cost."""
+    method = configured_method()
+    if method == 'argon2':
+        return not pw_hash.startswith('$argon2') or _argon2_hasher().check_needs_rehash(pw_hash)
+    return not hmac.compare_digest(pw_hash.split('$', 1)[0], method)
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _workers():
+    default = min(4, os.cpu_count() or 1)
+    try:
+        return max(0, int(os.environ.get('PASSWORD_HASH_WORKERS', default)))
+    except ValueError:
+        return default
+
+
+def _get_pool():
+    global _pool, _pool_pid
+    if _workers() == 0:
+        return None
+    with _pool_lock:
+        # Never reuse a pool inherited from a parent process
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=_workers())
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def reset_pool():
+    """Shut the pool down; the next call starts a new one sized from the environment."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _run(fn, *args):
+    pool = _get_pool()
+    if pool is None:
+        return fn(*args)
+    try:
+        return pool.submit(fn, *args).result()
+    except BrokenProcessPool:
+        logger.warning("Password hashing pool broke; hashing inline")
+        reset_pool()
+        return fn(*args)
+
+
+def hash_password(password):
+    return _run(_hash, password, configured_method())
+
+
+def verify_password(pw_hash, password):
+    if not pw_hash or password is None:
+        return False
+    return _run(_verify, pw_hash, password)
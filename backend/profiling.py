@@ -0,0 +1,180 @@
+"""cProfile a single request on demand, or a sample of all requests.
+
+On demand: an admin gets a signed profiling token from
+``POST /api/admin/profile-token`` and sends it with any request, as the
+``X-Profile`` header or the ``_profile`` query parameter. That request runs
+under cProfile, its stats are saved to ``PROFILE_DIR``, and the response
+names the artifact in ``X-Profile-Id``. Tokens expire after
+``PROFILE_TOKEN_MAX_AGE`` seconds (default 600).
+
+Sampled: with ``PROFILE_SAMPLE_RATE=N`` one request in N per process is
+profiled. Sampled and on-demand artifacts share the directory, which keeps
+the newest ``PROFILE_KEEP`` files (default 200).
+
+Artifacts are ``pstats`` dumps (open with ``python -m pstats`` or snakeviz)
+listed by ``GET /api/admin/profiles`` and downloaded, or rendered as a text
+summary, from ``GET /api/admin/profiles/<id>``.
+
+With neither a token nor sampling, the per-request cost is one counter
+check and a header lookup. Only one request per process is profiled at a
+time (cProfile sees one thread, and Python 3.12 allows one profiler per
+process); others arriving meanwhile run unprofiled.
+"""
+import cProfile
+import io
+import itertools
+import logging
+import os
+import pstats
+import re
+import tempfile
+import threading
+import time
+
+from flask import current_app, g, request
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'X-Profile'
+QUERY_PARAM = '_profile'
+SALT = 'request-profile'
+_ARTIFACT = re.compile(r'^[\w.-]+\.prof$')
+
+
+def _env_int(name, default):
+    try:
+        return max(0, int(os.environ.get(name, default)))
+    except (TypeError, ValueError):
+        return default
+
+
+class RequestProfiler:
+    def __init__(self, directory=None, sample_rate=None, keep=None):
+        self.directory = directory or os.environ.get('PROFILE_DIR') or os.path.join(
+            tempfile.gettempdir(), 'tapin_profiles')
+        self.sample_rate = _env_int('PROFILE_SAMPLE_RATE', 0) if sample_rate is None else sample_rate
+        self.keep = _env_int('PROFILE_KEEP', 200) if keep is None else keep
+        self.token_max_age = _env_int('PROFILE_TOKEN_MAX_AGE', 600)
+        self._requests = itertools.count(1)
+        self._saved = itertools.count(1)
+        self._busy = threading.Lock()
+
+    def init_app(self, app):
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._abandon)
+
+    # -- tokens -------------------------------------------------------------
+
+    def _serializer(self):
+        return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=SALT)
+
+    def issue_token(self, user_id):
+        """Signed token that turns on profiling for the requests that carry it."""
+        return self._serializer().dumps({"by": str(user_id)})
+
+    def _requested_by(self):
+        token = request.headers.get(HEADER) or request.args.get(QUERY_PARAM)
+        if not token:
+            return None
+        try:
+            return self._serializer().loads(token, max_age=self.token_max_age)["by"]
+        except (BadSignature, SignatureExpired, KeyError, TypeError):
+            logger.warning("Ignoring invalid profiling token on %s", request.path)
+            return None
+
+    # -- per request --------------------------------------------------------
+
+    def _start(self):
+        sampled = self.sample_rate and next(self._requests) % self.sample_rate == 0
+        requested_by = self._requested_by() if (HEADER in request.headers or QUERY_PARAM in request.args) else None
+        if not (sampled or requested_by):
+            return
+        if not self._busy.acquire(blocking=False):
+            g.profile_skipped = bool(requested_by)
+            return
+        profile = cProfile.Profile()
+        g.profile = (profile, time.perf_counter(), 'request' if requested_by else 'sampled')
+        try:
+            profile.enable()
+        except ValueError:  # another profiler is active (Python 3.12+)
+            g.pop('profile')
+            self._busy.release()
+            g.profile_skipped = bool(requested_by)
+
+    def _stop(self):
+        profile, started, kind = g.pop('profile')
+        try:
+            profile.disable()
+        finally:
+            self._busy.release()
+        return profile, time.perf_counter() - started, kind
+
+    def _finish(self, response):
+        if g.pop('profile_skipped', False):
+            response.headers['X-Profile-Skipped'] = 'busy'
+        if 'profile' not in g:
+            return response
+        profile, seconds, kind = self._stop()
+        try:
+            response.headers['X-Profile-Id'] = self.save(profile, seconds, kind)
+        except OSError:
+            logger.exception("Saving request profile failed")
+        return response
+
+    def _abandon(self, exc):
+        # the request failed before after_request ran
+        if 'profile' in g:
+            self._stop()
+
+    # -- artifacts ----------------------------------------------------------
+
+    def save(self, profile, seconds, kind):
+        os.makedirs(self.directory, exist_ok=True)
+        endpoint = re.sub(r'[^\w.-]', '_', request.endpoint or 'unmatched')
+        name = (f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{next(self._saved)}"
+                f"-{kind}-{request.method}-{endpoint}-{seconds * 1000:.0f}ms.prof")
+        profile.dump_stats(os.path.join(self.directory, name))
+        self._rotate()
+        return name
+
+    def _rotate(self):
+        files = self.list()
+        for entry in files[self.keep:]:
+            try:
+                os.remove(os.path.join(self.directory, entry["id"]))
+            except FileNotFoundError:
+                pass  # rotated by another worker
+
+    def list(self):
+        """Saved artifacts, newest first."""
+        try:
+            names = [n for n in os.listdir(self.directory) if _ARTIFACT.match(n)]
+        except FileNotFoundError:
+            return []
+        entries = []
+        for name in names:
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append({"id": name, "bytes": st.st_size, "created": st.st_mtime})
+        return sorted(entries, key=lambda e: (e["created"], e["id"]), reverse=True)
+
+    def path(self, artifact_id):
+        """File for ``artifact_id``, or None if there is no such artifact."""
+        if not _ARTIFACT.match(artifact_id or ''):
+            return None
+        path = os.path.join(self.directory, artifact_id)
+        return path if os.path.isfile(path) else None
+
+    @staticmethod
+    def summary(path, limit=40, sort='cumulative'):
+        """Text report of the ``limit`` most expensive functions in a saved profile."""
+        out = io.StringIO()
+        pstats.Stats(path, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+
+profiler = RequestProfiler()
@@ -0,0 +1,303 @@
+"""Outbound HTTP calls to external event providers.
+
+All requests to Ticketmaster, SeatGeek and SerpApi go through ``provider_get``
+so that every provider is guarded by its own circuit breaker and by the
+per-key rate limiter / daily quota in ``rate_limit``. The request itself is
+made by ``upstream_replay.http_get``, which can record it or replay it.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from circuit_breaker import breaker_states, get_breaker
+from metrics import cache_requests, upstream_call
+from rate_limit import RateLimitExceeded, get_limiter
+from upstream_replay import http_get
+
+
+TICKETMASTER_URL = "https://app.ticketmaster.com/discovery/v2/events"
+SEATGEEK_URL = "https://api.seatgeek.com/2/events"
+SERPAPI_URL = "https://serpapi.com/search.json"
+
+DEFAULT_TIMEOUT = 10
+
+# Query parameter carrying each provider's API key, and the env var it comes from
+PROVIDER_KEY_PARAMS = {'ticketmaster': 'apikey', 'seatgeek': 'client_id', 'serpapi': 'api_key'}
+PROVIDER_CREDENTIALS = {
+    'ticketmaster': 'TICKETMASTER_API_KEY',
+    'seatgeek': 'SEATGEEK_CLIENT_ID',
+    'serpapi': 'SERPAPI_KEY',
+}
+
+
+class ProviderUnavailable(Exception):
+    """The provider was skipped because its circuit breaker is open."""
+
+    def __init__(self, source, retry_after=None, message=None):
+        self.source = source
+        self.retry_after = retry_after
+        super().__init__(message or f"{source} is temporarily unavailable")
+
+
+class ProviderRateLimited(ProviderUnavailable):
+    """The provider key is over its rate or daily quota and nothing is cached."""
+
+    def __init__(self, source, retry_after=None, reason='rate'):
+        super().__init__(source, retry_after, f"{source} {reason.replace('_', ' ')} limit reached")
+        self.reason = reason
+
+
+class ResponseCache:
+    """Bounded LRU of recent successful responses, served when over budget."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(url, params):
+        return url, tuple(sorted((params or {}).items()))
+
+    def get(self, key, max_age):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[0] > max_age:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, data):
+        with self._lock:
+            self._entries[key] = (time.time(), data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+response_cache = ResponseCache()
+
+
+def _stale_ttl():
+    try:
+        return float(os.environ.get('PROVIDER_CACHE_TTL', 600))
+    except ValueError:
+        return 600.0
+
+
+def _stale_response(cache_key):
+    cached = response_cache.get(cache_key, _stale_ttl())
+    cache_requests.inc(cache='provider', result='miss' if cached is None else 'hit')
+    return cached
+
+
+def _is_upstream_failure(exc):
+    """Return True for errors that indicate the provider itself is unhealthy.
+
+    Timeouts, connection errors, 5xx responses and 429 throttling count against
+    the breaker; other 4xx responses (bad key, bad params) are our fault and do not.
+    """
+    import requests
+
+    if isinstance(exc, requests.exceptions.HTTPError) and exc.response is not None:
+        status = exc.response.status_code
+        return status >= 500 or status == 429
+    return isinstance(exc, requests.exceptions.RequestException)
+
+
+def provider_get(source, url, params=None, timeout=DEFAULT_TIMEOUT):
+    """GET ``url`` for provider ``source`` and return the decoded JSON body.
+
+    Raises ProviderUnavailable without touching the network when the
+    provider's circuit is open. When the key is over its rate limit or daily
+    quota (locally or via an upstream 429) a recently cached response for the
+    same request is returned instead, or ProviderRateLimited if there is
+    none. Other request errors are re-raised after being recorded on the breaker.
+    """
+    cache_key = ResponseCache.key(url, params)
+    breaker = get_breaker(source)
+    if not breaker.allow_request():
+        raise ProviderUnavailable(source, breaker.retry_after())
+    try:
+        get_limiter(source).acquire((params or {}).get(PROVIDER_KEY_PARAMS.get(source)))
+    except RateLimitExceeded as ex:
+        # We never reached the provider, so this says nothing about its health
+        breaker.release()
+        cached = _stale_response(cache_key)
+        if cached is not None:
+            return cached
+        raise ProviderRateLimited(source, ex.retry_after, ex.reason)
+    try:
+        with upstream_call(source):
+            resp = http_get(source, url, params=params, timeout=timeout)
+            resp.raise_for_status()
+            data = resp.json()
+    except Exception as ex:
+        if _is_upstream_failure(ex) or isinstance(ex, ValueError):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        response = getattr(ex, 'response', None)
+        if response is not None and response.status_code == 429:
+            cached = _stale_response(cache_key)
+            if cached is not None:
+                return cached
+            retry_after = response.headers.get('Retry-After')
+            raise ProviderRateLimited(source, float(retry_after) if retry_after and retry_after.isdigit() else None) from ex
+        raise
+    breaker.record_success()
+    response_cache.put(cache_key, data)
+    return data
+
+
+def provider_status():
+    """Circuit state and remaining quota for every configured provider key."""
+    breakers = breaker_states()
+    status = {}
+    for source, env_var in PROVIDER_CREDENTIALS.items():
+        api_key = os.environ.get(env_var)
+        if not api_key:
+            continue
+        status[source] = {
+            "circuit": breakers.get(source, {"state": "closed"}),
+            "quota": get_limiter(source).status(api_key),
+        }
+    return status
+
+
+def parse_start_utc(value):
+    """Parse a provider start string into a timezone-aware UTC datetime (or None).
+
+    Accepts ISO datetimes with a ``Z``/offset suffix (converted to UTC), naive
+    ISO datetimes (assumed to already be UTC) and bare ``YYYY-MM-DD`` dates.
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (ValueError, AttributeError):
+        return None
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def parse_start(value):
+    """Like ``parse_start_utc`` but naive, for storage in DateTime columns."""
+    parsed = parse_start_utc(value)
+    return parsed.replace(tzinfo=None) if parsed else None
+
+
+def _to_float(value):
+    try:
+        return float(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def normalize_ticketmaster(e, city=None, state=None, category=None):
+    """Map a Ticketmaster Discovery event onto the local Event fields."""
+    venue = (e.get("_embedded", {}).get("venues") or [{}])[0]
+    start = e.get("dates", {}).get("start", {})
+    location = venue.get("location") or {}
+    images = e.get("images") or []
+    return {
+        "source": "ticketmaster",
+        "external_id": str(e.get("id")),
+        "name": (e.get("name") or "Event")[:300],
+        "description": e.get("info", ""),
+        "url": e.get("url"),
+        "venue": venue.get("name"),
+        "venue_address": (venue.get("address") or {}).get("line1"),
+        "city": city,
+        "state": state,
+        "category": category,
+        "start_local": start.get("localDate"),
+        "start_time": start.get("localTime"),
+        "start_at": parse_start(start.get("dateTime") or start.get("localDate")),
+        "image_url": images[0].get("url") if images else None,
+        "latitude": _to_float(location.get("latitude")),
+        "longitude": _to_float(location.get("longitude")),
+    }
+
+
+def normalize_seatgeek(e, city=None, state=None, category=None):
+    """Map a SeatGeek event onto the local Event fields."""
+    venue = e.get("venue") or {}
+    location = venue.get("location") or {}
+    performers = e.get("performers") or []
+    local = e.get("datetime_local")
+    return {
+        "source": "seatgeek",
+        "external_id": str(e.get("id")),
+        "name": (e.get("title") or "Event")[:300],
+        "description": e.get("description"),
+        "url": e.get("url"),
+        "venue": venue.get("name"),
+        "venue_address": f"{venue.get('address', '')}, {venue.get('city', '')}, {venue.get('state', '')}".strip(", "),
+        "city": city,
+        "state": state,
+        "category": category or e.get("type"),
+        "start_local": local,
+        "start_time": local[11:19] if local and len(local) >= 19 else None,
+        "start_at": parse_start(e.get("datetime_utc") or local),
+        "image_url": performers[0].get("image") if performers else None,
+        "latitude": _to_float(location.get("lat")),
+        "longitude": _to_float(location.get("lon")),
+    }
+
+
+# SeatGeek uses its own event taxonomy; map our ingestion categories onto it
+SEATGEEK_CATEGORIES = {
+    'music': 'concert',
+    'sports': 'sports',
+    'arts': 'theater',
+    'theater': 'theater',
+    'family': 'family',
+    'comedy': 'comedy',
+}
+
+
+def fetch_ticketmaster_page(api_key, city, state, category=None, page=0, size=50):
+    """Fetch one page of Ticketmaster events; return (raw_events, has_more)."""
+    params = {
+        "apikey": api_key,
+        "city": city,
+        "stateCode": state,
+        "classificationName": category,
+        "size": size,
+        "page": page,
+        "sort": "date,asc",
+    }
+    params = {k: v for k, v in params.items() if v is not None}
+    data = provider_get("ticketmaster", TICKETMASTER_URL, params=params)
+    events = data.get("_embedded", {}).get("events", [])
+    page_info = data.get("page", {})
+    has_more = page_info.get("number", page) + 1 < page_info.get("totalPages", 0)
+    return events, has_more
+
+
+def fetch_seatgeek_page(client_id, city, state, category=None, page=1, size=50):
+    """Fetch one page of SeatGeek events; return (raw_events, has_more)."""
+    params = {
+        "client_id": client_id,
+        "venue.city": city,
+        "venue.state": state,
+        "type": SEATGEEK_CATEGORIES.get(category, category) if category else None,
+        "per_page": size,
+        "page": page,
+        "sort": "datetime_utc.asc",
+    }
+    params = {k: v for k, v in params.items() if v is not None}
+    data = provider_get("seatgeek", SEATGEEK_URL, params=params)
+    events = data.get("events", [])
+    meta = data.get("meta", {})
+    total = meta.get("total") or 0
+    has_more = page * (meta.get("per_page") or size) < total
+    return events, has_more
@@ -0,0 +1,129 @@
+"""Per-request SQL statement counts, DB time and a slow-query log.
+
+Engine-level ``before/after_cursor_execute`` listeners (registered for every
+engine, so replicas are covered too) time each statement. Statements run
+while handling a request are added to that request's count and DB time:
+
+- in debug mode, or with ``SQL_STATS_HEADERS`` set in the app config, the
+  response carries ``X-DB-Query-Count`` and ``X-DB-Time-Ms``;
+- every request is folded into per-endpoint totals (requests, queries, DB
+  time, worst query count, slow statements), returned by
+  ``query_stats.endpoint_stats()`` and reported under ``sql`` in
+  ``GET /api/metrics``.
+
+Any statement slower than ``SLOW_QUERY_MS`` (default 200) is logged with
+its endpoint and its SQL normalized (literals replaced by ``?``, ``IN``
+lists collapsed), in or out of a request. Totals are per process.
+"""
+import logging
+import os
+import re
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_sql(statement):
+    """``statement`` with literals and bind markers as ``?``, one line."""
+    sql = _STRING.sub('?', statement)
+    sql = _NUMBER.sub('?', sql)
+    sql = re.sub(r"%\(\w+\)s|(?<!:):\w+|\$\d+|%s", '?', sql)
+    sql = _IN_LIST.sub('(?)', sql)
+    # SQLAlchemy's "expanding" IN parameters render as (__[POSTCOMPILE_x])
+    sql = re.sub(r"\(__\[POSTCOMPILE_\w+\]\)", '(?)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+class QueryStats:
+    def __init__(self, slow_ms=None):
+        self.slow_ms = float(slow_ms if slow_ms is not None else os.environ.get('SLOW_QUERY_MS', 200))
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def init_app(self, app):
+        app.after_request(self._after_request)
+
+    # -- recording ----------------------------------------------------------
+
+    def record(self, statement, seconds):
+        slow = seconds * 1000 >= self.slow_ms
+        if has_request_context():
+            current = g.get('sql_stats')
+            if current is None:
+                current = g.sql_stats = [0, 0.0, 0]
+            current[0] += 1
+            current[1] += seconds
+            current[2] += slow
+            where = request.endpoint or request.path
+        else:
+            where = 'background'
+        if slow:
+            logger.warning("Slow query (%.1f ms) in %s: %s", seconds * 1000, where, normalize_sql(statement))
+
+    def _after_request(self, response):
+        count, seconds, slow = g.pop('sql_stats', None) or (0, 0.0, 0)
+        self._add(request.endpoint or 'unmatched', count, seconds, slow)
+        if current_app.debug or current_app.config.get('SQL_STATS_HEADERS'):
+            response.headers['X-DB-Query-Count'] = str(count)
+            response.headers['X-DB-Time-Ms'] = f"{seconds * 1000:.2f}"
+        return response
+
+    def _add(self, endpoint, count, seconds, slow):
+        with self._lock:
+            totals = self._endpoints.get(endpoint)
+            if totals is None:
+                totals = self._endpoints[endpoint] = {"requests": 0, "queries": 0, "db_seconds": 0.0,
+                                                      "max_queries": 0, "slow_queries": 0}
+            totals["requests"] += 1
+            totals["queries"] += count
+            totals["db_seconds"] += seconds
+            totals["max_queries"] = max(totals["max_queries"], count)
+            totals["slow_queries"] += slow
+
+    # -- reporting ----------------------------------------------------------
+
+    def endpoint_stats(self):
+        """``{endpoint: totals}`` with per-request means, for metrics and benchmarks."""
+        with self._lock:
+            snapshot = {name: dict(t) for name, t in self._endpoints.items()}
+        for totals in snapshot.values():
+            totals["queries_per_request"] = round(totals["queries"] / totals["requests"], 2)
+            totals["db_ms_per_request"] = round(totals["db_seconds"] * 1000 / totals["requests"], 2)
+            totals["db_seconds"] = round(totals["db_seconds"], 4)
+        return snapshot
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+query_stats = QueryStats()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_started'].pop()
+    query_stats.record(statement, time.perf_counter() - started)
+
+
+@event.listens_for(Engine, 'handle_error')
+def _on_error(context):
+    # a failed statement never reaches after_cursor_execute
+    started = context.connection.info.get('query_started') if context.connection is not None else None
+    if started:
+        started.pop()
@@ -0,0 +1,114 @@
+"""Outbound rate limiting and daily quota accounting per provider API key.
+
+Every upstream request first takes a token from the provider key's token
+bucket (per-second limit) and a unit from its daily quota counter. Both live
+in the shared local store, so the budget holds across all worker processes.
+When the bucket is empty the caller may wait briefly for the next token;
+when the wait would be too long or the daily quota is spent the request is
+refused with ``RateLimitExceeded`` and the caller falls back to cached data.
+
+Defaults follow the providers' published free-tier limits and can be
+overridden with ``RATE_LIMIT_<PROVIDER>_PER_SECOND``, ``..._BURST`` and
+``..._DAILY``. ``RATE_LIMIT_MAX_WAIT`` caps how long a request may queue
+for a token (default 1 second).
+"""
+import hashlib
+import os
+import time
+from datetime import datetime, timezone
+
+from local_store import get_store
+
+
+DEFAULT_LIMITS = {
+    # provider: (requests per second, burst, requests per day)
+    'ticketmaster': (5.0, 5, 5000),
+    'seatgeek': (10.0, 10, 10000),
+    'serpapi': (1.0, 1, 100),
+}
+FALLBACK_LIMITS = (5.0, 5, 5000)
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, provider, reason, retry_after=None):
+        self.provider = provider
+        self.reason = reason  # 'rate' or 'daily_quota'
+        self.retry_after = retry_after
+        super().__init__(f"{provider} {reason.replace('_', ' ')} limit reached")
+
+
+def _env_number(name, default, cast=float):
+    try:
+        return cast(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def key_id(api_key):
+    """Short, non-reversible identifier for an API key (safe to log and expose)."""
+    return hashlib.sha256((api_key or '').encode('utf-8')).hexdigest()[:12]
+
+
+def _seconds_until_utc_midnight(now):
+    dt = datetime.fromtimestamp(now, timezone.utc)
+    return 86400 - (dt.hour * 3600 + dt.minute * 60 + dt.second)
+
+
+class ProviderLimiter:
+    def __init__(self, provider, per_second=None, burst=None, daily=None, store=None):
+        d_rate, d_burst, d_daily = DEFAULT_LIMITS.get(provider, FALLBACK_LIMITS)
+        prefix = f"RATE_LIMIT_{provider.upper()}_"
+        self.provider = provider
+        self.per_second = per_second if per_second is not None else _env_number(prefix + 'PER_SECOND', d_rate)
+        self.burst = burst if burst is not None else _env_number(prefix + 'BURST', d_burst, int)
+        self.daily = daily if daily is not None else _env_number(prefix + 'DAILY', d_daily, int)
+        self._store = store
+
+    @property
+    def store(self):
+        return self._store or get_store()
+
+    def _keys(self, api_key, now):
+        kid = key_id(api_key)
+        day = datetime.fromtimestamp(now, timezone.utc).strftime('%Y%m%d')
+        return f"rl:{self.provider}:{kid}", f"quota:{self.provider}:{kid}:{day}"
+
+    def acquire(self, api_key, max_wait=None, sleep=time.sleep):
+        """Reserve budget for one request, waiting up to ``max_wait`` seconds for a token."""
+        max_wait = _env_number('RATE_LIMIT_MAX_WAIT', 1.0) if max_wait is None else max_wait
+        deadline = time.time() + max_wait
+        while True:
+            now = time.time()
+            bucket_key, quota_key = self._keys(api_key, now)
+            allowed, wait = self.store.take_token(bucket_key, self.per_second, self.burst, now=now)
+            if allowed:
+                break
+            if now + wait > deadline:
+                raise RateLimitExceeded(self.provider, 'rate', retry_after=wait)
+            sleep(wait)
+        ok, _ = self.store.incr(quota_key, limit=self.daily, ttl=_seconds_until_utc_midnight(now) + 60, now=now)
+        if not ok:
+            raise RateLimitExceeded(self.provider, 'daily_quota', retry_after=_seconds_until_utc_midnight(now))
+
+    def status(self, api_key):
+        now = time.time()
+        bucket_key, quota_key = self._keys(api_key, now)
+        used = self.store.get(quota_key, now=now)
+        return {
+            "key_id": key_id(api_key),
+            "per_second": self.per_second,
+            "tokens_available": round(self.store.bucket_level(bucket_key, self.per_second, self.burst, now=now), 2),
+            "daily_limit": self.daily,
+            "daily_used": used,
+            "daily_remaining": max(0, self.daily - used),
+        }
+
+
+_limiters = {}
+
+
+def get_limiter(provider):
+    limiter = _limiters.get(provider)
+    if limiter is None:
+        limiter = _limiters.setdefault(provider, ProviderLimiter(provider))
+    return limiter
@@ -0,0 +1,223 @@
+"""Route read-only request traffic to database read replicas.
+
+Set ``SQLALCHEMY_REPLICA_URIS`` to a comma-separated list of replica URLs.
+``RoutingSession`` (installed as the Flask-SQLAlchemy session class) then
+sends the SELECTs of ``GET``/``HEAD`` requests to a replica chosen round
+robin among the healthy ones. Everything else stays on the primary:
+
+- writes: flushes and INSERT/UPDATE/DELETE statements, in any request,
+  and every read after them in the same request;
+- non-GET requests, and code running outside a request (jobs, CLI);
+- views decorated with ``@use_primary``, for reads that must see data the
+  same client has just written (e.g. polling a job it just created), and
+  single statements run with ``.execution_options(use_primary=True)``;
+- read-your-writes: for ``REPLICA_STICKY_SECONDS`` (default 5) after a
+  client's successful write, that client's reads go to the primary too.
+  Clients are identified by user id: the identity in the request's access
+  token, or the user a view names with ``stick_user`` (login and register,
+  whose requests carry no token yet). Anonymous clients fall back to their
+  IP address. The marker is a counter with a ttl in the shared local
+  store, so it holds across workers and is deleted by the store's
+  periodic purge once it expires.
+
+Replicas are health-checked with ``SELECT 1`` at most every
+``REPLICA_HEALTH_INTERVAL`` seconds (default 10), and a replica whose
+connection fails is taken out of rotation until its next check. With no
+healthy replica, reads fall back to the primary.
+"""
+import hashlib
+import itertools
+import logging
+import os
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, g, has_request_context, request
+from flask_jwt_extended import decode_token
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.sql.dml import UpdateBase
+
+from local_store import get_store
+
+logger = logging.getLogger(__name__)
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+class Replica:
+    def __init__(self, url, engine):
+        self.url = url
+        self.engine = engine
+        self.healthy = True
+        self.checked_at = None
+        self.last_error = None
+
+
+class ReplicaRouter:
+    def __init__(self, health_interval=None, clock=time.monotonic):
+        self.health_interval = float(health_interval if health_interval is not None
+                                     else os.environ.get('REPLICA_HEALTH_INTERVAL', 10))
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.replicas = []
+        self._turn = itertools.count()
+
+    def configure(self, urls, engine_options=None):
+        """Replace the replica set with engines for ``urls``."""
+        self.dispose()
+        replicas = []
+        for url in urls:
+            engine = create_engine(url, **(engine_options(url) if callable(engine_options) else engine_options or {}))
+            replica = Replica(url, engine)
+            event.listen(engine, 'handle_error', self._on_error(replica))
+            replicas.append(replica)
+        with self._lock:
+            self.replicas = replicas
+
+    def init_app(self, app, engine_options=None):
+        """Configure replicas from SQLALCHEMY_REPLICA_URIS and hook request routing into ``app``."""
+        urls = [u.strip() for u in os.environ.get('SQLALCHEMY_REPLICA_URIS', '').split(',') if u.strip()]
+        if urls:
+            self.configure(urls, engine_options)
+        app.before_request(_reset_request_routing)
+        app.after_request(_stick_writers_to_primary)
+
+    def _on_error(self, replica):
+        def handle_error(context):
+            if context.is_disconnect or context.connection is None:
+                self.mark_down(replica, context.original_exception)
+        return handle_error
+
+    def mark_down(self, replica, error):
+        replica.healthy = False
+        replica.checked_at = self._clock()
+        replica.last_error = str(error)
+        logger.warning("Replica %s marked down: %s", _safe_url(replica.url), error)
+
+    def _check(self, replica):
+        if replica.checked_at is not None and self._clock() - replica.checked_at < self.health_interval:
+            return replica.healthy
+        replica.checked_at = self._clock()
+        try:
+            with replica.engine.connect() as conn:
+                conn.execute(text('SELECT 1'))
+        except Exception as ex:
+            self.mark_down(replica, ex)
+            return False
+        replica.healthy, replica.last_error = True, None
+        return True
+
+    def pick(self):
+        """Next healthy replica engine in round-robin order, or None."""
+        replicas = self.replicas
+        if not replicas:
+            return None
+        with self._lock:
+            start = next(self._turn)
+        for offset in range(len(replicas)):
+            replica = replicas[(start + offset) % len(replicas)]
+            if self._check(replica):
+                return replica.engine
+        return None
+
+    def status(self):
+        return [{"url": _safe_url(r.url), "healthy": r.healthy, "last_error": r.last_error}
+                for r in self.replicas]
+
+    def dispose(self, close=True):
+        for replica in self.replicas:
+            replica.engine.dispose(close=close)
+
+
+def _safe_url(url):
+    # never report credentials
+    if '@' in url and '://' in url:
+        scheme, rest = url.split('://', 1)
+        return f"{scheme}://***@{rest.rsplit('@', 1)[1]}"
+    return url
+
+
+router = ReplicaRouter()
+
+
+def stick_user(user_id):
+    """Treat this request as made by ``user_id`` for read-your-writes."""
+    g.rw_user_id = str(user_id)
+
+
+def _request_user():
+    """User id from the request's bearer token, without the blocklist lookup (memoized per request)."""
+    if 'rw_token_user' not in g:
+        user_id = None
+        auth = request.headers.get('Authorization', '')
+        if auth.startswith('Bearer '):
+            try:
+                user_id = str(decode_token(auth[7:])[current_app.config['JWT_IDENTITY_CLAIM']])
+            except Exception:
+                user_id = None  # invalid or expired: the view will reject it anyway
+        g.rw_token_user = user_id
+    return g.rw_token_user
+
+
+def _client_key():
+    user_id = g.get('rw_user_id') or _request_user()
+    if user_id is not None:
+        return f'rw:user:{user_id}'
+    ident = request.remote_addr or 'unknown'
+    return 'rw:ip:' + hashlib.sha256(ident.encode('utf-8')).hexdigest()[:16]
+
+
+def mark_client_wrote():
+    """Pin this client's reads to the primary for REPLICA_STICKY_SECONDS."""
+    if router.replicas:
+        ttl = float(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+        get_store().incr(_client_key(), ttl=ttl)
+
+
+def _reset_request_routing():
+    # g can outlive a request (e.g. an app context pushed around several)
+    for name in ('db_read_engine', 'db_use_primary', 'rw_user_id', 'rw_token_user'):
+        g.pop(name, None)
+
+
+def _stick_writers_to_primary(response):
+    if request.method not in READ_METHODS + ('OPTIONS',) and response.status_code < 400:
+        mark_client_wrote()
+    return response
+
+
+def use_primary(fn):
+    """Run a GET view entirely against the primary."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        g.db_use_primary = True
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+def _read_replica_for_request():
+    """Replica engine for this request's reads, or None for the primary (memoized per request)."""
+    if 'db_read_engine' not in g:
+        engine = None
+        if router.replicas and request.method in READ_METHODS and not g.get('db_use_primary'):
+            if not get_store().get(_client_key()):
+                engine = router.pick()
+        g.db_read_engine = engine
+    if g.get('db_use_primary'):
+        return None
+    return g.db_read_engine
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            if self._flushing or isinstance(clause, UpdateBase):
+                # a request that wrote reads the rest of its data back from the primary
+                g.db_use_primary = True
+            elif not (clause is not None and clause.get_execution_options().get('use_primary')):
+                engine = _read_replica_for_request()
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
@@ -0,0 +1,162 @@
+"""Revoked-token list checked on every authenticated request.
+
+Revocations are persisted as ``RevokedToken`` rows of two shapes:
+
+- a single token, by ``jti`` (logout);
+- every token of a user issued before ``issued_before`` (password reset).
+
+Each process mirrors the rows in memory: a set of revoked jtis and a map of
+per-user cutoffs, so ``is_revoked`` is a set lookup and a dict lookup. The
+mirror is refreshed incrementally from the database at most every
+``REVOCATION_SYNC_INTERVAL`` seconds (default 5), which bounds how long a
+token revoked in another worker stays usable there. Revocations made in
+this process apply immediately.
+
+Rows are only needed until the tokens they cover would have expired anyway;
+every ``REVOCATION_COMPACT_INTERVAL`` seconds (default 3600) expired rows are
+deleted from the database and dropped from memory.
+
+Sync and compaction run inside whatever request is due for them, so they
+use their own connection to the primary and never flush or commit the
+request's session. If the database is unreachable, sync logs the error and
+the checks keep using the mirror as last synced.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import sqlalchemy as sa
+
+logger = logging.getLogger(__name__)
+
+# Rows committed slightly out of id/timestamp order by concurrent writers are
+# still picked up because every sync re-reads this many seconds of history
+SYNC_OVERLAP = 60
+
+
+def _utc(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None)
+
+
+class RevocationList:
+    def __init__(self, sync_interval=None, compact_interval=None, clock=time.monotonic):
+        self.sync_interval = float(sync_interval if sync_interval is not None
+                                   else os.environ.get('REVOCATION_SYNC_INTERVAL', 5))
+        self.compact_interval = float(compact_interval if compact_interval is not None
+                                      else os.environ.get('REVOCATION_COMPACT_INTERVAL', 3600))
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._jtis = {}  # jti -> expires (unix seconds)
+        self._cutoffs = {}  # user id (str) -> (issued_before, expires) in unix seconds
+        self._synced_until = None  # DB timestamp covered by the last sync
+        self._next_sync = 0.0
+        self._next_compact = 0.0
+        self.db = self.model = None
+
+    def init_app(self, db, model):
+        self.db, self.model = db, model
+
+    # -- checks -------------------------------------------------------------
+
+    def is_revoked(self, payload):
+        """True if the decoded JWT ``payload`` has been revoked."""
+        if self._clock() >= self._next_sync:
+            self.sync()
+        if payload.get('jti') in self._jtis:
+            return True
+        cutoff = self._cutoffs.get(str(payload.get('sub')))
+        # iat has one-second resolution; tokens minted in the same second as
+        # the cutoff are treated as issued after it
+        return cutoff is not None and payload.get('iat', 0) < cutoff[0]
+
+    # -- writes -------------------------------------------------------------
+
+    def revoke_token(self, payload):
+        """Revoke one decoded token (``jti`` until its ``exp``)."""
+        jti, exp = payload['jti'], payload.get('exp') or time.time() + 86400
+        row = self.model(jti=jti, user_id=str(payload.get('sub')), expires_at=_utc(exp),
+                         created_at=datetime.utcnow())
+        self.db.session.add(row)
+        self.db.session.commit()
+        with self._lock:
+            self._jtis[jti] = exp
+
+    def revoke_user(self, user_id, max_token_age):
+        """Revoke every token of ``user_id`` issued before now.
+
+        ``max_token_age`` is the longest lifetime of any token type, in
+        seconds; after that the cutoff can no longer match anything.
+        """
+        now = int(time.time())
+        row = self.model(user_id=str(user_id), issued_before=_utc(now), expires_at=_utc(now + max_token_age),
+                         created_at=datetime.utcnow())
+        self.db.session.add(row)
+        self.db.session.commit()
+        with self._lock:
+            self._add_cutoff(str(user_id), now, now + max_token_age)
+
+    def _add_cutoff(self, user_id, issued_before, expires):
+        current = self._cutoffs.get(user_id)
+        if current is None or current[0] < issued_before:
+            self._cutoffs[user_id] = (issued_before, expires)
+
+    # -- sync / compaction --------------------------------------------------
+
+    def sync(self):
+        """Pull revocations recorded since the last sync (by any process)."""
+        with self._lock:
+            if self._clock() < self._next_sync:
+                return
+            self._next_sync = self._clock() + self.sync_interval
+            since = self._synced_until
+        started = datetime.utcnow()
+        model = self.model
+        query = sa.select(model.jti, model.user_id, model.issued_before, model.expires_at)
+        if since is not None:
+            query = query.where(model.created_at >= since)
+        try:
+            # Not the request's session, and not a replica: a lagging replica
+            # could miss rows for good once the sync window has moved past them
+            with self.db.engine.connect() as conn:
+                rows = conn.execute(query).all()
+        except Exception as ex:
+            logger.warning("revocation sync failed, using the last synced list: %s", ex)
+            return
+        with self._lock:
+            for jti, user_id, issued_before, expires_at in rows:
+                expires = expires_at.replace(tzinfo=timezone.utc).timestamp()
+                if jti:
+                    self._jtis[jti] = expires
+                elif issued_before is not None:
+                    cutoff = int(issued_before.replace(tzinfo=timezone.utc).timestamp())
+                    self._add_cutoff(user_id, cutoff, expires)
+            self._synced_until = started - timedelta(seconds=SYNC_OVERLAP)
+        if self._clock() >= self._next_compact:
+            self.compact()
+
+    def compact(self):
+        """Forget revocations whose tokens have expired, in memory and in the database."""
+        self._next_compact = self._clock() + self.compact_interval
+        now = time.time()
+        with self._lock:
+            self._jtis = {jti: exp for jti, exp in self._jtis.items() if exp > now}
+            self._cutoffs = {uid: c for uid, c in self._cutoffs.items() if c[1] > now}
+        try:
+            with self.db.engine.begin() as conn:
+                conn.execute(sa.delete(self.model).where(self.model.expires_at < _utc(now)))
+        except Exception as ex:
+            # the rows are deleted on the next compaction; the checks don't need it
+            logger.warning("revocation compaction failed: %s", ex)
+
+    def clear(self):
+        """Drop the in-memory mirror; the next check re-reads everything."""
+        with self._lock:
+            self._jtis.clear()
+            self._cutoffs.clear()
+            self._synced_until = None
+            self._next_sync = 0.0
+
+    def __len__(self):
+        return len(self._jtis) + len(self._cutoffs)
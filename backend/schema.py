@@ -0,0 +1,87 @@
+"""Bring the database schema up to date with the alembic migrations.
+
+``create_app`` calls ``upgrade`` at startup unless ``SCHEMA_UPGRADE=off``
+(set it when migrations run as a deploy step instead), and
+``python manage.py upgrade`` calls it directly.
+
+Before migrations, the app ran ``db.create_all()`` and never stamped the
+database. Such a database is stamped at ``0001_initial`` first, so the
+baseline revision fills in whatever it lacks and the later revisions add
+the newer tables and columns. A database that ``create_all`` built from the
+current models is stamped at head.
+
+Workers starting together would each try to migrate. The upgrade holds an
+exclusive file lock per database on the host and, on PostgreSQL, an
+advisory lock, so one migrates and the others find the schema current.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
+
+import sqlalchemy as sa
+
+try:
+    import fcntl
+except ImportError:  # Windows: workers are not serialized across processes
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'alembic')
+UNVERSIONED = '0001_initial'
+# any id fits in a bigint; this one is "tapin" in ASCII
+ADVISORY_LOCK_ID = 0x746170696e
+
+
+def alembic_config(connection):
+    from alembic.config import Config
+
+    config = Config()
+    config.set_main_option('script_location', ALEMBIC_DIR)
+    config.attributes['connection'] = connection
+    return config
+
+
+def unversioned_revision(connection):
+    """The revision to stamp a database built by ``create_all``, or None."""
+    from models import db
+
+    inspector = sa.inspect(connection)
+    tables = set(inspector.get_table_names())
+    if not tables or 'alembic_version' in tables:
+        return None
+    current = tables >= set(db.metadata.tables) and all(
+        {c.name for c in table.columns} <= {c['name'] for c in inspector.get_columns(name)}
+        for name, table in db.metadata.tables.items())
+    return 'head' if current else UNVERSIONED
+
+
+@contextmanager
+def _host_lock(url):
+    if fcntl is None:
+        yield
+        return
+    name = hashlib.sha256(str(url).encode('utf-8')).hexdigest()[:16]
+    with open(os.path.join(tempfile.gettempdir(), f'tapin_schema_{name}.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def upgrade(engine, revision='head'):
+    """Migrate the database behind ``engine`` to ``revision``."""
+    from alembic import command
+
+    with _host_lock(engine.url), engine.begin() as connection:
+        if connection.dialect.name == 'postgresql':
+            connection.execute(sa.text('SELECT pg_advisory_xact_lock(:id)'), {"id": ADVISORY_LOCK_ID})
+        config = alembic_config(connection)
+        stamp = unversioned_revision(connection)
+        if stamp:
+            logger.warning("database has no alembic version; stamping it at %s", stamp)
+            command.stamp(config, stamp)
+        command.upgrade(config, revision)
@@ -0,0 +1,88 @@
+"""Engine settings for running the backend on a SQLite file.
+
+The Postgres-oriented defaults (pre-ping, recycle, small pool) do nothing
+useful for SQLite, and without WAL a single writer blocks every reader and
+concurrent writers fail fast with "database is locked". This profile:
+
+- applies per-connection pragmas on every new DBAPI connection:
+  ``journal_mode=WAL`` (readers never block the writer and vice versa),
+  ``synchronous=NORMAL`` (safe with WAL, far fewer fsyncs),
+  ``busy_timeout`` (wait for the write lock instead of failing), plus
+  ``mmap_size``, ``cache_size`` and ``temp_store=MEMORY`` for reads;
+- uses a ``QueuePool`` sized for a threaded worker, without pre-ping or
+  recycling (a local file connection does not go stale);
+- optionally starts write transactions with ``BEGIN IMMEDIATE``
+  (``SQLITE_BEGIN_MODE=immediate``) so a request that reads and then writes
+  takes the write lock up front and cannot fail with SQLITE_BUSY when it
+  tries to upgrade.
+
+Every knob can be overridden from the environment: ``SQLITE_BUSY_TIMEOUT_MS``
+(5000), ``SQLITE_SYNCHRONOUS`` (NORMAL), ``SQLITE_MMAP_SIZE`` (256 MiB),
+``SQLITE_CACHE_SIZE_KB`` (16000), ``SQLITE_POOL_SIZE`` (10).
+"""
+import os
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+def _setting(name, default):
+    return os.environ.get(name, default)
+
+
+def is_sqlite_url(url):
+    return isinstance(url, str) and url.lower().startswith('sqlite')
+
+
+def is_memory_url(url):
+    return url in ('sqlite://', 'sqlite:///:memory:') or 'mode=memory' in url
+
+
+def engine_options(url):
+    """SQLAlchemy engine options for a SQLite URL."""
+    busy_seconds = int(_setting('SQLITE_BUSY_TIMEOUT_MS', 5000)) / 1000
+    options = {
+        # pysqlite's own lock wait; the busy_timeout pragma below covers
+        # connections it didn't open
+        'connect_args': {'timeout': busy_seconds, 'check_same_thread': False},
+    }
+    if not is_memory_url(url):
+        # Flask-SQLAlchemy picks a StaticPool for in-memory databases itself
+        options['pool_size'] = int(_setting('SQLITE_POOL_SIZE', 10))
+        options['max_overflow'] = 2 * options['pool_size']
+    return options
+
+
+def apply_pragmas(dbapi_connection):
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute(f"PRAGMA synchronous={_setting('SQLITE_SYNCHRONOUS', 'NORMAL')}")
+        cursor.execute(f"PRAGMA busy_timeout={int(_setting('SQLITE_BUSY_TIMEOUT_MS', 5000))}")
+        cursor.execute(f"PRAGMA mmap_size={int(_setting('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))}")
+        cursor.execute(f"PRAGMA cache_size=-{int(_setting('SQLITE_CACHE_SIZE_KB', 16000))}")
+        cursor.execute('PRAGMA temp_store=MEMORY')
+    finally:
+        cursor.close()
+
+
+def _begin_immediate():
+    return _setting('SQLITE_BEGIN_MODE', 'deferred').lower() == 'immediate'
+
+
+@event.listens_for(Engine, 'connect')
+def _on_connect(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    apply_pragmas(dbapi_connection)
+    if _begin_immediate():
+        # Take over transaction control from pysqlite so _on_begin can
+        # issue BEGIN IMMEDIATE itself
+        dbapi_connection.isolation_level = None
+
+
+@event.listens_for(Engine, 'begin')
+def _on_begin(conn):
+    if conn.dialect.name == 'sqlite' and _begin_immediate():
+        conn.exec_driver_sql('BEGIN IMMEDIATE')
@@ -0,0 +1,336 @@
+"""Deterministic synthetic users, listings, sign-ups and reviews at any scale.
+
+``seed_data.py`` and ``seed_sample_data.py`` insert a few hand-written rows
+for UI work. This generator is for load tests and benchmarks: the same seed
+and counts always produce the same rows, and everything is bulk inserted
+(executemany in chunks, one transaction per table) with a single password
+hash computed up front and shared by every user. On SQLite, a hundred
+thousand listings with their users, sign-ups and reviews (about 400k rows)
+load in under ten seconds; a million listings take about a minute and a half.
+
+The data is skewed the way real traffic is:
+
+- listings are spread over metro areas weighted by population, with
+  coordinates scattered around each metro's center;
+- categories are weighted (community work is common, nightlife rare) and
+  description lengths follow a log-normal distribution, from a sentence to
+  a few paragraphs;
+- a small share of users (organizations) own most listings;
+- sign-ups per listing follow a power law, so a few listings are very
+  popular, and a few users are very active; reviewers are volunteers who
+  signed up, and ratings lean positive with a per-listing mean.
+
+Run against the app's database (``SQLALCHEMY_DATABASE_URI``):
+
+    python synthetic_data.py --users 100000 --listings 1000000 [--seed 0]
+        [--metros houston,austin] [--signups-per-listing 2] [--reviews-per-listing 1] [--reset]
+
+Every user's password is ``--password`` (default ``password``) and their
+email is ``user<id>@example.com``.
+"""
+import argparse
+import bisect
+import itertools
+import math
+import random
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select
+
+Metro = namedtuple('Metro', 'name state latitude longitude population')
+
+METROS = {
+    'houston': Metro('Houston', 'TX', 29.7604, -95.3698, 7.1),
+    'dallas': Metro('Dallas', 'TX', 32.7767, -96.7970, 7.6),
+    'austin': Metro('Austin', 'TX', 30.2672, -97.7431, 2.4),
+    'san-antonio': Metro('San Antonio', 'TX', 29.4241, -98.4936, 2.6),
+    'el-paso': Metro('El Paso', 'TX', 31.7619, -106.4850, 0.9),
+    'new-orleans': Metro('New Orleans', 'LA', 29.9511, -90.0715, 1.3),
+    'atlanta': Metro('Atlanta', 'GA', 33.7490, -84.3880, 6.1),
+    'chicago': Metro('Chicago', 'IL', 41.8781, -87.6298, 9.4),
+    'los-angeles': Metro('Los Angeles', 'CA', 34.0522, -118.2437, 13.2),
+    'new-york': Metro('New York', 'NY', 40.7128, -74.0060, 19.8),
+}
+DEFAULT_METROS = ('houston', 'dallas', 'austin', 'san-antonio', 'el-paso')
+
+# Share of listings per category (ALLOWED_CATEGORIES in app.py)
+CATEGORY_WEIGHTS = {
+    'Community': 30, 'Environment': 20, 'Education': 18, 'Health': 14, 'Animals': 12, 'Nightlife': 6,
+}
+ACTIVITIES = {
+    'Community': ['Food bank shift', 'Neighborhood cleanup', 'Clothing drive', 'Senior center visit',
+                  'Shelter kitchen crew', 'Block party setup', 'Holiday meal delivery', 'Library book sort'],
+    'Environment': ['Park cleanup', 'Tree planting', 'Community garden day', 'Bayou trash pickup',
+                    'Recycling drive', 'Trail maintenance', 'Native plant restoration'],
+    'Education': ['Homework help', 'Reading buddies', 'ESL conversation class', 'Math tutoring',
+                  'Coding club mentor', 'College essay review', 'Science fair judge'],
+    'Health': ['Blood drive volunteer', 'Health fair greeter', 'Hospital wayfinding', 'Meal prep for patients',
+               'Vaccination clinic support', 'Wellness walk leader'],
+    'Animals': ['Dog walking', 'Cat socializing', 'Adoption event helper', 'Kennel cleaning',
+                'Wildlife rescue transport', 'Foster supply drive'],
+    'Nightlife': ['Live music night crew', 'Festival stage hand', 'Charity gala usher', 'Open mic host',
+                  'Late-night food truck helper'],
+}
+PLACES = ['Downtown', 'Midtown', 'Eastside', 'Westside', 'Northside', 'Southside', 'Heights', 'Riverside',
+          'Old Town', 'University District', 'Museum District', 'Third Ward', 'Uptown', 'Lakeside']
+SENTENCES = {
+    'Community': ['Help sort and pack donations for families in need.',
+                  'Volunteers greet neighbors and hand out groceries.',
+                  'We need people to set up tables and chairs before the event.'],
+    'Environment': ['Bring gloves and a water bottle; we provide bags and grabbers.',
+                    'We will plant native trees along the trail.',
+                    'Help us keep the park clean for everyone.'],
+    'Education': ['Tutors work one on one with students after school.',
+                  'No teaching experience needed, just patience.',
+                  'Sessions follow the school curriculum for each grade.'],
+    'Health': ['Volunteers check in visitors and answer questions.',
+               'Training is provided on the first day.',
+               'A short health screening is required before your first shift.'],
+    'Animals': ['Walk and play with dogs waiting for adoption.',
+                'Help clean kennels and refill food and water.',
+                'Socialized animals find homes faster.'],
+    'Nightlife': ['Help run the door and the merch table.',
+                  'Doors open at eight and the last set ends at midnight.',
+                  'Must be 21 or older for this shift.'],
+}
+COMMON_SENTENCES = [
+    'Shifts last about two hours.', 'Parking is available on site.', 'Groups and families are welcome.',
+    'Wear closed-toe shoes.', 'Snacks and water are provided.', 'Sign up to reserve your spot.',
+    'Please arrive ten minutes early for a short orientation.', 'This is a great first volunteer opportunity.',
+    'You can come once or join us every week.', 'Contact the organizer with any questions.',
+]
+SIGNUP_STATUSES = (('pending', 40), ('accepted', 45), ('declined', 8), ('cancelled', 7))
+
+# Fixed reference time, so the same seed gives the same timestamps on any day
+ANCHOR = datetime(2025, 1, 1)
+
+
+def parse_metros(text):
+    """Metros from ``houston,austin`` (built-in names) or ``Name:ST:lat:lon:population`` entries."""
+    metros = []
+    for entry in (e.strip() for e in text.split(',') if e.strip()):
+        if entry.lower() in METROS:
+            metros.append(METROS[entry.lower()])
+            continue
+        try:
+            name, state, lat, lon, population = entry.split(':')
+            metros.append(Metro(name, state.upper(), float(lat), float(lon), float(population)))
+        except ValueError:
+            raise ValueError(f"unknown metro {entry!r}: use one of {', '.join(METROS)} "
+                             f"or Name:ST:latitude:longitude:population")
+    return metros
+
+
+class _Picker:
+    """Weighted choice over fixed options, precomputed for speed."""
+
+    def __init__(self, weighted):
+        self.options = [option for option, _ in weighted]
+        self.cumulative = list(itertools.accumulate(weight for _, weight in weighted))
+
+    def __call__(self, rnd):
+        return self.options[bisect.bisect(self.cumulative, rnd.random() * self.cumulative[-1])]
+
+
+_DESCRIPTION_SENTENCES = {category: own + COMMON_SENTENCES for category, own in SENTENCES.items()}
+_WORDS_PER_SENTENCE = {category: sum(s.count(' ') + 1 for s in sentences) / len(sentences)
+                       for category, sentences in _DESCRIPTION_SENTENCES.items()}
+
+
+def _description(rnd, category, words):
+    sentences = _DESCRIPTION_SENTENCES[category]
+    return ' '.join(rnd.choices(sentences, k=max(1, round(words / _WORDS_PER_SENTENCE[category]))))
+
+
+def _power_law(rnd, mean, cap):
+    """Non-negative integer with the given mean and a heavy tail (Pareto, alpha 2)."""
+    return min(cap, int((rnd.paretovariate(2.0) - 1) * mean + rnd.random()))
+
+
+class SyntheticData:
+    def __init__(self, seed=0, metros=None, password='password', now=ANCHOR, days=365):
+        self.seed = seed
+        self.metros = list(metros or [METROS[m] for m in DEFAULT_METROS])
+        self.password = password
+        self.now = now
+        self.days = days
+        self._metro = _Picker([(m, m.population) for m in self.metros])
+        self._category = _Picker(list(CATEGORY_WEIGHTS.items()))
+        self._status = _Picker(SIGNUP_STATUSES)
+
+    def _random(self, table):
+        # one stream per table, so changing one count leaves the other tables alone
+        return random.Random(f'{self.seed}:{table}')
+
+    def _ago(self, rnd, skew=2.0):
+        # recent rows are denser than old ones
+        return self.now - timedelta(seconds=int(self.days * 86400 * rnd.random() ** skew))
+
+    # -- rows ----------------------------------------------------------------
+
+    def users(self, count, first_id, password_hash):
+        rnd = self._random('users')
+        for user_id in range(first_id, first_id + count):
+            yield {"id": user_id, "email": f"user{user_id}@example.com", "password_hash": password_hash,
+                   "role": 'user', "created_at": self._ago(rnd, skew=1.0)}
+
+    def listings(self, count, first_id, owners):
+        """Listing rows; ``owners`` is the list of user ids that can own listings."""
+        rnd = self._random('listings')
+        # about 5% of users post listings, the busiest far more than the rest
+        organizations = owners[:max(1, len(owners) // 20)]
+        for listing_id in range(first_id, first_id + count):
+            metro = self._metro(rnd)
+            category = self._category(rnd)
+            words = min(600, max(8, int(rnd.lognormvariate(math.log(40), 0.8))))
+            yield {
+                "id": listing_id,
+                "title": f"{rnd.choice(ACTIVITIES[category])} - {rnd.choice(PLACES)} {metro.name}",
+                "description": _description(rnd, category, words),
+                "location": f"{metro.name}, {metro.state}",
+                "latitude": round(rnd.gauss(metro.latitude, 0.12), 6),
+                "longitude": round(rnd.gauss(metro.longitude, 0.12), 6),
+                "category": category,
+                "image_url": None,
+                "owner_id": organizations[min(len(organizations) - 1, int(len(organizations) * rnd.random() ** 3))],
+                "created_at": self._ago(rnd),
+            }
+
+    def signups_and_reviews(self, listings, users, signups_per_listing, reviews_per_listing):
+        """(signups, reviews) row iterators over ``listings`` (id, created_at) pairs and ``users`` ids.
+
+        Each listing's volunteers are a run of consecutive users starting at
+        a point biased towards the most active users, so pairs are unique.
+        Each volunteer reviews the listing with probability
+        ``reviews_per_listing / signups_per_listing``.
+        """
+        rnd = self._random('signups')
+        review_rate = reviews_per_listing / signups_per_listing if signups_per_listing else 0
+        cap = min(len(users), 5000)
+        signups, reviews = [], []
+        for listing_id, created_at in listings:
+            count = _power_law(rnd, signups_per_listing, cap)
+            if not count:
+                continue
+            start = int(len(users) * rnd.random() ** 2)
+            mean_rating = min(5.0, rnd.gauss(4.1, 0.5))
+            age = max(1, int((self.now - created_at).total_seconds()))
+            for j in range(count):
+                user_id = users[(start + j) % len(users)]
+                signed_up = created_at + timedelta(seconds=int(rnd.random() * age))
+                signups.append({"user_id": user_id, "listing_id": listing_id, "status": self._status(rnd),
+                                "message": None, "created_at": signed_up})
+                if rnd.random() < review_rate:
+                    rating = min(5, max(1, round(rnd.gauss(mean_rating, 0.8))))
+                    reviews.append({"user_id": user_id, "listing_id": listing_id, "rating": rating,
+                                    "comment": None, "created_at": signed_up})
+            if len(signups) >= 50000:
+                yield signups, reviews
+                signups, reviews = [], []
+        yield signups, reviews
+
+    # -- loading -------------------------------------------------------------
+
+    def load(self, session, users, listings, signups_per_listing=2.0, reviews_per_listing=1.0,
+             chunk=5000, log=None):
+        """Insert the rows through ``session`` and return the number of rows per table.
+
+        Ids continue after the current maximum of each table, so a dataset
+        can be added to an existing database.
+        """
+        from models import Listing, Review, SignUp, User
+        from passwords import hash_password
+
+        log = log or (lambda message: None)
+        counts = {}
+
+        def execute(model, rows):
+            # Core executemany on the table: the ORM's bulk path costs more than the insert
+            session.connection().execute(insert(model.__table__), rows)
+
+        def bulk(model, rows):
+            started, total, batch = time.perf_counter(), 0, []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= chunk:
+                    execute(model, batch)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                execute(model, batch)
+                total += len(batch)
+            session.commit()
+            counts[model.__tablename__] = counts.get(model.__tablename__, 0) + total
+            log(f"{model.__tablename__}: {total} rows in {time.perf_counter() - started:.1f} s")
+
+        def next_id(model):
+            return (session.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+        first_user = next_id(User)
+        bulk(User, self.users(users, first_user, hash_password(self.password)))
+        user_ids = list(range(first_user, first_user + users))
+
+        first_listing = next_id(Listing)
+        created = []
+
+        def remember(rows):
+            for row in rows:
+                created.append((row["id"], row["created_at"]))
+                yield row
+        bulk(Listing, remember(self.listings(listings, first_listing, user_ids)))
+
+        counts['sign_up'] = counts['review'] = 0
+        for signups, reviews in self.signups_and_reviews(created, user_ids, signups_per_listing,
+                                                         reviews_per_listing):
+            for model, rows in ((SignUp, signups), (Review, reviews)):
+                for i in range(0, len(rows), chunk):
+                    execute(model, rows[i:i + chunk])
+                counts[model.__tablename__] += len(rows)
+        session.commit()
+        log(f"sign_up: {counts['sign_up']} rows, review: {counts['review']} rows")
+        return counts
+
+
+def reset(session):
+    """Delete all users, listings, sign-ups and reviews."""
+    from models import Listing, Review, SignUp, User
+    for model in (Review, SignUp, Listing, User):
+        session.query(model).delete()
+    session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--listings', type=int, default=10000)
+    parser.add_argument('--signups-per-listing', type=float, default=2.0)
+    parser.add_argument('--reviews-per-listing', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--metros', default=','.join(DEFAULT_METROS),
+                        help=f"built-in names ({', '.join(METROS)}) or Name:ST:lat:lon:population")
+    parser.add_argument('--password', default='password')
+    parser.add_argument('--reset', action='store_true', help='delete existing users, listings, sign-ups and reviews')
+    args = parser.parse_args()
+    if args.users < 1:
+        parser.error('--users must be at least 1')
+    if args.reviews_per_listing > args.signups_per_listing:
+        parser.error('reviewers are volunteers: --reviews-per-listing cannot exceed --signups-per-listing')
+
+    from app import create_app
+    from models import db
+
+    generator = SyntheticData(seed=args.seed, metros=parse_metros(args.metros), password=args.password)
+    app = create_app()
+    with app.app_context():
+        if args.reset:
+            reset(db.session)
+        started = time.perf_counter()
+        counts = generator.load(db.session, args.users, args.listings, args.signups_per_listing,
+                                args.reviews_per_listing, log=print)
+        print(f"loaded {sum(counts.values())} rows in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
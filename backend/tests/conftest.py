@@ -1,7 +1,25 @@
+import os
 import pytest
 from uuid import uuid4
 
-from app import app, db, User
+# Keep rate-limit/quota state in-process so test runs don't share a store file
+os.environ.setdefault('LOCAL_STORE', 'memory')
+# Every test starts with a cold LLM cache unless it installs its own
+os.environ.setdefault('LLM_CACHE', 'off')
+# Hash passwords inline; forking pytest workers for every test is slow
+os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+# The app is built on first import of ``app``; give it a throwaway database
+# and leave orphaned-job recovery to the tests that exercise it
+os.environ.setdefault('SQLALCHEMY_DATABASE_URI', 'sqlite:///:memory:')
+os.environ.setdefault('JOB_RECOVER', 'off')
+# Tests build their tables with create_all; migrations have their own tests
+os.environ.setdefault('SCHEMA_UPGRADE', 'off')
+# Metrics stay in-process instead of going to the host's shared metrics dir
+os.environ.setdefault('METRICS_DIR', 'off')
+
+import auth_limits
+from app import app, db, User, revocation_list, user_cache
+from local_store import get_store
 from werkzeug.security import generate_password_hash
 
 
@@ -16,6 +34,12 @@ def client():
         # Clean up DB between tests to ensure isolation
         db.session.remove()
         db.drop_all()
+        # ids are reused once the tables are recreated
+        user_cache.clear()
+        revocation_list.clear()
+        # auth attempt counters and provider quotas start fresh for every test
+        get_store().clear()
+        auth_limits.clear()
 
 
 @pytest.fixture
@@ -0,0 +1,81 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import app as app_module
+from app import create_app, db, job_queue
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(autouse=True)
+def default_app():
+    # job_queue is bound to the last app built; give it back to the shared one
+    default = app_module.app
+    yield default
+    job_queue.app = default
+
+
+def test_import_builds_nothing(tmp_path):
+    db_file = tmp_path / 'fresh.db'
+    probe = ("import sys, app\n"
+             "print('app' in vars(app), 'requests' in sys.modules)\n")
+    env = dict(os.environ, SQLALCHEMY_DATABASE_URI=f"sqlite:///{db_file}")
+    out = subprocess.run([sys.executable, '-c', probe], cwd=BACKEND, env=env,
+                         capture_output=True, text=True, check=True)
+    assert out.stdout.split() == ['False', 'False']
+    assert not db_file.exists()
+
+
+def test_create_app_does_not_touch_the_database(tmp_path):
+    db_file = tmp_path / 'fresh.db'
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{db_file}", 'TESTING': True,
+                      'SCHEMA_UPGRADE': False})
+    assert not db_file.exists()
+
+    with app.app_context():
+        db.create_all()
+        assert app.test_client().get('/api/items').get_json() == {"items": []}
+        db.engine.dispose()
+    assert db_file.exists()
+
+
+def test_routes_live_on_the_blueprint():
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+    with app.test_request_context():
+        from flask import url_for
+        assert url_for('api.get_job_status', job_id='abc') == '/api/agent/jobs/abc'
+    assert 'ingest-events' in app.cli.commands
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+def test_forked_child_gets_a_fresh_pool(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'fork.db'}"})
+    with app.app_context():
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql('SELECT 1')
+        assert db.engine.pool.checkedin() == 1
+        read, write = os.pipe()
+        pid = os.fork()
+        if pid == 0:  # child: the parent's pooled connection must be gone
+            os.write(write, str(db.engine.pool.checkedin()).encode())
+            os._exit(0)
+        os.waitpid(pid, 0)
+        assert os.read(read, 16) == b'0'
+        # the parent keeps its own connection
+        assert db.engine.pool.checkedin() == 1
+        db.engine.dispose()
+
+
+def test_lazy_app_is_built_once(default_app):
+    assert app_module.app is default_app
+
+
+def test_fork_hook_is_registered_once(monkeypatch):
+    registered = []
+    monkeypatch.setattr(os, 'register_at_fork', lambda **hooks: registered.append(hooks), raising=False)
+    apps = [create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'}) for _ in range(3)]
+    assert registered == []
+    assert set(apps) <= set(app_module._fork_apps)
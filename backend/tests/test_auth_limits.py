@@ -0,0 +1,102 @@
+import threading
+
+import app as app_module
+import auth_limits
+import local_store
+from auth_limits import check_auth_limits, sliding_window_hit
+from local_store import SqliteStore
+
+
+def test_sliding_window_carries_previous_window():
+    store = {}
+    # 10 attempts late in window 0 fill the limit
+    for _ in range(10):
+        assert sliding_window_hit(store, 'k', 10, 60, now=50)[0]
+    allowed, retry_after = sliding_window_hit(store, 'k', 10, 60, now=55)
+    assert not allowed and 0 < retry_after < 5.01
+    # a quarter into window 1, 75% of window 0 still counts: 7.5 carried, 2 left
+    results = [sliding_window_hit(store, 'k', 10, 60, now=75)[0] for _ in range(3)]
+    assert results == [True, True, False]
+    # a whole window later nothing is carried
+    assert all(sliding_window_hit(store, 'k', 10, 60, now=185)[0] for _ in range(10))
+
+
+def test_concurrent_attempts_never_exceed_the_limit():
+    hits, allowed = {}, []
+
+    def attack():
+        allowed.extend(sliding_window_hit(hits, 'k', 100, 60, now=10)[0] for _ in range(200))
+
+    threads = [threading.Thread(target=attack) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert 0 < sum(allowed) <= 100
+    assert len(hits[('k', 60, 0)]) == sum(allowed)
+
+
+def test_email_and_ip_scopes(monkeypatch):
+    monkeypatch.setenv('AUTH_RATE_LIMIT_LOGIN_EMAIL', '2/60')
+    monkeypatch.setenv('AUTH_RATE_LIMIT_LOGIN_IP', '2/60')
+    assert check_auth_limits('login', '10.0.0.1', 'A@example.com', now=0) is None
+    assert check_auth_limits('login', '10.0.0.2', 'a@example.com ', now=1) is None
+    # third attempt on the same (case-insensitive) email from yet another IP
+    assert check_auth_limits('login', '10.0.0.3', 'a@example.com', now=2) == 58
+    assert check_auth_limits('login', '10.0.0.1', 'b@example.com', now=3) is None
+    assert check_auth_limits('login', '10.0.0.1', 'c@example.com', now=4) is not None
+
+
+def test_old_windows_are_swept():
+    auth_limits.clear()
+    check_auth_limits('register', '10.0.0.1', now=100)
+    assert len(auth_limits._hits) == 1
+    check_auth_limits('register', '10.0.0.2', now=100 + 2 * 3600)
+    assert [key[0] for key in auth_limits._hits] == ['auth:register:ip:10.0.0.2']
+    auth_limits.clear()
+
+
+def test_shared_backend_counts_across_workers(tmp_path, monkeypatch):
+    monkeypatch.setenv('AUTH_RATE_LIMIT_BACKEND', 'local_store')
+    monkeypatch.setenv('AUTH_RATE_LIMIT_LOGIN_IP', '2/60')
+    path = str(tmp_path / 'store.db')
+    try:
+        # two workers on the host, each with its own handle on the store file
+        for worker in (SqliteStore(path), SqliteStore(path)):
+            local_store.set_store(worker)
+            assert check_auth_limits('login', '10.0.0.1', now=0) is None
+        assert check_auth_limits('login', '10.0.0.1', now=1) == 59
+    finally:
+        local_store.set_store(None)
+    assert not auth_limits._hits
+
+
+def test_login_is_refused_before_password_check(client, create_user, monkeypatch):
+    monkeypatch.setenv('AUTH_RATE_LIMIT_LOGIN_EMAIL', '3/300')
+    create_user('victim@example.com', 'pw')
+    for _ in range(3):
+        assert client.post('/login', json={'email': 'victim@example.com', 'password': 'nope'}).status_code == 401
+
+    def no_hashing(*args):
+        raise AssertionError("password verified while rate limited")
+
+    monkeypatch.setattr(app_module, 'verify_password', no_hashing)
+    resp = client.post('/login', json={'email': 'victim@example.com', 'password': 'pw'})
+    assert resp.status_code == 429
+    assert int(resp.headers['Retry-After']) > 0
+
+
+def test_register_and_reset_are_limited_per_ip(client, monkeypatch):
+    monkeypatch.setenv('AUTH_RATE_LIMIT_REGISTER_IP', '1/3600')
+    monkeypatch.setenv('AUTH_RATE_LIMIT_RESET_IP', '1/3600')
+    assert client.post('/register', json={'email': 'r1@example.com', 'password': 'pw'}).status_code == 201
+    assert client.post('/register', json={'email': 'r2@example.com', 'password': 'pw'}).status_code == 429
+    assert client.post('/reset-password', json={'email': 'r1@example.com'}).status_code == 200
+    assert client.post('/reset-password', json={'email': 'r1@example.com'}).status_code == 429
+
+
+def test_limits_can_be_disabled(client, monkeypatch):
+    monkeypatch.setenv('AUTH_RATE_LIMIT', 'off')
+    monkeypatch.setenv('AUTH_RATE_LIMIT_RESET_IP', '1/3600')
+    for _ in range(3):
+        assert client.post('/reset-password', json={'email': 'x@example.com'}).status_code == 200
@@ -0,0 +1,106 @@
+import pytest
+import requests
+
+import circuit_breaker
+import providers
+from circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers():
+    circuit_breaker._breakers.clear()
+    yield
+    circuit_breaker._breakers.clear()
+
+
+def test_breaker_opens_on_failure_rate():
+    b = CircuitBreaker('tm', failure_rate=0.5, minimum_calls=4, window_size=10)
+    b.record_success()
+    b.record_failure()
+    b.record_success()
+    assert b.state == CLOSED
+    b.record_failure()
+    # 2 failures out of 4 calls == 50%
+    assert b.state == OPEN
+    assert not b.allow_request()
+
+
+def test_breaker_half_open_probe_closes_on_success():
+    clock = FakeClock()
+    b = CircuitBreaker('sg', minimum_calls=1, reset_timeout=30, clock=clock)
+    b.record_failure()
+    assert b.state == OPEN
+    clock.now = 31
+    assert b.state == HALF_OPEN
+    # Only one probe is allowed at a time
+    assert b.allow_request()
+    assert not b.allow_request()
+    b.record_success()
+    assert b.state == CLOSED
+    assert b.allow_request()
+
+
+def test_breaker_half_open_probe_failure_reopens():
+    clock = FakeClock()
+    b = CircuitBreaker('sg', minimum_calls=1, reset_timeout=30, clock=clock)
+    b.record_failure()
+    clock.now = 31
+    assert b.allow_request()
+    b.record_failure()
+    assert b.state == OPEN
+    assert b.retry_after() == pytest.approx(30)
+
+
+def test_breaker_call_raises_when_open():
+    b = CircuitBreaker('x', minimum_calls=1)
+    with pytest.raises(ZeroDivisionError):
+        b.call(lambda: 1 / 0)
+    with pytest.raises(CircuitOpenError):
+        b.call(lambda: 'never called')
+
+
+def test_all_events_skips_open_provider(client, monkeypatch):
+    monkeypatch.setenv('TICKETMASTER_API_KEY', 'tm-key')
+    monkeypatch.setenv('SEATGEEK_CLIENT_ID', 'sg-key')
+    calls = []
+
+    class FakeResponse:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"events": []}
+
+    def fake_get(url, params=None, timeout=None):
+        calls.append(url)
+        if url == providers.TICKETMASTER_URL:
+            raise requests.exceptions.ConnectTimeout('timed out')
+        return FakeResponse()
+
+    monkeypatch.setattr(requests, 'get', fake_get)
+    tm = circuit_breaker.get_breaker('ticketmaster')
+    tm.minimum_calls = 1
+
+    # First request hits the timeout and trips the breaker
+    resp = client.get('/api/events/all')
+    assert resp.status_code == 200
+    assert calls.count(providers.TICKETMASTER_URL) == 1
+    assert tm.state == OPEN
+
+    # Second request skips Ticketmaster entirely and reports it unavailable
+    resp = client.get('/api/events/all')
+    data = resp.get_json()
+    assert calls.count(providers.TICKETMASTER_URL) == 1
+    assert data['unavailable_sources'] == ['ticketmaster']
+
+    resp = client.get('/api/events/ticketmaster')
+    assert resp.status_code == 503
+    assert resp.get_json()['unavailable'] is True
@@ -0,0 +1,55 @@
+import random
+import time
+
+from dedup import dedupe_events, normalize_title, title_similarity
+
+
+def _event(source, name, venue, start, url=None, **extra):
+    return dict(source=source, name=name, venue=venue, start=start, url=url or f"https://{source}/{name}", **extra)
+
+
+def test_merges_same_event_across_sources():
+    events = [
+        _event('ticketmaster', 'Houston Rockets vs. Los Angeles Lakers', 'Toyota Center', '2026-11-02',
+               image='tm.jpg'),
+        _event('seatgeek', 'Los Angeles Lakers at Houston Rockets', 'The Toyota Center', '2026-11-02T19:00:00'),
+        _event('seatgeek', 'Disney On Ice', 'Toyota Center', '2026-11-02T13:00:00'),
+    ]
+    unique, merged = dedupe_events(events)
+    assert merged == 1
+    assert len(unique) == 2
+    game = unique[0]
+    assert game['sources'] == ['ticketmaster', 'seatgeek']
+    assert [u['source'] for u in game['urls']] == ['ticketmaster', 'seatgeek']
+    assert game['image'] == 'tm.jpg'
+
+
+def test_does_not_merge_different_days_or_same_source():
+    events = [
+        _event('ticketmaster', 'Taylor Swift | The Eras Tour', 'NRG Stadium', '2026-11-02'),
+        _event('seatgeek', 'Taylor Swift', 'NRG Stadium', '2026-11-03T19:00:00'),
+        _event('ticketmaster', 'Taylor Swift', 'NRG Stadium', '2026-11-02'),
+    ]
+    unique, merged = dedupe_events(events)
+    assert merged == 0
+    assert len(unique) == 3
+
+
+def test_title_similarity_ignores_filler_tokens():
+    a = normalize_title('Taylor Swift | The Eras Tour')
+    b = normalize_title('Taylor Swift - Eras')
+    assert title_similarity(a, b) == 1.0
+
+
+def test_dedup_is_fast_enough_for_the_hot_path():
+    rng = random.Random(7)
+    venues = [f"Venue {i}" for i in range(40)]
+    events = [
+        _event(rng.choice(['ticketmaster', 'seatgeek']), f"Artist {rng.randint(0, 500)} Live",
+               rng.choice(venues), f"2026-11-{rng.randint(1, 28):02d}")
+        for _ in range(5000)
+    ]
+    started = time.perf_counter()
+    dedupe_events(events)
+    per_event = (time.perf_counter() - started) / len(events)
+    assert per_event < 0.001
@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import ingest
+from app import app, store_events
+from feed import decode_cursor, encode_cursor, InvalidCursor, merge_page
+
+
+BASE = (datetime.utcnow() + timedelta(days=1)).replace(microsecond=0)
+
+
+def _stored(source, i, hours):
+    return {
+        "source": source,
+        "external_id": f"{source}-{i}",
+        "name": f"{source} event {i}",
+        "venue": f"{source} venue {i}",
+        "city": "houston",
+        "state": "TX",
+        "start_local": (BASE + timedelta(hours=hours)).isoformat(),
+        "start_at": BASE + timedelta(hours=hours),
+    }
+
+
+def test_merge_page_interleaves_sorted_streams():
+    streams = {
+        'a': iter([(1, ['a', 1], 'a1'), (4, ['a', 2], 'a4')]),
+        'b': iter([(2, ['b', 1], 'b2'), (3, ['b', 2], 'b3'), (5, ['b', 3], 'b5')]),
+    }
+    events, positions, has_more = merge_page(streams, 3)
+    assert events == ['a1', 'b2', 'b3']
+    assert positions == {'a': ['a', 1], 'b': ['b', 2]}
+    assert has_more
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    token = encode_cursor({"mode": "local", "city": "houston", "p": {"seatgeek": ["2026-01-01T20:00:00", 2]}})
+    assert decode_cursor(token)["p"] == {"seatgeek": ["2026-01-01T20:00:00", 2]}
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not-a-cursor")
+
+
+@pytest.mark.parametrize('state', [
+    {"mode": "local", "city": "houston", "p": {"seatgeek": ["yesterday", 2]}},
+    {"mode": "local", "city": "houston", "p": {"seatgeek": ["2026-01-01T20:00:00"]}},
+    {"mode": "live", "city": "houston", "p": {"seatgeek": ["1", 0]}, "ps": 25},
+    {"mode": "live", "city": "houston", "p": {"seatgeek": [1, -3]}, "ps": 25},
+    {"mode": "live", "city": "houston", "p": {"seatgeek": [1, 0]}},
+    {"mode": "other", "city": "houston", "p": {}},
+])
+def test_tampered_cursor_is_a_bad_request(client, state):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(encode_cursor(state))
+    resp = client.get(f"/api/events/all?city=Houston&cursor={encode_cursor(state)}")
+    assert resp.status_code == 400
+
+
+def test_local_feed_pages_through_all_events_in_order(client):
+    with app.app_context():
+        events = [_stored('ticketmaster', i, 2 * i) for i in range(7)]
+        events += [_stored('seatgeek', i, 2 * i + 1) for i in range(6)]
+        store_events(events)
+
+    seen = []
+    url = '/api/events/all?city=Houston&limit=5'
+    pages = 0
+    while url:
+        data = client.get(url).get_json()
+        pages += 1
+        seen.extend(data['events'])
+        url = f"/api/events/all?city=Houston&limit=5&cursor={data['next_cursor']}" if data['has_more'] else None
+    assert pages == 3
+    assert len(seen) == 13
+    starts = [e['start_at'] for e in seen]
+    assert starts == sorted(starts)
+    assert len({e['id'] for e in seen}) == 13
+
+
+def test_live_feed_merges_providers_with_cursor(client, monkeypatch):
+    monkeypatch.setenv('TICKETMASTER_API_KEY', 'tm')
+    monkeypatch.setenv('SEATGEEK_CLIENT_ID', 'sg')
+    fetched = []
+
+    def tm_page(key, city, state, category=None, page=0, size=50):
+        fetched.append(('tm', page))
+        start = BASE + timedelta(hours=2 * page * size)
+        raw = [{"id": f"t{page}-{i}", "name": f"T {page}-{i}", "dates": {"start": {
+            "dateTime": (start + timedelta(hours=2 * i)).strftime('%Y-%m-%dT%H:%M:%SZ')}}} for i in range(size)]
+        return raw, page < 3
+
+    def sg_page(client_id, city, state, category=None, page=1, size=50):
+        fetched.append(('sg', page))
+        start = BASE + timedelta(hours=2 * (page - 1) * size + 1)
+        raw = [{"id": f"s{page}-{i}", "title": f"S {page}-{i}",
+                "datetime_utc": (start + timedelta(hours=2 * i)).isoformat()} for i in range(size)]
+        return raw, page < 4
+
+    monkeypatch.setattr(ingest, 'fetch_ticketmaster_page', tm_page)
+    monkeypatch.setattr(ingest, 'fetch_seatgeek_page', sg_page)
+
+    first = client.get('/api/events/all?city=Austin&limit=4').get_json()
+    assert first['served_from'] == 'live'
+    assert [e['id'] for e in first['events']] == ['tm_t0-0', 'sg_s1-0', 'tm_t0-1', 'sg_s1-1']
+
+    second = client.get(f"/api/events/all?city=Austin&limit=4&cursor={first['next_cursor']}").get_json()
+    assert [e['id'] for e in second['events']] == ['tm_t0-2', 'sg_s1-2', 'tm_t0-3', 'sg_s1-3']
+
+    # Each page costs a bounded number of upstream calls
+    assert len(fetched) <= 2 * 2 * 2
+
+    resp = client.get(f"/api/events/all?city=Dallas&cursor={first['next_cursor']}")
+    assert resp.status_code == 400
+
+
+def test_live_cursor_survives_a_changed_limit(client, monkeypatch):
+    monkeypatch.setenv('TICKETMASTER_API_KEY', 'tm')
+    monkeypatch.delenv('SEATGEEK_CLIENT_ID', raising=False)
+
+    def tm_page(key, city, state, category=None, page=0, size=50):
+        # the provider's events do not depend on how they are paged
+        first = page * size
+        raw = [{"id": f"t{n}", "name": f"T {n}", "dates": {"start": {
+            "dateTime": (BASE + timedelta(hours=n)).strftime('%Y-%m-%dT%H:%M:%SZ')}}}
+            for n in range(first, min(first + size, 30))]
+        return raw, first + size < 30
+
+    monkeypatch.setattr(ingest, 'fetch_ticketmaster_page', tm_page)
+
+    seen, url = [], '/api/events/all?city=Austin&limit=4'
+    for limit in (7, 3, 10, 100, None):
+        data = client.get(url).get_json()
+        seen.extend(e['id'] for e in data['events'])
+        url = f"/api/events/all?city=Austin&limit={limit}&cursor={data['next_cursor']}"
+    assert not data['has_more']
+    assert seen == [f"tm_t{n}" for n in range(30)]
@@ -0,0 +1,106 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import ingest
+import local_store
+from app import app, Event, run_event_ingestion, store_events
+
+
+UPCOMING = (datetime.utcnow() + timedelta(days=3)).replace(microsecond=0)
+
+
+def _tm_event(i):
+    start = UPCOMING
+    return {
+        "id": f"tm{i}",
+        "name": f"Concert {i}",
+        "url": f"https://tm.example/{i}",
+        "dates": {"start": {"localDate": start.strftime('%Y-%m-%d'),
+                            "dateTime": start.strftime('%Y-%m-%dT%H:%M:%SZ')}},
+        "_embedded": {"venues": [{"name": "Toyota Center"}]},
+    }
+
+
+@pytest.fixture
+def fake_ticketmaster(monkeypatch):
+    monkeypatch.setenv('TICKETMASTER_API_KEY', 'tm-key')
+    monkeypatch.delenv('SEATGEEK_CLIENT_ID', raising=False)
+    calls = []
+
+    def fake_page(api_key, city, state, category=None, page=0, size=50):
+        calls.append((city, category, page))
+        # two pages per target
+        events = [_tm_event(f"{category}-{page}-{n}") for n in range(2)]
+        return events, page == 0
+
+    monkeypatch.setattr(ingest, 'fetch_ticketmaster_page', fake_page)
+    return calls
+
+
+def test_collect_events_pages_and_respects_quota(fake_ticketmaster, monkeypatch):
+    monkeypatch.setenv('INGEST_MAX_REQUESTS', '3')
+    events, errors, stats = ingest.collect_events([('Houston', 'TX')], ['music', 'sports'])
+    assert errors == []
+    assert stats['ticketmaster']['requests'] == 3
+    assert len(fake_ticketmaster) == 3
+    assert len(events) == 6
+    assert all(e['city'] == 'houston' for e in events)
+
+
+def test_ingestion_stores_events_and_serves_locally(client, fake_ticketmaster):
+    summary = run_event_ingestion([('Houston', 'TX')], ['music'])
+    assert summary['created'] == 4
+    # Re-ingesting unchanged events neither duplicates nor rewrites them
+    summary = run_event_ingestion([('Houston', 'TX')], ['music'])
+    assert summary['created'] == 0 and summary['unchanged'] == 4
+    with app.app_context():
+        assert Event.query.count() == 4
+
+    calls_before = len(fake_ticketmaster)
+    resp = client.get('/api/events/all?city=Houston')
+    data = resp.get_json()
+    assert data['served_from'] == 'local'
+    assert data['total'] == 4
+    assert data['events'][0]['id'].startswith('tm_')
+    # Served without touching the upstream
+    assert len(fake_ticketmaster) == calls_before
+
+    resp = client.get('/api/events/ticketmaster?city=houston&size=3')
+    data = resp.get_json()
+    assert data['total'] == 4
+    assert len(data['events']) == 3
+
+
+def names(resp):
+    return [e['name'] for e in resp.get_json()['events']]
+
+
+def test_local_seatgeek_pages_start_at_one_like_the_live_api(client):
+    with app.app_context():
+        store_events([{"source": 'seatgeek', "external_id": str(n), "name": f'Game {n}', "city": 'houston',
+                       "start_at": UPCOMING + timedelta(hours=n)} for n in range(5)])
+    first = client.get('/api/events/seatgeek?city=Houston&size=2')
+    assert first.get_json()['served_from'] == 'local'
+    assert names(first) == ['Game 0', 'Game 1']
+    assert names(client.get('/api/events/seatgeek?city=Houston&size=2&page=1')) == ['Game 0', 'Game 1']
+    assert names(client.get('/api/events/seatgeek?city=Houston&size=2&page=2')) == ['Game 2', 'Game 3']
+    assert len(client.get('/api/events/seatgeek?city=Houston').get_json()['events']) == 5
+
+
+def test_schedulers_of_several_workers_share_the_runs(tmp_path):
+    # one store file shared by the host's workers
+    local_store.set_store(local_store.SqliteStore(str(tmp_path / 'store.db')))
+    runs = []
+    try:
+        schedulers = [ingest.IngestionScheduler(lambda n=n: runs.append(n), interval=3600) for n in range(3)]
+        for scheduler in schedulers:
+            scheduler.start()
+        time.sleep(0.5)
+        for scheduler in schedulers:
+            scheduler.stop()
+            scheduler.join(timeout=5)
+    finally:
+        local_store.set_store(None)
+    assert len(runs) == 1
@@ -0,0 +1,183 @@
+import pytest
+
+import jobs
+from app import app, db, Job, job_queue
+
+
+@pytest.fixture
+def eager(client):
+    app.config['JOBS_EAGER'] = True
+    replaced = {}
+
+    def register(name, fn, resumable=False):
+        replaced.setdefault(name, job_queue.handlers.get(name))
+        job_queue.task(name, resumable=resumable)(fn)
+
+    yield register
+    app.config.pop('JOBS_EAGER', None)
+    for name, previous in replaced.items():
+        if previous is None:
+            job_queue.handlers.pop(name, None)
+        else:
+            job_queue.handlers[name] = previous
+
+
+def test_job_reports_progress_and_result(client, eager):
+    def handler(ctx, n):
+        ctx.update(progress=40, seen=n)
+        return {"created": n * 2}
+
+    eager('double', handler)
+    with app.app_context():
+        job_id = job_queue.submit('double', n=3).id
+
+    resp = client.get(f'/api/agent/jobs/{job_id}')
+    assert resp.status_code == 200
+    body = resp.get_json()
+    assert body["status"] == jobs.SUCCEEDED
+    assert body["progress"] == 100
+    assert body["result"] == {"seen": 3, "created": 6}
+    assert body["params"] == {"n": 3}
+    assert body["attempts"] == 1
+
+
+def test_failed_job_records_error(client, eager):
+    def handler(ctx):
+        ctx.update(progress=10, fetched=5)
+        raise RuntimeError("upstream exploded")
+
+    eager('boom', handler)
+    with app.app_context():
+        job_id = job_queue.submit('boom').id
+
+    body = client.get(f'/api/agent/jobs/{job_id}').get_json()
+    assert body["status"] == jobs.FAILED
+    assert "upstream exploded" in body["error"]
+    # progress reported before the failure is kept
+    assert body["result"] == {"fetched": 5}
+    assert body["finished_at"] is not None
+
+
+def test_unknown_job_is_404(client):
+    assert client.get('/api/agent/jobs/nope').status_code == 404
+
+
+def test_agent_endpoint_returns_job_id(client, eager, monkeypatch):
+    monkeypatch.setenv('GEMINI_API_KEY', 'test-key')
+    eager('gemini_nightlife', lambda ctx, city, state: {"city": city, "state": state}, resumable=True)
+
+    resp = client.post('/api/agent/gemini-nightlife-events', json={"city": "Austin", "state": "TX"})
+    assert resp.status_code == 202
+    body = resp.get_json()
+    assert resp.headers['Location'] == body["status_url"]
+    status = client.get(body["status_url"]).get_json()
+    assert status["status"] == jobs.SUCCEEDED
+    assert status["result"] == {"city": "Austin", "state": "TX"}
+
+
+def test_agent_endpoint_validates_before_queueing(client, monkeypatch):
+    monkeypatch.delenv('GEMINI_API_KEY', raising=False)
+    assert client.post('/api/agent/ai-populate').status_code == 500
+    with app.app_context():
+        assert Job.query.count() == 0
+
+
+def test_recover_requeues_resumable_and_fails_the_rest(client, eager):
+    ran = []
+    eager('resumable', lambda ctx: ran.append('resumable') or {}, resumable=True)
+    eager('one_shot', lambda ctx: ran.append('one_shot') or {})
+
+    with app.app_context():
+        host = jobs.socket.gethostname()
+        dead = f"{host}:999999999"  # no such pid
+        db.session.add_all([
+            Job(id='a' * 32, kind='resumable', status=jobs.RUNNING, owner=dead, attempts=1, params='{}'),
+            Job(id='b' * 32, kind='one_shot', status=jobs.RUNNING, owner=dead, attempts=1, params='{}'),
+            Job(id='c' * 32, kind='resumable', status=jobs.RUNNING, owner=dead, attempts=3, params='{}'),
+            Job(id='d' * 32, kind='one_shot', status=jobs.RUNNING, owner=jobs._worker_id(), params='{}'),
+        ])
+        db.session.commit()
+
+        assert job_queue.recover() == (1, 2)
+        statuses = {j.id[0]: (j.status, j.error) for j in Job.query.all()}
+
+    assert ran == ['resumable']
+    assert statuses['a'] == (jobs.SUCCEEDED, None)
+    assert statuses['b'][0] == jobs.FAILED and 'restart' in statuses['b'][1]
+    assert statuses['c'][0] == jobs.FAILED and '3 attempts' in statuses['c'][1]
+    # still owned by a live process: left alone
+    assert statuses['d'][0] == jobs.RUNNING
+
+
+def test_recover_fails_jobs_of_an_earlier_process_with_this_pid(client, eager):
+    # a restarted container runs the app under the same hostname and pid
+    eager('one_shot', lambda ctx: {})
+    with app.app_context():
+        host, pid = jobs.socket.gethostname(), jobs.os.getpid()
+        db.session.add_all([
+            Job(id='f' * 32, kind='one_shot', status=jobs.RUNNING, owner=f"{host}:{pid}:0123456789ab", params='{}'),
+            Job(id='g' * 32, kind='one_shot', status=jobs.RUNNING, owner=f"{host}:{pid}", params='{}'),
+        ])
+        db.session.commit()
+
+        assert job_queue.recover() == (0, 2)
+        assert {j.status for j in Job.query.all()} == {jobs.FAILED}
+
+
+def test_first_request_recovers_orphaned_jobs(client, monkeypatch):
+    with app.app_context():
+        dead = f"{jobs.socket.gethostname()}:999999999"
+        db.session.add(Job(id='e' * 32, kind='one_shot', status=jobs.RUNNING, owner=dead, params='{}'))
+        db.session.commit()
+    monkeypatch.setitem(app.config, 'JOBS_RECOVER', True)
+    monkeypatch.setattr(job_queue, '_recovered_pid', None)
+
+    client.get('/')
+    job_queue.recovery.result(timeout=5)  # recovery runs on the pool
+    with app.app_context():
+        job = db.session.get(Job, 'e' * 32)
+        db.session.refresh(job)
+        assert job.status == jobs.FAILED
+
+
+def test_login_schedules_one_nightlife_refresh_per_city(client, create_user, monkeypatch):
+    import app as app_module
+    app.config['JOBS_EAGER'] = True
+    monkeypatch.setenv('GEMINI_API_KEY', 'test-key')
+    calls = []
+    monkeypatch.setattr(app_module, 'populate_nightlife',
+                        lambda ctx, city, state: calls.append((city, state)) or {"created": 0})
+    create_user('night@example.com', 'pw')
+    try:
+        for _ in range(3):
+            resp = client.post('/login', json={'email': 'night@example.com', 'password': 'pw',
+                                               'city': 'Austin', 'state': 'TX'})
+            assert resp.status_code == 200
+        client.post('/login', json={'email': 'night@example.com', 'password': 'pw',
+                                    'city': 'austin ', 'state': 'tx'})
+        client.post('/login', json={'email': 'night@example.com', 'password': 'pw', 'city': 'Dallas'})
+    finally:
+        app.config.pop('JOBS_EAGER', None)
+
+    assert calls == [('Austin', 'TX'), ('Dallas', 'TX')]
+    with app.app_context():
+        assert Job.query.filter_by(kind='gemini_nightlife').count() == 2
+
+
+def test_failed_nightlife_refresh_can_be_retried(client, monkeypatch):
+    import app as app_module
+    app.config['JOBS_EAGER'] = True
+
+    def boom(ctx, city, state):
+        raise RuntimeError("gemini down")
+
+    monkeypatch.setenv('GEMINI_API_KEY', 'test-key')
+    monkeypatch.setattr(app_module, 'populate_nightlife', boom)
+    try:
+        with app.app_context():
+            first = app_module.schedule_nightlife_refresh('Austin', 'TX')
+            db.session.refresh(first)
+            assert first.status == jobs.FAILED
+            assert app_module.schedule_nightlife_refresh('Austin', 'TX') is not None
+    finally:
+        app.config.pop('JOBS_EAGER', None)
@@ -0,0 +1,72 @@
+import json
+import re
+import threading
+import time
+
+import llm
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """Describes every event id it finds in the prompt; optionally misbehaves."""
+
+    def __init__(self, reply=None, delay=0.0):
+        self.reply = reply
+        self.delay = delay
+        self.calls = []
+        self.active = self.peak = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, **kwargs):
+        with self._lock:
+            self.calls.append(kwargs)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        if self.reply is not None:
+            return FakeResponse(self.reply(prompt))
+        ids = re.findall(r'- id: (\S+)', prompt)
+        return FakeResponse(json.dumps({i: f"About {i}." for i in ids}))
+
+
+def _events(n):
+    return [{"id": f"ev{i}", "name": f"Show {i}", "category": "music"} for i in range(n)]
+
+
+def _fallback(e):
+    return f"fallback {e['id']}"
+
+
+def test_descriptions_are_batched_and_concurrent():
+    model = FakeModel(delay=0.05)
+    out = llm.generate_descriptions(model, _events(25), _fallback, batch_size=10, max_workers=3)
+
+    assert out == {f"ev{i}": f"About ev{i}." for i in range(25)}
+    assert len(model.calls) == 3
+    assert all(c["generation_config"] == llm.JSON_CONFIG for c in model.calls)
+    assert model.peak > 1
+
+
+def test_unparseable_batch_falls_back_per_event():
+    model = FakeModel(reply=lambda prompt: "Sorry, I can't help with that.")
+    out = llm.generate_descriptions(model, _events(3), _fallback)
+    assert out == {f"ev{i}": f"fallback ev{i}" for i in range(3)}
+
+
+def test_missing_ids_fall_back_and_fences_are_stripped():
+    model = FakeModel(reply=lambda prompt: '```json\n{"ev0": "Great night out.", "ev1": ""}\n```')
+    out = llm.generate_descriptions(model, _events(3), _fallback)
+    assert out == {"ev0": "Great night out.", "ev1": "fallback ev1", "ev2": "fallback ev2"}
+
+
+def test_failed_request_falls_back():
+    def boom(prompt):
+        raise RuntimeError("quota")
+    out = llm.generate_descriptions(FakeModel(reply=boom), _events(2), _fallback)
+    assert out == {"ev0": "fallback ev0", "ev1": "fallback ev1"}
@@ -0,0 +1,66 @@
+import pytest
+
+import llm
+import llm_cache
+from local_store import MemoryStore, set_store
+from tests.test_llm import FakeModel, _events, _fallback
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setenv('LLM_CACHE', 'on')
+    set_store(MemoryStore())
+    c = llm_cache.LLMCache(str(tmp_path / 'llm.db'), max_entries=3)
+    llm_cache.set_llm_cache(c)
+    yield c
+    llm_cache.set_llm_cache(None)
+    set_store(None)
+
+
+def test_key_normalizes_prompt_and_buckets_by_day():
+    day = 20000 * llm_cache.DAY
+    key = llm_cache.cache_key('gemini', '  Find  events\n in Houston ', 'nightlife', now=day + 10)
+    assert key == llm_cache.cache_key('gemini', 'find events in houston', 'nightlife', now=day + 3600)
+    assert key != llm_cache.cache_key('gemini', 'find events in houston', 'nightlife', now=day + llm_cache.DAY)
+    assert key != llm_cache.cache_key('other-model', 'find events in houston', 'nightlife', now=day + 10)
+
+
+def test_cached_generate_hits_and_counts(cache):
+    model = FakeModel(reply=lambda prompt: '["a"]')
+    assert llm.cached_generate(model, 'Nightlife in Austin', 'nightlife') == '["a"]'
+    assert llm.cached_generate(model, 'nightlife   in austin', 'nightlife') == '["a"]'
+    assert len(model.calls) == 1
+    assert cache.stats()["kinds"]["nightlife"] == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_invalid_replies_are_not_cached(cache):
+    model = FakeModel(reply=lambda prompt: 'not json')
+    llm.cached_generate(model, 'p', 'nightlife', validate=llm.is_json)
+    llm.cached_generate(model, 'p', 'nightlife', validate=llm.is_json)
+    assert len(model.calls) == 2
+
+
+def test_expired_entries_miss(cache):
+    cache.put('k', 'nightlife', 'old', ttl=10, now=1000)
+    assert cache.get('k', 'nightlife', now=1005) == 'old'
+    assert cache.get('k', 'nightlife', now=1011) is None
+
+
+def test_least_recently_used_entries_are_evicted(cache):
+    for i, key in enumerate('abc'):
+        cache.put(key, 'description', key, ttl=1e9, now=1000 + i)
+    cache.get('a', 'description', now=1010)  # 'b' is now the oldest
+    cache.put('d', 'description', 'd', ttl=1e9, now=1020)
+    assert cache.get('b', 'description', now=1030) is None
+    assert [cache.get(k, 'description', now=1030) for k in 'acd'] == ['a', 'c', 'd']
+    assert cache.stats()["entries"] == 3
+    assert cache.stats()["evicted"] == 1
+
+
+def test_descriptions_are_cached_per_event(cache):
+    model = FakeModel()
+    llm.generate_descriptions(model, _events(2), _fallback)
+    out = llm.generate_descriptions(model, _events(3), _fallback)
+    assert out == {f"ev{i}": f"About ev{i}." for i in range(3)}
+    # second call only asked about the one new event
+    assert len(model.calls) == 2
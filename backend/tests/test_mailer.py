@@ -0,0 +1,78 @@
+from email.message import EmailMessage
+
+import pytest
+
+from mailer import Mailer
+from tests.smtp_stub import SMTPStub
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    stub = SMTPStub().start()
+    monkeypatch.setenv('SMTP_HOST', '127.0.0.1')
+    monkeypatch.setenv('SMTP_PORT', str(stub.port))
+    monkeypatch.setenv('SMTP_USE_TLS', 'false')
+    monkeypatch.delenv('SMTP_USER', raising=False)
+    monkeypatch.delenv('SMTP_PASS', raising=False)
+    monkeypatch.setenv('MAIL_RETRY_BASE', '0.01')
+    yield stub
+    stub.stop()
+
+
+def _message(to, subject='hi'):
+    msg = EmailMessage()
+    msg['Subject'] = subject
+    msg['From'] = 'no-reply@example.com'
+    msg['To'] = to
+    msg.set_content('body')
+    return msg
+
+
+def test_messages_share_one_connection(smtp):
+    mailer = Mailer()
+    for i in range(5):
+        mailer.enqueue(_message(f'user{i}@example.com', subject=f'm{i}'))
+    assert mailer.flush()
+    mailer.stop()
+    assert sorted(m['Subject'] for m in smtp.messages) == [f'm{i}' for i in range(5)]
+    assert smtp.connections == 1
+    assert mailer.stats()["sent"] == 5
+
+
+def test_transient_failures_are_retried_with_backoff(smtp):
+    smtp.fail_next = 2
+    mailer = Mailer()
+    mailer.enqueue(_message('retry@example.com'))
+    assert mailer.flush()
+    mailer.stop()
+    stats = mailer.stats()
+    assert [m['To'] for m in smtp.messages] == ['retry@example.com']
+    assert stats["retried"] == 2 and stats["sent"] == 1 and stats["pending"] == 0
+
+
+def test_gives_up_after_max_attempts_and_on_rejected_recipient(smtp, monkeypatch):
+    monkeypatch.setenv('MAIL_MAX_ATTEMPTS', '2')
+    smtp.fail_next = 10
+    mailer = Mailer()
+    mailer.enqueue(_message('never@example.com'))
+    assert mailer.flush()
+    smtp.fail_next = 0
+    mailer.enqueue(_message('reject@example.com'))
+    mailer.enqueue(_message('ok@example.com'))
+    assert mailer.flush()
+    mailer.stop()
+    stats = mailer.stats()
+    assert stats["failed"] == 2 and stats["sent"] == 1
+    assert [m['To'] for m in smtp.messages] == ['ok@example.com']
+
+
+def test_reset_password_only_enqueues(client, create_user, smtp):
+    from app import mailer
+    create_user('mail-me@example.com')
+    resp = client.post('/reset-password', json={'email': 'mail-me@example.com'})
+    assert resp.status_code == 200
+    assert resp.get_json()["message"] == "reset email sent"
+    assert mailer.flush()
+    assert smtp.messages[-1]['To'] == 'mail-me@example.com'
+    assert '/reset-password/confirm/' in smtp.messages[-1].get_payload()
+    assert client.get('/api/metrics').get_json()["mail"]["pending"] == 0
@@ -0,0 +1,76 @@
+import tracemalloc
+
+import pytest
+
+import metrics
+from app import app, db, User
+from auth import token_for
+from memory_diagnostics import memory_diagnostics
+
+_kept = []
+
+
+@pytest.fixture
+def admin_headers(client, create_user):
+    uid = create_user()
+    with app.app_context():
+        db.session.get(User, uid).role = 'admin'
+        db.session.commit()
+    yield {'Authorization': f'Bearer {token_for(uid)}'}
+    memory_diagnostics.stop()
+    _kept.clear()
+
+
+@pytest.fixture
+def leaky_index(monkeypatch):
+    # ``/`` stands in for an endpoint that keeps what it loaded
+    def allocate():
+        _kept.append([bytearray(1024) for _ in range(2000)])
+        return 'ok'
+    monkeypatch.setitem(app.view_functions, 'api.index', allocate)
+
+
+def test_snapshots_and_diff(client, admin_headers, leaky_index):
+    assert client.post('/api/admin/tracemalloc/snapshots', headers=admin_headers).status_code == 409
+
+    status = client.post('/api/admin/tracemalloc/start', json={'frames': 5}, headers=admin_headers).get_json()
+    assert status['tracing'] and status['frames'] == 5
+    first = client.post('/api/admin/tracemalloc/snapshots', headers=admin_headers).get_json()
+    client.get('/')
+    second = client.post('/api/admin/tracemalloc/snapshots?group_by=traceback&limit=5',
+                         headers=admin_headers).get_json()
+    assert second['id'] == first['id'] + 1 and len(second['top']) == 5
+
+    diff = client.get('/api/admin/tracemalloc/diff', headers=admin_headers).get_json()
+    assert (diff['from'], diff['to']) == (first['id'], second['id'])
+    assert diff['size_diff'] >= 2000 * 1024
+    assert diff['top'][0]['where']['file'].endswith('test_memory_diagnostics.py')
+    assert diff['top'][0]['size_diff'] >= 2000 * 1024
+
+    assert client.get('/api/admin/tracemalloc/diff?from=1&to=99', headers=admin_headers).status_code == 404
+    assert client.get('/api/admin/tracemalloc/diff?group_by=x', headers=admin_headers).status_code == 400
+
+    status = client.post('/api/admin/tracemalloc/stop', headers=admin_headers).get_json()
+    assert not status['tracing'] and status['snapshots'] == []
+    assert not tracemalloc.is_tracing()
+
+
+def test_per_endpoint_peak_memory(client, admin_headers, leaky_index):
+    client.post('/api/admin/tracemalloc/start', headers=admin_headers)
+    client.get('/')
+    client.get('/api/items')
+
+    text = metrics.registry.render()
+    peaks = {}
+    for line in text.splitlines():
+        if line.startswith('tapin_http_request_peak_memory_bytes_sum{'):
+            route = line.split('route="', 1)[1].split('"', 1)[0]
+            peaks[route] = float(line.rsplit(' ', 1)[1])
+    assert peaks['/'] >= 2000 * 1024
+    assert peaks['/api/items'] < peaks['/']
+
+
+def test_admin_only(client, create_user):
+    headers = {'Authorization': f'Bearer {token_for(create_user())}'}
+    assert client.post('/api/admin/tracemalloc/start', headers=headers).status_code == 403
+    assert not tracemalloc.is_tracing()
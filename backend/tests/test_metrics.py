@@ -0,0 +1,170 @@
+import os
+
+import pytest
+import requests
+
+import circuit_breaker
+import metrics
+import providers
+from app import database_engine_options
+from auth import token_for
+from metrics import Registry
+from sqlalchemy import create_engine
+
+
+@pytest.fixture
+def registry():
+    metrics.registry.reset()
+    circuit_breaker._breakers.clear()
+    yield metrics.registry
+    metrics.registry.reset()
+    circuit_breaker._breakers.clear()
+
+
+def sample(text, line_start):
+    for line in text.splitlines():
+        if line.startswith(line_start + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+
+def test_request_latency_by_route_and_status(registry, client):
+    client.get('/api/items')
+    client.get('/api/items')
+    client.get('/api/agent/jobs/nope')
+    client.get('/no-such-page')
+
+    resp = client.get('/metrics')
+    assert resp.status_code == 200
+    assert resp.content_type.startswith('text/plain; version=0.0.4')
+    text = resp.get_data(as_text=True)
+    assert '# TYPE tapin_http_request_duration_seconds histogram' in text
+    items = 'tapin_http_request_duration_seconds_count{route="/api/items",method="GET",status="200"}'
+    assert sample(text, items) == 2
+    # the route template, not the URL, so ids don't multiply the series
+    assert sample(text, 'tapin_http_request_duration_seconds_count'
+                        '{route="/api/agent/jobs/<job_id>",method="GET",status="404"}') == 1
+    assert sample(text, 'tapin_http_request_duration_seconds_count'
+                        '{route="unmatched",method="GET",status="404"}') == 1
+    assert sample(text, 'tapin_http_request_duration_seconds_bucket'
+                        '{route="/api/items",method="GET",status="200",le="+Inf"}') == 2
+
+
+def test_upstream_latency_and_errors(registry, monkeypatch):
+    class FakeResponse:
+        def __init__(self, status):
+            self.status_code = status
+            self.headers = {}
+
+        def raise_for_status(self):
+            if self.status_code >= 400:
+                raise requests.HTTPError(f'{self.status_code}', response=self)
+
+        def json(self):
+            return {"ok": True}
+
+    statuses = iter([200, 503])
+    monkeypatch.setattr(requests, 'get', lambda url, params=None, timeout=None: FakeResponse(next(statuses)))
+    assert providers.provider_get('seatgeek', providers.SEATGEEK_URL) == {"ok": True}
+    with pytest.raises(requests.HTTPError):
+        providers.provider_get('seatgeek', providers.SEATGEEK_URL)
+
+    text = registry.render()
+    assert sample(text, 'tapin_upstream_request_duration_seconds_count{provider="seatgeek"}') == 2
+    assert sample(text, 'tapin_upstream_errors_total{provider="seatgeek",error="5xx"}') == 1
+
+
+def test_histogram_buckets_are_cumulative(tmp_path):
+    reg = Registry(directory='off')
+    h = reg.histogram('t_seconds', 'test', ('op',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        h.observe(value, op='x')
+    text = reg.render()
+    assert sample(text, 't_seconds_bucket{op="x",le="0.1"}') == 2
+    assert sample(text, 't_seconds_bucket{op="x",le="1"}') == 3
+    assert sample(text, 't_seconds_bucket{op="x",le="+Inf"}') == 4
+    assert sample(text, 't_seconds_sum{op="x"}') == pytest.approx(2.65)
+    assert sample(text, 't_seconds_count{op="x"}') == 4
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+def test_workers_are_aggregated(tmp_path):
+    reg = Registry(directory=str(tmp_path), flush_interval=3600)
+    hits = reg.counter('t_hits_total', 'test', ('route',))
+    latency = reg.histogram('t_seconds', 'test', buckets=(1.0,))
+    busy = reg.gauge('t_busy', 'test')
+    reg.collector(lambda: [(busy, {}, 1)])
+
+    def worker(count, wait_for=None):
+        pid = os.fork()
+        if pid == 0:
+            for _ in range(count):
+                hits.inc(route='/a')
+                latency.observe(0.5)
+            reg.flush()
+            if wait_for is not None:
+                os.write(wait_for[1], b'x')
+                os.read(wait_for[0], 1)
+            os._exit(0)
+        return pid
+
+    os.waitpid(worker(2), 0)  # exits before the scrape, like a recycled worker
+    flushed, release = os.pipe(), os.pipe()
+    live = worker(3, (release[0], flushed[1]))
+    os.read(flushed[0], 1)
+    hits.inc(route='/a')
+
+    text = reg.render()
+    assert sample(text, 't_hits_total{route="/a"}') == 6
+    assert sample(text, 't_seconds_count') == 5
+    # gauges only of live processes: this one and the waiting worker
+    assert sample(text, 't_busy') == 2
+    # the exited worker was folded into the archive, and is not counted twice
+    assert set(os.listdir(tmp_path)) == {'archive.json', 'archive.lock', f'{live}-{metrics._process_start(live)}.json'}
+    assert sample(reg.render(), 't_hits_total{route="/a"}') == 6
+
+    os.write(release[1], b'x')
+    os.waitpid(live, 0)
+    text = reg.render()
+    assert sample(text, 't_hits_total{route="/a"}') == 6
+    assert sample(text, 't_busy') == 1
+
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/stat'), reason='needs /proc start times')
+def test_file_of_an_earlier_process_with_this_pid_is_folded(tmp_path):
+    reg = Registry(directory=str(tmp_path), flush_interval=3600)
+    hits = reg.counter('t_hits_total', 'test')
+    # left by a worker that exited before the scrape, and whose pid this process got
+    (tmp_path / f'{os.getpid()}-1.json').write_text('{"t_hits_total": [[[], 5]]}')
+    hits.inc()
+    reg.flush()
+
+    assert sample(reg.render(), 't_hits_total') == 6
+    assert set(os.listdir(tmp_path)) == {'archive.json', 'archive.lock', f'{metrics.process_id()}.json'}
+    assert sample(reg.render(), 't_hits_total') == 6
+
+
+def test_pool_checkouts_and_occupancy(registry, tmp_path):
+    url = f"sqlite:///{tmp_path / 'pool.db'}"
+    engine = create_engine(url, **database_engine_options(url))
+    try:
+        with engine.connect() as conn:
+            conn.exec_driver_sql('SELECT 1')
+            text = registry.render()
+            assert sample(text, 'tapin_db_pool_checked_out{pool="pool.db"}') == 1
+        text = registry.render()
+        assert sample(text, 'tapin_db_pool_wait_seconds_count{pool="pool.db"}') == 1
+        assert sample(text, 'tapin_db_pool_checked_out{pool="pool.db"}') == 0
+        assert sample(text, 'tapin_db_pool_size{pool="pool.db"}') == engine.pool.size()
+    finally:
+        engine.dispose()
+
+
+def test_cache_hit_counts(registry, client, create_user):
+    headers = {'Authorization': f'Bearer {token_for(create_user())}'}
+    client.get('/me', headers=headers)
+    client.get('/me', headers=headers)
+
+    text = client.get('/metrics').get_data(as_text=True)
+    assert sample(text, 'tapin_cache_requests_total{cache="user",result="miss"}') >= 1
+    assert sample(text, 'tapin_cache_requests_total{cache="user",result="hit"}') >= 1
@@ -0,0 +1,169 @@
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+import sqlalchemy as sa
+
+import app as app_module
+import migrate_db
+from app import create_app, job_queue
+from models import db
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What db.create_all() built before migrations (and before migrate_db.py
+# added listing.category and image_url)
+LEGACY_SCHEMA = '''
+CREATE TABLE user (id INTEGER NOT NULL, email VARCHAR(120) NOT NULL, password_hash VARCHAR(128) NOT NULL,
+    role VARCHAR(50), created_at DATETIME, PRIMARY KEY (id), UNIQUE (email));
+CREATE TABLE item (id INTEGER NOT NULL, name VARCHAR(200) NOT NULL, description TEXT, PRIMARY KEY (id));
+CREATE TABLE listing (id INTEGER NOT NULL, title VARCHAR(200) NOT NULL, description TEXT, location VARCHAR(200),
+    latitude FLOAT, longitude FLOAT, owner_id INTEGER, created_at DATETIME, PRIMARY KEY (id),
+    FOREIGN KEY(owner_id) REFERENCES user (id));
+CREATE TABLE sign_up (id INTEGER NOT NULL, user_id INTEGER NOT NULL, listing_id INTEGER NOT NULL,
+    status VARCHAR(50), message TEXT, created_at DATETIME, PRIMARY KEY (id),
+    CONSTRAINT _user_listing_uc UNIQUE (user_id, listing_id));
+CREATE TABLE review (id INTEGER NOT NULL, user_id INTEGER NOT NULL, listing_id INTEGER NOT NULL,
+    rating INTEGER NOT NULL, comment TEXT, created_at DATETIME, PRIMARY KEY (id),
+    CONSTRAINT _user_listing_review_uc UNIQUE (user_id, listing_id));
+INSERT INTO user (id, email, password_hash) VALUES (1, 'owner@example.com', 'x');
+INSERT INTO listing (id, title, owner_id) VALUES (1, 'Park cleanup', 1);
+'''
+
+
+@pytest.fixture
+def restore_job_queue():
+    # job_queue is bound to the last app built; give it back to the shared one
+    default = app_module.app
+    yield
+    job_queue.app = default
+
+
+def legacy_database(path, stamp=None):
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    if stamp:
+        conn.execute('CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL PRIMARY KEY)')
+        conn.execute('INSERT INTO alembic_version VALUES (?)', (stamp,))
+    conn.commit()
+    conn.close()
+    return f"sqlite:///{path}"
+
+
+def columns(url):
+    engine = sa.create_engine(url)
+    try:
+        inspector = sa.inspect(engine)
+        return {t: {c['name'] for c in inspector.get_columns(t)} for t in inspector.get_table_names()}
+    finally:
+        engine.dispose()
+
+
+def model_columns():
+    return {name: {c.name for c in table.columns} for name, table in db.metadata.tables.items()}
+
+
+def manage_upgrade(url):
+    env = dict(os.environ, SQLALCHEMY_DATABASE_URI=url)
+    subprocess.run([sys.executable, 'manage.py', 'upgrade'], cwd=BACKEND, env=env,
+                   capture_output=True, text=True, check=True)
+
+
+def test_manage_upgrade_builds_the_model_schema(tmp_path):
+    url = f"sqlite:///{tmp_path / 'fresh.db'}"
+    manage_upgrade(url)
+    schema = columns(url)
+    assert schema.pop('alembic_version') == {'version_num'}
+    assert schema == model_columns()
+
+
+def test_upgrade_from_0001_with_legacy_tables(tmp_path):
+    url = legacy_database(tmp_path / 'legacy.db', stamp='0001_initial')
+    manage_upgrade(url)
+    schema = columns(url)
+    del schema['alembic_version']
+    assert schema == model_columns()
+    conn = sqlite3.connect(tmp_path / 'legacy.db')
+    assert conn.execute('SELECT title, category, source FROM listing').fetchall() == [('Park cleanup', None, None)]
+    conn.close()
+
+
+def migrated_app(url):
+    return create_app({'SQLALCHEMY_DATABASE_URI': url, 'SCHEMA_UPGRADE': True, 'TESTING': True})
+
+
+def test_startup_migrates_a_fresh_database(tmp_path, restore_job_queue):
+    app = migrated_app(f"sqlite:///{tmp_path / 'fresh.db'}")
+    client = app.test_client()
+    resp = client.post('/register', json={"email": 'new@example.com', "password": 'Passw0rd!x'})
+    assert resp.status_code == 201
+    assert client.get('/listings').status_code == 200
+    with app.app_context():
+        db.engine.dispose()
+
+
+def test_startup_adopts_an_unversioned_database(tmp_path, restore_job_queue):
+    url = legacy_database(tmp_path / 'legacy.db')
+    app = migrated_app(url)
+    assert [l["title"] for l in app.test_client().get('/listings').get_json()] == ['Park cleanup']
+    with app.app_context():
+        db.engine.dispose()
+    assert columns(url).keys() - {'alembic_version'} == model_columns().keys()
+
+    # a second start (another worker) finds the schema current
+    app = migrated_app(url)
+    with app.app_context():
+        db.engine.dispose()
+
+
+def test_startup_upgrades_the_committed_database(tmp_path, restore_job_queue):
+    shutil.copy(os.path.join(BACKEND, 'data.db'), tmp_path / 'data.db')
+    app = migrated_app(f"sqlite:///{tmp_path / 'data.db'}")
+    assert app.test_client().get('/listings').status_code == 200
+    with app.app_context():
+        db.engine.dispose()
+
+
+# What migrate_db.py added for a while on top of category and image_url
+MIGRATE_DB_PROVENANCE = '''
+ALTER TABLE listing ADD COLUMN source VARCHAR(50);
+ALTER TABLE listing ADD COLUMN external_id VARCHAR(100);
+ALTER TABLE listing ADD COLUMN content_hash VARCHAR(64);
+CREATE UNIQUE INDEX ix_listing_source_external_id ON listing (source, external_id);
+'''
+
+
+@pytest.mark.parametrize('provenance', [False, True])
+def test_startup_after_migrate_db(tmp_path, monkeypatch, restore_job_queue, provenance):
+    path = tmp_path / 'data.db'
+    shutil.copy(os.path.join(BACKEND, 'data.db'), path)
+    monkeypatch.setattr(migrate_db, 'db_path', str(path))
+    migrate_db.migrate_database()
+    if provenance:
+        conn = sqlite3.connect(path)
+        conn.executescript(MIGRATE_DB_PROVENANCE)
+        conn.close()
+
+    app = migrated_app(f"sqlite:///{path}")
+    assert app.test_client().get('/listings').status_code == 200
+    with app.app_context():
+        db.engine.dispose()
+    schema = columns(f"sqlite:///{path}")
+    del schema['alembic_version']
+    assert schema == model_columns()
+
+
+def test_create_all_database_is_stamped_at_head(tmp_path, restore_job_queue):
+    url = f"sqlite:///{tmp_path / 'dev.db'}"
+    engine = sa.create_engine(url)
+    db.metadata.create_all(engine)
+    engine.dispose()
+    app = migrated_app(url)
+    with app.app_context():
+        db.engine.dispose()
+    conn = sqlite3.connect(tmp_path / 'dev.db')
+    assert conn.execute('SELECT version_num FROM alembic_version').fetchall() == [('0007_revoked_token',)]
+    conn.close()
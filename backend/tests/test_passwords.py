@@ -0,0 +1,60 @@
+from werkzeug.security import generate_password_hash
+
+import passwords
+from app import app, db, User
+
+
+def test_hash_and_verify_with_configured_method(monkeypatch):
+    monkeypatch.setenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+    pw_hash = passwords.hash_password('s3cret')
+    assert pw_hash.startswith('pbkdf2:sha256:1000$')
+    assert passwords.verify_password(pw_hash, 's3cret')
+    assert not passwords.verify_password(pw_hash, 'wrong')
+    assert not passwords.verify_password(None, 's3cret')
+
+
+def test_needs_rehash_tracks_method_and_cost(monkeypatch):
+    old = generate_password_hash('pw', method='pbkdf2:sha256:1000')
+    monkeypatch.setenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+    assert not passwords.needs_rehash(old)
+    monkeypatch.setenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:2000')
+    assert passwords.needs_rehash(old)
+    monkeypatch.setenv('PASSWORD_HASH_METHOD', 'scrypt')
+    assert passwords.needs_rehash(old)
+    assert not passwords.needs_rehash(generate_password_hash('pw', method='scrypt'))
+
+
+def test_argon2_falls_back_without_library(monkeypatch):
+    monkeypatch.setattr(passwords, 'PasswordHasher', None)
+    monkeypatch.setenv('PASSWORD_HASH_METHOD', 'argon2')
+    assert passwords.configured_method() == passwords.SCRYPT_DEFAULT
+
+
+def test_login_upgrades_outdated_hash(client, monkeypatch):
+    with app.app_context():
+        db.session.add(User(email='old@example.com',
+                            password_hash=generate_password_hash('pw', method='pbkdf2:sha256:1000')))
+        db.session.commit()
+
+    monkeypatch.setenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:2000')
+    assert client.post('/login', json={'email': 'old@example.com', 'password': 'wrong'}).status_code == 401
+    with app.app_context():
+        assert User.query.filter_by(email='old@example.com').first().password_hash.startswith('pbkdf2:sha256:1000$')
+
+    assert client.post('/login', json={'email': 'old@example.com', 'password': 'pw'}).status_code == 200
+    with app.app_context():
+        upgraded = User.query.filter_by(email='old@example.com').first().password_hash
+    assert upgraded.startswith('pbkdf2:sha256:2000$')
+    assert client.post('/login', json={'email': 'old@example.com', 'password': 'pw'}).status_code == 200
+
+
+def test_process_pool_hashing(monkeypatch):
+    monkeypatch.setenv('PASSWORD_HASH_WORKERS', '1')
+    monkeypatch.setenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+    passwords.reset_pool()
+    try:
+        pw_hash = passwords.hash_password('pooled')
+        assert passwords.verify_password(pw_hash, 'pooled')
+        assert passwords._pool is not None
+    finally:
+        passwords.reset_pool()
@@ -0,0 +1,82 @@
+import pstats
+
+import pytest
+
+from app import app, cached_user, db, User, request_profiler
+from auth import token_for
+
+
+@pytest.fixture
+def profiler(monkeypatch, tmp_path):
+    monkeypatch.setattr(request_profiler, 'directory', str(tmp_path))
+    monkeypatch.setattr(request_profiler, 'sample_rate', 0)
+    return request_profiler
+
+
+@pytest.fixture
+def admin_headers(client, create_user):
+    uid = create_user()
+    with app.app_context():
+        db.session.get(User, uid).role = 'admin'
+        db.session.commit()
+    return {'Authorization': f'Bearer {token_for(uid)}'}
+
+
+def test_admin_only(client, create_user, profiler):
+    headers = {'Authorization': f'Bearer {token_for(create_user())}'}
+    assert client.post('/api/admin/profile-token', headers=headers).status_code == 403
+    assert client.get('/api/admin/profiles', headers=headers).status_code == 403
+    assert client.get('/api/admin/profiles').status_code == 401
+
+
+def test_demoted_admin_is_refused_despite_the_user_cache(client, profiler, admin_headers):
+    assert client.get('/api/admin/profiles', headers=admin_headers).status_code == 200
+    with app.app_context():
+        user = User.query.filter_by(role='admin').one()
+        assert cached_user(user.id)["role"] == 'admin'
+        # demoted by another worker: this worker's cache still says admin
+        User.query.filter_by(id=user.id).update({"role": 'user'})
+        db.session.commit()
+        assert cached_user(user.id)["role"] == 'admin'
+    assert client.get('/api/admin/profiles', headers=admin_headers).status_code == 403
+
+
+def test_profile_one_request(client, profiler, admin_headers, tmp_path):
+    token = client.post('/api/admin/profile-token', headers=admin_headers).get_json()['token']
+
+    assert 'X-Profile-Id' not in client.get('/api/items').headers
+    resp = client.get('/api/items', headers={'X-Profile': token})
+    assert resp.status_code == 200
+    artifact = resp.headers['X-Profile-Id']
+    assert '-request-GET-api.api_list_items-' in artifact
+    # the query parameter works too, for links
+    assert client.get(f'/api/items?_profile={token}').headers['X-Profile-Id'] != artifact
+
+    listed = client.get('/api/admin/profiles', headers=admin_headers).get_json()['profiles']
+    assert artifact in [p['id'] for p in listed]
+
+    download = client.get(f'/api/admin/profiles/{artifact}', headers=admin_headers)
+    assert download.status_code == 200
+    saved = tmp_path / 'copy.prof'
+    saved.write_bytes(download.data)
+    assert any(func[2] == 'api_list_items' for func in pstats.Stats(str(saved)).stats)
+
+    text = client.get(f'/api/admin/profiles/{artifact}?format=text', headers=admin_headers)
+    assert 'api_list_items' in text.get_data(as_text=True)
+    assert client.get('/api/admin/profiles/..%2Fdata.db', headers=admin_headers).status_code == 404
+
+
+def test_invalid_token_is_ignored(client, profiler):
+    resp = client.get('/api/items', headers={'X-Profile': 'forged'})
+    assert resp.status_code == 200
+    assert 'X-Profile-Id' not in resp.headers
+
+
+def test_sampled_profiles_rotate(client, profiler, monkeypatch, tmp_path):
+    monkeypatch.setattr(profiler, 'sample_rate', 2)
+    monkeypatch.setattr(profiler, 'keep', 2)
+    profiled = [client.get('/api/items').headers.get('X-Profile-Id') for _ in range(6)]
+
+    assert sum(1 for p in profiled if p) == 3
+    assert all('-sampled-' in p for p in profiled if p)
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(p for p in profiled if p)[1:]
@@ -0,0 +1,63 @@
+import logging
+
+import pytest
+
+from app import app, db, Item
+from query_stats import QueryStats, normalize_sql, query_stats
+
+
+@pytest.fixture
+def stats(client, monkeypatch):
+    monkeypatch.setitem(app.config, 'SQL_STATS_HEADERS', True)
+    query_stats.reset()
+    yield query_stats
+    query_stats.reset()
+
+
+def test_normalize_sql():
+    sql = "SELECT *\n  FROM item WHERE id IN (1, 2, 3) AND name = 'it''s' AND x = ? LIMIT :param_1"
+    assert normalize_sql(sql) == "SELECT * FROM item WHERE id IN (?) AND name = ? AND x = ? LIMIT ?"
+    assert normalize_sql("SELECT x::text FROM t WHERE a = %(a_1)s") == "SELECT x::text FROM t WHERE a = ?"
+
+
+def test_headers_report_queries_and_db_time(stats, client):
+    db.session.add_all([Item(name='a'), Item(name='b')])
+    db.session.commit()
+
+    resp = client.get('/api/items')
+    assert resp.headers['X-DB-Query-Count'] == '1'
+    assert float(resp.headers['X-DB-Time-Ms']) >= 0
+    # no headers unless debugging
+    app.config['SQL_STATS_HEADERS'] = False
+    assert 'X-DB-Query-Count' not in client.get('/api/items').headers
+
+
+def test_per_endpoint_totals(stats, client):
+    for _ in range(3):
+        client.get('/api/items')
+    client.get('/')
+
+    totals = stats.endpoint_stats()
+    assert totals['api.api_list_items']['requests'] == 3
+    assert totals['api.api_list_items']['queries'] == 3
+    assert totals['api.api_list_items']['queries_per_request'] == 1
+    assert totals['api.index']['queries'] == 0
+    assert 'api.api_list_items' in client.get('/api/metrics').get_json()['sql']
+
+
+def test_slow_queries_are_logged_with_endpoint(stats, client, monkeypatch, caplog):
+    monkeypatch.setattr(stats, 'slow_ms', 0)
+    with caplog.at_level(logging.WARNING, logger='query_stats'):
+        client.get('/api/items')
+    assert any('api.api_list_items' in r.getMessage() and 'FROM item' in r.getMessage()
+               for r in caplog.records)
+    assert stats.endpoint_stats()['api.api_list_items']['slow_queries'] == 1
+
+
+def test_queries_outside_requests_are_logged_but_not_counted(caplog):
+    s = QueryStats(slow_ms=5)
+    with caplog.at_level(logging.WARNING, logger='query_stats'):
+        s.record('SELECT 1', 0.001)
+        s.record('SELECT 2', 0.010)
+    assert [r.getMessage() for r in caplog.records] == ['Slow query (10.0 ms) in background: SELECT ?']
+    assert s.endpoint_stats() == {}
@@ -0,0 +1,118 @@
+import time
+
+import pytest
+import requests
+
+import providers
+import rate_limit
+from local_store import MemoryStore, SqliteStore, set_store
+from rate_limit import ProviderLimiter, RateLimitExceeded
+
+
+@pytest.fixture(autouse=True)
+def fresh_store():
+    set_store(MemoryStore())
+    rate_limit._limiters.clear()
+    providers.response_cache.clear()
+    yield
+    rate_limit._limiters.clear()
+
+
+def test_token_bucket_refills_over_time():
+    store = MemoryStore()
+    assert store.take_token('k', rate=2, burst=2, now=100.0) == (True, 0.0)
+    assert store.take_token('k', rate=2, burst=2, now=100.0)[0]
+    allowed, wait = store.take_token('k', rate=2, burst=2, now=100.0)
+    assert not allowed and wait == pytest.approx(0.5)
+    assert store.take_token('k', rate=2, burst=2, now=100.5)[0]
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / 'store.db')
+    worker_a, worker_b = SqliteStore(path), SqliteStore(path)
+    assert worker_a.incr('quota', limit=2)[0]
+    assert worker_b.incr('quota', limit=2)[0]
+    assert worker_a.incr('quota', limit=2) == (False, 2)
+    assert worker_b.take_token('b', rate=1, burst=1, now=10.0)[0]
+    assert not worker_a.take_token('b', rate=1, burst=1, now=10.0)[0]
+
+
+@pytest.mark.parametrize('kind', ['memory', 'sqlite'])
+def test_expired_counters_are_purged_as_the_store_is_written(tmp_path, kind):
+    store = MemoryStore() if kind == 'memory' else SqliteStore(str(tmp_path / 'store.db'))
+    store.purge_every = 10
+    for n in range(5):
+        store.incr(f'quota:{n}', ttl=60, now=0.0)
+    store.incr('forever', now=0.0)
+    for _ in range(4):
+        store.incr('fresh', ttl=60, now=100.0)
+    if kind == 'memory':
+        keys = set(store._counters)
+    else:
+        keys = {row[0] for row in store._conn().execute('SELECT key FROM counters')}
+    assert keys == {'forever', 'fresh'}
+
+
+def test_limiter_enforces_daily_quota():
+    limiter = ProviderLimiter('ticketmaster', per_second=1000, burst=1000, daily=3)
+    for _ in range(3):
+        limiter.acquire('key-1', max_wait=0)
+    with pytest.raises(RateLimitExceeded) as exc:
+        limiter.acquire('key-1', max_wait=0)
+    assert exc.value.reason == 'daily_quota'
+    # A different key has its own budget
+    limiter.acquire('key-2', max_wait=0)
+    assert limiter.status('key-1')['daily_remaining'] == 0
+
+
+def test_limiter_waits_briefly_for_a_token():
+    limiter = ProviderLimiter('seatgeek', per_second=10, burst=1, daily=100)
+    limiter.acquire('k', max_wait=0)
+    slept = []
+    limiter.acquire('k', max_wait=1, sleep=lambda s: slept.append(s) or time.sleep(s))
+    assert slept and slept[0] <= 0.11
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire('k', max_wait=0)
+
+
+def test_over_budget_requests_are_served_from_cache(monkeypatch):
+    monkeypatch.setenv('RATE_LIMIT_TICKETMASTER_DAILY', '1')
+    calls = []
+
+    class FakeResponse:
+        status_code = 200
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"page": {"totalElements": 1}}
+
+    monkeypatch.setattr(requests, 'get', lambda url, params=None, timeout=None: calls.append(1) or FakeResponse())
+    params = {"apikey": "k", "city": "Houston"}
+    assert providers.provider_get('ticketmaster', providers.TICKETMASTER_URL, params) == {"page": {"totalElements": 1}}
+    # Quota spent: same request comes from the cache, a new one is refused
+    assert providers.provider_get('ticketmaster', providers.TICKETMASTER_URL, params) == {"page": {"totalElements": 1}}
+    assert len(calls) == 1
+    with pytest.raises(providers.ProviderRateLimited):
+        providers.provider_get('ticketmaster', providers.TICKETMASTER_URL, dict(params, city='Austin'))
+
+
+def test_upstream_429_becomes_rate_limited_not_502(client, monkeypatch):
+    monkeypatch.setenv('TICKETMASTER_API_KEY', 'k')
+    monkeypatch.setenv('EVENTS_LIVE_FALLBACK', 'true')
+
+    class Throttled:
+        status_code = 429
+        headers = {'Retry-After': '3'}
+
+        def raise_for_status(self):
+            raise requests.exceptions.HTTPError('429', response=self)
+
+    monkeypatch.setattr(requests, 'get', lambda url, params=None, timeout=None: Throttled())
+    resp = client.get('/api/events/ticketmaster?city=Nowhere')
+    assert resp.status_code == 503
+    assert resp.headers['Retry-After'] == '4'
+
+    data = client.get('/api/metrics').get_json()
+    assert data['providers']['ticketmaster']['quota']['daily_used'] == 1
@@ -0,0 +1,122 @@
+import time
+
+import pytest
+from sqlalchemy import create_engine, insert
+
+from app import Item, Job, db
+from auth import token_for
+from local_store import get_store
+from replicas import ReplicaRouter, router
+
+
+def _replica(tmp_path, name, items=()):
+    """A second SQLite database with the app schema, standing in for a replica."""
+    url = f"sqlite:///{tmp_path / name}"
+    engine = create_engine(url)
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for item in items:
+            conn.execute(insert(Item.__table__).values(name=item))
+    engine.dispose()
+    return url
+
+
+@pytest.fixture
+def replicas(client):
+    def _configure(*urls):
+        router.configure(list(urls))
+        return router
+    yield _configure
+    router.configure([])
+
+
+def _auth(user_id):
+    return {'Authorization': f'Bearer {token_for(user_id)}'}
+
+
+def _names(resp):
+    return [i['name'] for i in resp.get_json()['items']]
+
+
+def test_get_reads_from_replica_and_writes_go_to_primary(client, replicas, tmp_path, create_user):
+    db.session.add(Item(name='on-primary'))
+    db.session.commit()
+    replicas(_replica(tmp_path, 'r.db', ['on-replica']))
+
+    assert _names(client.get('/api/items')) == ['on-replica']
+    resp = client.post('/api/items', json={'name': 'new'}, headers=_auth(create_user()))
+    assert resp.status_code == 201
+    assert [i.name for i in Item.query.execution_options(use_primary=True).all()] == ['on-primary', 'new']
+
+
+def test_writer_reads_its_own_writes(client, replicas, tmp_path, create_user):
+    writer, other = _auth(create_user()), _auth(create_user())
+    replicas(_replica(tmp_path, 'r.db', ['on-replica']))
+
+    client.post('/api/items', json={'name': 'new'}, headers=writer)
+    # the writer is pinned to the primary for a few seconds; other clients are not
+    assert _names(client.get('/api/items', headers=writer)) == ['new']
+    assert _names(client.get('/api/items', headers=other)) == ['on-replica']
+
+
+def test_expired_sticky_markers_are_purged(client, replicas, tmp_path, create_user, monkeypatch):
+    monkeypatch.setenv('REPLICA_STICKY_SECONDS', '0.05')
+    monkeypatch.setattr(get_store(), 'purge_every', 1)
+    replicas(_replica(tmp_path, 'r.db'))
+    first, second = create_user(), create_user()
+
+    client.post('/api/items', json={'name': 'a'}, headers=_auth(first))
+    time.sleep(0.1)
+    client.post('/api/items', json={'name': 'b'}, headers=_auth(second))
+    assert [key for key in get_store()._counters if key.startswith('rw:')] == [f'rw:user:{second}']
+
+
+def test_registered_user_reads_its_own_account(client, replicas, tmp_path):
+    # the replica lags: it has the schema but not the new user
+    replicas(_replica(tmp_path, 'r.db'))
+    resp = client.post('/register', json={'email': 'new@example.com', 'password': 'Passw0rd!x'})
+    assert resp.status_code == 201
+    headers = {'Authorization': f"Bearer {resp.get_json()['access_token']}"}
+    resp = client.get('/me', headers=headers)
+    assert resp.status_code == 200 and resp.get_json()['user']['email'] == 'new@example.com'
+
+
+def test_round_robin_across_replicas(client, replicas, tmp_path):
+    replicas(_replica(tmp_path, 'a.db', ['a']), _replica(tmp_path, 'b.db', ['b']))
+    seen = [_names(client.get('/api/items'))[0] for _ in range(4)]
+    assert seen == ['a', 'b', 'a', 'b']
+
+
+def test_unhealthy_replica_is_skipped(client, replicas, tmp_path):
+    broken = f"sqlite:///{tmp_path / 'missing' / 'r.db'}"
+    replicas(broken, _replica(tmp_path, 'ok.db', ['ok']))
+    assert [_names(client.get('/api/items'))[0] for _ in range(3)] == ['ok', 'ok', 'ok']
+    assert [r['healthy'] for r in client.get('/api/metrics').get_json()['replicas']] == [False, True]
+
+
+def test_falls_back_to_primary_without_healthy_replicas(client, replicas, tmp_path):
+    db.session.add(Item(name='on-primary'))
+    db.session.commit()
+    replicas(f"sqlite:///{tmp_path / 'missing' / 'r.db'}")
+    assert _names(client.get('/api/items')) == ['on-primary']
+
+
+def test_job_status_always_reads_primary(client, replicas, tmp_path):
+    replicas(_replica(tmp_path, 'r.db'))
+    job = Job(id='j1', kind='populate_listings', status='queued')
+    db.session.add(job)
+    db.session.commit()
+    assert client.get('/api/agent/jobs/j1').status_code == 200
+
+
+def test_health_checks_are_rate_limited(tmp_path):
+    now = [0.0]
+    r = ReplicaRouter(health_interval=10, clock=lambda: now[0])
+    r.configure([f"sqlite:///{tmp_path / 'missing' / 'r.db'}"])
+    assert r.pick() is None
+    # fix the replica; it stays out of rotation until the next check is due
+    (tmp_path / 'missing').mkdir()
+    assert r.pick() is None
+    now[0] = 11
+    assert r.pick() is r.replicas[0].engine
+    r.dispose()
@@ -0,0 +1,95 @@
+import time
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import decode_token
+from sqlalchemy.exc import OperationalError
+
+from app import app, db, RevokedToken, revocation_list, User
+from auth import refresh_for, token_for
+
+
+def _auth(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_logout_revokes_access_and_refresh_tokens(client, create_user):
+    user_id = create_user()
+    access, refresh = token_for(user_id), refresh_for(user_id)
+    assert client.get('/me', headers=_auth(access)).status_code == 200
+
+    resp = client.post('/logout', headers=_auth(access), json={'refresh_token': refresh})
+    assert resp.status_code == 200
+    assert client.get('/me', headers=_auth(access)).status_code == 401
+    assert client.post('/refresh', headers=_auth(refresh)).status_code == 401
+    # a fresh login still works
+    assert client.get('/me', headers=_auth(token_for(user_id))).status_code == 200
+
+
+def test_logout_rejects_someone_elses_refresh_token(client, create_user):
+    mine, theirs = create_user(), create_user()
+    resp = client.post('/logout', headers=_auth(token_for(mine)), json={'refresh_token': refresh_for(theirs)})
+    assert resp.status_code == 400
+
+
+def test_password_reset_revokes_existing_tokens(client, create_user):
+    user_id = create_user('reset-me@example.com')
+    old_refresh = refresh_for(user_id)
+    time.sleep(1.05)  # iat has one-second resolution
+
+    reset_url = client.post('/reset-password', json={'email': 'reset-me@example.com'}).get_json()['reset_url']
+    assert client.post(reset_url.split('localhost', 1)[1], json={'password': 'new-pw'}).status_code == 200
+
+    assert client.post('/refresh', headers=_auth(old_refresh)).status_code == 401
+    login = client.post('/login', json={'email': 'reset-me@example.com', 'password': 'new-pw'}).get_json()
+    assert client.get('/me', headers=_auth(login['access_token'])).status_code == 200
+
+
+def test_revocations_from_other_processes_are_synced(client, create_user):
+    user_id = create_user()
+    access = token_for(user_id)
+    with app.app_context():
+        jti = decode_token(access)['jti']
+        # as if another worker had logged this token out
+        db.session.add(RevokedToken(jti=jti, user_id=str(user_id),
+                                    expires_at=datetime.utcnow() + timedelta(hours=1)))
+        db.session.commit()
+    revocation_list._next_sync = 0
+    assert client.get('/me', headers=_auth(access)).status_code == 401
+
+
+def test_compaction_drops_expired_entries(client):
+    with app.app_context():
+        db.session.add_all([
+            RevokedToken(jti='old', user_id='1', expires_at=datetime.utcnow() - timedelta(seconds=1)),
+            RevokedToken(jti='live', user_id='1', expires_at=datetime.utcnow() + timedelta(hours=1)),
+        ])
+        db.session.commit()
+        revocation_list.sync()
+        revocation_list.compact()
+        assert [r.jti for r in RevokedToken.query.all()] == ['live']
+        assert revocation_list.is_revoked({'jti': 'live', 'sub': '1', 'iat': 0})
+        assert not revocation_list.is_revoked({'jti': 'old', 'sub': '1', 'iat': 0})
+
+
+def test_sync_leaves_the_request_session_alone(client):
+    with app.app_context():
+        db.session.add(User(email='pending@example.com', password_hash='x'))
+        revocation_list._next_sync = revocation_list._next_compact = 0
+        assert not revocation_list.is_revoked({'jti': 'nope', 'sub': '1', 'iat': 0})
+        db.session.rollback()
+        assert User.query.count() == 0
+
+
+def test_sync_failure_keeps_the_last_synced_list(client, monkeypatch, caplog):
+    with app.app_context():
+        revocation_list.revoke_token({'jti': 'gone', 'sub': '1', 'exp': time.time() + 3600})
+
+    class Unreachable:
+        @property
+        def engine(self):
+            raise OperationalError('SELECT', {}, Exception('database is down'))
+
+    monkeypatch.setattr(revocation_list, 'db', Unreachable())
+    revocation_list._next_sync = 0
+    assert revocation_list.is_revoked({'jti': 'gone', 'sub': '1', 'iat': 0})
+    assert 'revocation sync failed' in caplog.text
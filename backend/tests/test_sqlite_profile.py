@@ -0,0 +1,59 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+import sqlite_profile
+
+
+def _engine(tmp_path):
+    url = f"sqlite:///{tmp_path / 'profile.db'}"
+    return create_engine(url, **sqlite_profile.engine_options(url))
+
+
+def test_pragmas_applied_on_every_connection(tmp_path, monkeypatch):
+    monkeypatch.setenv('SQLITE_BUSY_TIMEOUT_MS', '1234')
+    engine = _engine(tmp_path)
+    with engine.connect() as conn:
+        assert conn.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+        assert conn.execute(text('PRAGMA synchronous')).scalar() == 1  # NORMAL
+        assert conn.execute(text('PRAGMA busy_timeout')).scalar() == 1234
+        assert conn.execute(text('PRAGMA cache_size')).scalar() == -16000
+        assert conn.execute(text('PRAGMA temp_store')).scalar() == 2  # MEMORY
+    assert engine.pool.size() == 10
+    engine.dispose()
+
+
+def test_memory_urls_keep_default_pool():
+    options = sqlite_profile.engine_options('sqlite:///:memory:')
+    assert 'pool_size' not in options
+    assert options['connect_args']['check_same_thread'] is False
+
+
+def test_wal_lets_readers_run_during_a_write(tmp_path):
+    engine = _engine(tmp_path)
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT)'))
+        conn.execute(text("INSERT INTO t (v) VALUES ('before')"))
+    with engine.connect() as writer, engine.connect() as reader:
+        tx = writer.begin()
+        writer.execute(text("UPDATE t SET v = 'after'"))
+        # the uncommitted write neither blocks nor leaks into the reader
+        assert reader.execute(text('SELECT v FROM t')).scalar() == 'before'
+        tx.commit()
+    engine.dispose()
+
+
+def test_begin_immediate_takes_write_lock_up_front(tmp_path, monkeypatch):
+    monkeypatch.setenv('SQLITE_BEGIN_MODE', 'immediate')
+    monkeypatch.setenv('SQLITE_BUSY_TIMEOUT_MS', '50')
+    engine = _engine(tmp_path)
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE t (id INTEGER PRIMARY KEY)'))
+    with engine.connect() as first, engine.connect() as second:
+        first.begin()
+        first.execute(text('SELECT count(*) FROM t')).scalar()
+        with pytest.raises(OperationalError, match='locked'):
+            second.begin()
+            second.execute(text('SELECT count(*) FROM t'))
+        first.rollback()
+    engine.dispose()
@@ -0,0 +1,48 @@
+import pytest
+
+from app import ALLOWED_CATEGORIES, db, Listing, Review, SignUp
+from synthetic_data import METROS, SyntheticData, parse_metros
+
+
+def test_same_seed_same_rows():
+    owners = list(range(1, 101))
+    first = list(SyntheticData(seed=3).listings(200, 1, owners))
+    assert first == list(SyntheticData(seed=3).listings(200, 1, owners))
+    assert first != list(SyntheticData(seed=4).listings(200, 1, owners))
+
+
+def test_listings_are_realistic():
+    generator = SyntheticData(metros=parse_metros('houston,Tulsa:ok:36.15:-95.99:1.0'))
+    rows = list(generator.listings(2000, 1, list(range(1, 1001))))
+    assert {row["category"] for row in rows} == set(ALLOWED_CATEGORIES)
+    for row in rows:
+        metro = next(m for m in generator.metros if row["location"] == f"{m.name}, {m.state}")
+        assert abs(row["latitude"] - metro.latitude) < 1 and abs(row["longitude"] - metro.longitude) < 1
+    assert sum(row["location"] == 'Houston, TX' for row in rows) > sum(row["location"] == 'Tulsa, OK' for row in rows)
+    lengths = sorted(len(row["description"].split()) for row in rows)
+    assert lengths[0] < 20 and lengths[-1] > 150
+    # a few organizations own every listing
+    assert len({row["owner_id"] for row in rows}) <= 50
+
+
+def test_load(client):
+    generator = SyntheticData(seed=1, metros=[METROS['austin']], password='s3cret')
+    counts = generator.load(db.session, 50, 300, signups_per_listing=3, reviews_per_listing=1)
+    assert counts["user"] == 50 and counts["listing"] == 300
+    assert db.session.query(SignUp).count() == counts["sign_up"] > 300
+    assert 0 < db.session.query(Review).count() == counts["review"] < counts["sign_up"]
+    assert all(1 <= review.rating <= 5 for review in db.session.query(Review))
+    assert db.session.query(Listing).filter(Listing.location != 'Austin, TX').count() == 0
+
+    # every user shares the one precomputed hash
+    resp = client.post('/login', json={"email": 'user50@example.com', "password": 's3cret'})
+    assert resp.status_code == 200
+
+    # a second load continues the ids instead of colliding with the first
+    more = generator.load(db.session, 10, 20)
+    assert more["user"] == 10 and db.session.query(Listing).count() == 320
+
+
+def test_parse_metros_rejects_unknown():
+    with pytest.raises(ValueError):
+        parse_metros('atlantis')
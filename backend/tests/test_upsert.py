@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+import app as app_module
+from app import app, db, Listing, LISTING_IMPORT_FIELDS
+from upsert import content_hash, upsert_by_external_id
+
+
+def _row(ext_id, title, source='ticketmaster'):
+    data = {"title": title, "location": "Toyota Center"}
+    return {
+        "source": source,
+        "external_id": ext_id,
+        "content_hash": content_hash(data, ('title', 'location')),
+        "title": title,
+        "description": f"Event URL: https://example.com/{ext_id}",
+        "location": "Toyota Center",
+        "latitude": None,
+        "longitude": None,
+        "category": "Community",
+        "image_url": None,
+        "owner_id": None,
+    }
+
+
+def test_upsert_skips_unchanged_and_updates_changed(client):
+    with app.app_context():
+        result = upsert_by_external_id(db.session, Listing, [_row('1', 'A'), _row('2', 'B')], LISTING_IMPORT_FIELDS)
+        db.session.commit()
+        assert result == {"created": 2, "updated": 0, "unchanged": 0}
+
+        created = []
+        result = upsert_by_external_id(db.session, Listing, [_row('1', 'A'), _row('2', 'B2'), _row('3', 'C')],
+                                       LISTING_IMPORT_FIELDS, created=created)
+        db.session.commit()
+        assert result == {"created": 1, "updated": 1, "unchanged": 1}
+        assert [row["title"] for row in created] == ['C']
+
+        assert Listing.query.count() == 3
+        updated = Listing.query.filter_by(source='ticketmaster', external_id='2').one()
+        assert updated.title == 'B2'
+        assert updated.created_at is not None
+
+
+def test_same_external_id_from_different_sources_is_distinct(client):
+    with app.app_context():
+        upsert_by_external_id(db.session, Listing, [_row('1', 'A'), _row('1', 'A', source='seatgeek')],
+                              LISTING_IMPORT_FIELDS)
+        db.session.commit()
+        assert Listing.query.count() == 2
+
+
+class _Ctx:
+    def update(self, progress=None, **counts):
+        pass
+
+
+def test_populate_listings_samples_only_new_rows(client, monkeypatch):
+    start = datetime.utcnow() + timedelta(days=3)
+    events = [{"source": 'ticketmaster', "external_id": str(i), "name": f'Concert {i}', "city": 'houston',
+               "state": 'TX', "category": 'music', "start_at": start} for i in range(3)]
+    monkeypatch.setattr(app_module, 'collect_events', lambda cities, categories: (events, {}, {}))
+    monkeypatch.setattr(app_module, 'store_events', lambda events: None)
+    with app.app_context():
+        first = app_module.populate_listings_job(_Ctx())
+        assert first["created"] == 3 and len(first["sample_created"]) == 3
+
+        events[1] = dict(events[1], name='Concert 1 (moved)')
+        events.append(dict(events[0], external_id='3', name='Concert 3'))
+        second = app_module.populate_listings_job(_Ctx())
+        assert (second["created"], second["updated"], second["unchanged"]) == (1, 1, 2)
+        assert second["sample_created"] == ['Concert 3']
@@ -0,0 +1,151 @@
+import json
+import threading
+import time
+
+import pytest
+import requests
+
+import circuit_breaker
+import llm
+import providers
+import upstream_replay
+from upstream_replay import FixtureMissing, InjectedFault
+
+REAL_GET = requests.get
+TM_PAGE = {"_embedded": {"events": [{"id": 'tm-1', "name": 'Concert'}]}, "page": {"number": 0, "totalPages": 1}}
+
+
+def fake_response(status, payload):
+    resp = requests.Response()
+    resp.status_code = status
+    resp._content = json.dumps(payload).encode()
+    resp.headers['Content-Type'] = 'application/json'
+    return resp
+
+
+class FakeModel:
+    model_name = 'models/fake'
+
+    def __init__(self, text=None):
+        self.text = text
+        self.calls = 0
+
+    def generate_content(self, prompt, **kwargs):
+        self.calls += 1
+        if self.text is None:
+            raise AssertionError('replay must not call the model')
+        return upstream_replay.ReplayedReply(self.text)
+
+
+@pytest.fixture(autouse=True)
+def fixtures_dir(tmp_path, monkeypatch, client):
+    monkeypatch.setenv('UPSTREAM_FIXTURES', str(tmp_path))
+    monkeypatch.setenv('UPSTREAM_LATENCY_MS', '0')
+    upstream_replay.reset()
+    circuit_breaker._breakers.clear()
+    providers.response_cache.clear()
+    yield tmp_path
+    upstream_replay.reset()
+    circuit_breaker._breakers.clear()
+    providers.response_cache.clear()
+
+
+def record_ticketmaster(monkeypatch, payload=TM_PAGE):
+    monkeypatch.setenv('UPSTREAM_MODE', 'record')
+    monkeypatch.setattr(requests, 'get', lambda url, params=None, timeout=None: fake_response(200, payload))
+    providers.fetch_ticketmaster_page('secret-key', 'Houston', 'TX')
+
+
+def no_network(*args, **kwargs):
+    raise AssertionError('replay must not touch the network')
+
+
+def test_record_then_replay_with_another_key(monkeypatch, fixtures_dir):
+    record_ticketmaster(monkeypatch)
+    [path] = (fixtures_dir / 'ticketmaster').iterdir()
+    assert 'secret-key' not in path.read_text()
+
+    monkeypatch.setenv('UPSTREAM_MODE', 'replay')
+    monkeypatch.setattr(requests, 'get', no_network)
+    upstream_replay.reset()
+    events, has_more = providers.fetch_ticketmaster_page('other-key', 'Houston', 'TX')
+    assert [e["id"] for e in events] == ['tm-1'] and not has_more
+
+    with pytest.raises(FixtureMissing):
+        providers.fetch_ticketmaster_page('other-key', 'Austin', 'TX')
+    monkeypatch.setenv('UPSTREAM_REPLAY_MISS', 'nearest')
+    events, _ = providers.fetch_ticketmaster_page('other-key', 'Austin', 'TX')
+    assert [e["id"] for e in events] == ['tm-1']
+
+
+def test_injected_errors_are_deterministic_and_trip_the_breaker(monkeypatch):
+    record_ticketmaster(monkeypatch)
+    monkeypatch.setenv('UPSTREAM_MODE', 'replay')
+    monkeypatch.setattr(requests, 'get', no_network)
+    monkeypatch.setenv('UPSTREAM_ERROR_RATE', 'seatgeek=0,0.5')
+
+    request = upstream_replay.http_request(providers.TICKETMASTER_URL, {"city": 'Houston'})
+    first = [upstream_replay.plan('ticketmaster', request)[1] for _ in range(20)]
+    upstream_replay.reset()
+    assert [upstream_replay.plan('ticketmaster', request)[1] for _ in range(20)] == first
+    assert set(first) == {None, '503'}
+    assert upstream_replay.plan('seatgeek', request)[1] is None
+
+    monkeypatch.setenv('UPSTREAM_ERROR_RATE', '1')
+    circuit_breaker._breakers.clear()
+    for _ in range(5):
+        with pytest.raises(requests.exceptions.HTTPError):
+            providers.fetch_ticketmaster_page('k', 'Houston', 'TX')
+    with pytest.raises(providers.ProviderUnavailable):
+        providers.fetch_ticketmaster_page('k', 'Houston', 'TX')
+
+
+def test_injected_latency(monkeypatch):
+    record_ticketmaster(monkeypatch)
+    monkeypatch.setenv('UPSTREAM_MODE', 'replay')
+    monkeypatch.setenv('UPSTREAM_LATENCY_MS', 'ticketmaster=60-80,0')
+    started = time.perf_counter()
+    providers.fetch_ticketmaster_page('k', 'Houston', 'TX')
+    assert time.perf_counter() - started >= 0.06
+
+
+def test_gemini_record_and_replay(monkeypatch):
+    monkeypatch.setenv('UPSTREAM_MODE', 'record')
+    recorded = FakeModel('["music", "sports", "family"]')
+    assert llm.generate(recorded, 'Which categories?', generation_config=llm.JSON_CONFIG).text == recorded.text
+
+    monkeypatch.setenv('UPSTREAM_MODE', 'replay')
+    upstream_replay.reset()
+    model = FakeModel()
+    assert llm.generate(model, 'Which categories?', generation_config=llm.JSON_CONFIG).text == recorded.text
+    with pytest.raises(FixtureMissing):
+        llm.generate(model, 'Which categories? (today)', generation_config=llm.JSON_CONFIG)
+
+    monkeypatch.setenv('UPSTREAM_ERROR_RATE', 'gemini=1')
+    with pytest.raises(InjectedFault):
+        llm.generate(model, 'Which categories?', generation_config=llm.JSON_CONFIG)
+    assert model.calls == 0
+
+
+def test_fake_provider_server(monkeypatch):
+    record_ticketmaster(monkeypatch)
+    monkeypatch.setenv('UPSTREAM_MODE', 'live')
+    monkeypatch.setattr(requests, 'get', REAL_GET)
+    server = upstream_replay.make_server(port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        monkeypatch.setenv('UPSTREAM_URL', f'http://127.0.0.1:{server.server_port}')
+        events, _ = providers.fetch_ticketmaster_page('k', 'Houston', 'TX')
+        assert [e["id"] for e in events] == ['tm-1']
+
+        monkeypatch.setenv('UPSTREAM_ERROR_RATE', '1')
+        monkeypatch.setenv('UPSTREAM_ERROR', '429')
+        # served from the response cache, as for a real 429
+        events, _ = providers.fetch_ticketmaster_page('k', 'Houston', 'TX')
+        assert [e["id"] for e in events] == ['tm-1']
+        providers.response_cache.clear()
+        with pytest.raises(providers.ProviderRateLimited):
+            providers.fetch_ticketmaster_page('k', 'Houston', 'TX')
+    finally:
+        server.shutdown()
+        server.server_close()
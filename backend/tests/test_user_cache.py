@@ -0,0 +1,68 @@
+from sqlalchemy import event
+
+from app import app, db, User, user_cache
+from auth import refresh_for, token_for
+from user_cache import UserCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_and_evict_oldest():
+    clock = FakeClock()
+    cache = UserCache(ttl=10, max_entries=2, clock=clock)
+    cache.set('1', 'a')
+    cache.set('2', 'b')
+    assert cache.get('1') == 'a'
+    cache.set('3', 'c')  # '2' is least recently used
+    assert cache.get('2') is None
+    clock.now = 11
+    assert cache.get('1') is None
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 2}
+
+
+def _count_queries():
+    counter = {"n": 0}
+
+    def before(*args):
+        counter["n"] += 1
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before)
+    return counter, lambda: event.remove(engine, 'before_cursor_execute', before)
+
+
+def test_me_and_refresh_skip_database_when_cached(client, create_user):
+    user_id = create_user('cached@example.com')
+    access = {'Authorization': f'Bearer {token_for(user_id)}'}
+    refresh = {'Authorization': f'Bearer {refresh_for(user_id)}'}
+    assert client.get('/me', headers=access).get_json()["user"]["email"] == 'cached@example.com'
+
+    counter, stop = _count_queries()
+    try:
+        assert client.get('/me', headers=access).status_code == 200
+        assert client.post('/refresh', headers=refresh).status_code == 200
+    finally:
+        stop()
+    assert counter["n"] == 0
+
+
+def test_user_update_invalidates_entry(client, create_user):
+    user_id = create_user('before@example.com')
+    headers = {'Authorization': f'Bearer {token_for(user_id)}'}
+    assert client.get('/me', headers=headers).get_json()["user"]["email"] == 'before@example.com'
+
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        user.email = 'after@example.com'
+        user.role = 'admin'
+        db.session.commit()
+
+    assert client.get('/me', headers=headers).get_json()["user"]["email"] == 'after@example.com'
+    assert user_cache.get(str(user_id))["role"] == 'admin'
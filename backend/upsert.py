@@ -0,0 +1,115 @@
+"""Bulk upserts keyed on (source, external_id) with content-hash change detection.
+
+Rows imported from external providers carry a ``source`` (e.g. "ticketmaster"),
+the provider's ``external_id`` and a ``content_hash`` of the upstream fields
+they were built from. ``upsert_by_external_id`` looks up the stored hashes for
+a whole batch in one query per chunk, drops rows whose content is unchanged
+and writes the rest with a single native ``INSERT ... ON CONFLICT DO UPDATE``
+(SQLite and PostgreSQL), so re-ingesting a city is cheap and never duplicates.
+"""
+import hashlib
+import json
+from datetime import date, datetime
+
+
+CHUNK_SIZE = 500
+
+
+def _jsonable(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def content_hash(data, fields):
+    """Stable SHA-256 of ``data``'s values for ``fields`` (order-sensitive)."""
+    payload = [_jsonable(data.get(f)) for f in fields]
+    return hashlib.sha256(
+        json.dumps(payload, separators=(',', ':'), default=str).encode('utf-8')
+    ).hexdigest()
+
+
+def existing_hashes(session, model, source, external_ids, chunk_size=CHUNK_SIZE):
+    """Return {external_id: content_hash} for rows of ``source`` that already exist."""
+    found = {}
+    ids = list(external_ids)
+    for i in range(0, len(ids), chunk_size):
+        chunk = ids[i:i + chunk_size]
+        rows = session.query(model.external_id, model.content_hash).filter(
+            model.source == source, model.external_id.in_(chunk)
+        )
+        found.update({ext_id: h for ext_id, h in rows})
+    return found
+
+
+def _dialect_insert(dialect_name):
+    if dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
+
+
+def _native_upsert(session, model, rows, update_fields, chunk_size=CHUNK_SIZE):
+    table = model.__table__
+    insert = _dialect_insert(session.get_bind().dialect.name)
+    if insert is None:
+        # Portable fallback for other backends: ORM lookup per row
+        for row in rows:
+            obj = session.query(model).filter_by(source=row['source'], external_id=row['external_id']).first()
+            if obj is None:
+                session.add(model(**row))
+            else:
+                for f in update_fields:
+                    setattr(obj, f, row.get(f))
+        return
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['source', 'external_id'],
+        set_={f: stmt.excluded[f] for f in update_fields},
+    )
+    for i in range(0, len(rows), chunk_size):
+        session.execute(stmt, rows[i:i + chunk_size])
+
+
+def upsert_by_external_id(session, model, rows, update_fields, created=None):
+    """Insert new rows and update changed ones; skip rows whose hash is unchanged.
+
+    ``rows`` are column dicts that include ``source``, ``external_id`` and
+    ``content_hash``. Only ``update_fields`` (plus ``content_hash``) are
+    overwritten on conflict. Does not commit. Returns a dict with
+    ``created``, ``updated`` and ``unchanged`` counts; if ``created`` is a
+    list, the newly inserted rows are appended to it.
+    """
+    update_fields = list(dict.fromkeys(list(update_fields) + ['content_hash']))
+    result = {"created": 0, "updated": 0, "unchanged": 0}
+
+    # Last row wins when a batch repeats a key
+    by_source = {}
+    for row in rows:
+        by_source.setdefault(row['source'], {})[row['external_id']] = row
+
+    pending = []
+    for source, batch in by_source.items():
+        stored = existing_hashes(session, model, source, batch.keys())
+        for ext_id, row in batch.items():
+            if ext_id not in stored:
+                result["created"] += 1
+                if created is not None:
+                    created.append(row)
+            elif stored[ext_id] == row['content_hash']:
+                result["unchanged"] += 1
+                continue
+            else:
+                result["updated"] += 1
+            pending.append(row)
+
+    # executemany needs every parameter set in a statement to carry the same keys
+    groups = {}
+    for row in pending:
+        groups.setdefault(frozenset(row), []).append(row)
+    for group in groups.values():
+        _native_upsert(session, model, group, update_fields)
+    return result
@@ -0,0 +1,399 @@
+"""Record and replay calls to the event providers and Gemini.
+
+Every outbound call goes through this module: ``http_get`` for Ticketmaster,
+SeatGeek and SerpApi (from ``providers.provider_get``) and
+``generate_content`` for Gemini (from ``llm.generate``). ``UPSTREAM_MODE``
+picks what happens:
+
+- ``live`` (default): the real call.
+- ``record``: the real call, and the response is saved as a JSON fixture
+  under ``UPSTREAM_FIXTURES`` (default ``fixtures/upstream`` next to this
+  file), one file per distinct request. API keys are left out of the
+  request a fixture is filed under, so fixtures can be committed and
+  replayed with any key.
+- ``replay``: no network. The recorded response is served after an
+  injected delay, or an injected failure instead.
+
+Injection is deterministic: the delay and outcome of the n-th replay of a
+request depend only on ``UPSTREAM_SEED``, the request and n, however
+requests interleave across threads.
+
+- ``UPSTREAM_LATENCY_MS``: ``recorded`` (default, the time the real call
+  took), a number, or a ``min-max`` range drawn uniformly.
+- ``UPSTREAM_ERROR_RATE``: fraction of replays that fail (default 0).
+- ``UPSTREAM_ERROR``: how they fail: an HTTP status (default ``503``),
+  ``timeout`` (waits out the request timeout) or ``connection``. Gemini
+  calls raise ``InjectedFault`` whatever the kind.
+- ``UPSTREAM_REPLAY_MISS``: ``error`` (default) raises ``FixtureMissing``
+  for a request that was never recorded; ``nearest`` serves the recording
+  of the same endpoint (or Gemini model) whose request is most similar.
+
+The three injection settings also take per-provider values, e.g.
+``UPSTREAM_LATENCY_MS=ticketmaster=300-900,gemini=2000,50``.
+
+``python upstream_replay.py serve`` runs the same replay as a local HTTP
+server. With ``UPSTREAM_URL=http://127.0.0.1:8901`` set for the app,
+provider requests go there over real sockets instead of to the internet,
+so connection handling and timeouts are part of what is measured. Gemini
+goes through its SDK and is only replayed in-process.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from http import HTTPStatus
+from urllib.parse import parse_qsl, urlsplit
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'upstream')
+# query parameters that carry credentials (see providers.PROVIDER_KEY_PARAMS)
+SECRET_PARAMS = frozenset({'apikey', 'api_key', 'client_id', 'client_secret', 'key'})
+KEPT_HEADERS = ('Content-Type', 'Retry-After')
+
+
+class FixtureMissing(LookupError):
+    """Replay found no recording for the request."""
+
+    def __init__(self, provider, request):
+        self.provider = provider
+        self.request = request
+        super().__init__(f"no recorded {provider} response for {json.dumps(request, sort_keys=True)[:200]}")
+
+
+class InjectedFault(Exception):
+    """A failure injected into a replayed Gemini call."""
+
+
+def mode():
+    return os.environ.get('UPSTREAM_MODE', 'live').lower()
+
+
+def _setting(name, provider, default):
+    """``NAME`` as a plain value or a ``provider=value,...,fallback`` list."""
+    fallback = default
+    for entry in (e.strip() for e in os.environ.get(name, '').split(',') if e.strip()):
+        label, sep, value = entry.partition('=')
+        if not sep:
+            fallback = entry
+        elif label.strip().lower() == provider:
+            return value.strip()
+    return fallback
+
+
+def http_request(url, params):
+    """The identity of a provider GET: URL and parameters without credentials."""
+    return {"method": 'GET', "url": url,
+            "params": {k: str(v) for k, v in (params or {}).items() if k not in SECRET_PARAMS}}
+
+
+def llm_request(model, prompt, kwargs):
+    return {"model": getattr(model, 'model_name', None) or type(model).__name__, "prompt": prompt,
+            "options": json.loads(json.dumps(kwargs, sort_keys=True, default=str))}
+
+
+def request_key(request):
+    return hashlib.sha256(json.dumps(request, sort_keys=True).encode('utf-8')).hexdigest()[:24]
+
+
+def _endpoint(request):
+    return request.get("url") or request.get("model")
+
+
+def _similarity(a, b):
+    if "prompt" in a:
+        import difflib
+        return difflib.SequenceMatcher(None, a["prompt"], b["prompt"]).ratio()
+    shared = set(a["params"].items()) & set(b["params"].items())
+    return len(shared) / max(1, len(set(a["params"]) | set(b["params"])))
+
+
+class Fixtures:
+    """Recordings in ``directory``, as ``<provider>/<key>.json`` files."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        entries = {}
+        if os.path.isdir(self.directory):
+            for provider in sorted(os.listdir(self.directory)):
+                folder = os.path.join(self.directory, provider)
+                if not os.path.isdir(folder):
+                    continue
+                for name in sorted(os.listdir(folder)):
+                    if name.endswith('.json'):
+                        with open(os.path.join(folder, name)) as f:
+                            entries[(provider, name[:-5])] = json.load(f)
+        return entries
+
+    def entries(self):
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._load()
+            return self._entries
+
+    def find(self, provider, request, nearest=False):
+        entries = self.entries()
+        entry = entries.get((provider, request_key(request)))
+        if entry is not None or not nearest:
+            return entry
+        candidates = [e for (p, _), e in sorted(entries.items())
+                      if p == provider and _endpoint(e["request"]) == _endpoint(request)]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda e: _similarity(request, e["request"]))
+
+    def save(self, provider, request, response, elapsed):
+        entry = {"provider": provider, "request": request, "response": response,
+                 "elapsed_ms": round(elapsed * 1000, 1),
+                 "recorded_at": datetime.now(timezone.utc).isoformat(timespec='seconds')}
+        key = request_key(request)
+        folder = os.path.join(self.directory, provider)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f'{key}.json')
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(entry, f, indent=2, sort_keys=True)
+        os.replace(tmp, path)
+        with self._lock:
+            if self._entries is not None:
+                self._entries[(provider, key)] = entry
+
+
+_fixtures = None
+_fixtures_lock = threading.Lock()
+_replays = Counter()
+_replays_lock = threading.Lock()
+
+
+def get_fixtures():
+    global _fixtures
+    directory = os.environ.get('UPSTREAM_FIXTURES') or DEFAULT_FIXTURES
+    with _fixtures_lock:
+        if _fixtures is None or _fixtures.directory != directory:
+            _fixtures = Fixtures(directory)
+        return _fixtures
+
+
+def reset():
+    """Forget loaded fixtures and replay counts (tests)."""
+    global _fixtures
+    with _fixtures_lock:
+        _fixtures = None
+    with _replays_lock:
+        _replays.clear()
+
+
+def plan(provider, request, recorded_ms=0.0):
+    """(delay in seconds, error kind or None) for the next replay of ``request``."""
+    key = request_key(request)
+    with _replays_lock:
+        _replays[key] += 1
+        n = _replays[key]
+    rnd = random.Random(f"{os.environ.get('UPSTREAM_SEED', '0')}:{key}:{n}")
+    latency = _setting('UPSTREAM_LATENCY_MS', provider, 'recorded')
+    if latency == 'recorded':
+        delay = recorded_ms
+    else:
+        low, _, high = latency.partition('-')
+        delay = rnd.uniform(float(low), float(high or low))
+    error = None
+    if rnd.random() < float(_setting('UPSTREAM_ERROR_RATE', provider, '0')):
+        error = _setting('UPSTREAM_ERROR', provider, '503').lower()
+    return delay / 1000.0, error
+
+
+def _replay(provider, request):
+    """The recorded entry and the planned delay and error for it; raises FixtureMissing."""
+    nearest = os.environ.get('UPSTREAM_REPLAY_MISS', 'error').lower() == 'nearest'
+    entry = get_fixtures().find(provider, request, nearest=nearest)
+    if entry is None:
+        raise FixtureMissing(provider, request)
+    delay, error = plan(provider, request, entry.get("elapsed_ms") or 0.0)
+    return entry, delay, error
+
+
+def _error_body(status):
+    headers = {"Content-Type": 'application/json'}
+    if status == 429:
+        headers["Retry-After"] = '1'
+    return {"status": status, "headers": headers, "json": {"error": f"injected {status}"}}
+
+
+def _body(response):
+    if "json" in response:
+        return json.dumps(response["json"]).encode('utf-8')
+    return (response.get("text") or '').encode('utf-8')
+
+
+# -- providers ---------------------------------------------------------------
+
+def _as_response(recorded, url):
+    import requests
+
+    resp = requests.Response()
+    resp.status_code = recorded["status"]
+    try:
+        resp.reason = HTTPStatus(resp.status_code).phrase
+    except ValueError:
+        resp.reason = ''
+    resp.headers.update(recorded.get("headers") or {})
+    resp._content = _body(recorded)
+    resp.encoding = 'utf-8'
+    resp.url = url
+    return resp
+
+
+def http_get(provider, url, params=None, timeout=None):
+    """``requests.get(url, params=params, timeout=timeout)`` for ``provider`` under UPSTREAM_MODE."""
+    # imported here: requests (with urllib3 and certifi) is the slowest
+    # import of the app and most processes never make an upstream call
+    import requests
+
+    current = mode()
+    if current == 'replay':
+        request = http_request(url, params)
+        entry, delay, error = _replay(provider, request)
+        if error == 'timeout':
+            time.sleep(timeout or 0)
+            raise requests.exceptions.ReadTimeout(f"injected timeout after {timeout} s")
+        time.sleep(delay)
+        if error == 'connection':
+            raise requests.exceptions.ConnectionError('injected connection error')
+        return _as_response(_error_body(int(error)) if error else entry["response"], url)
+
+    target = url
+    base = os.environ.get('UPSTREAM_URL')
+    if base:
+        parts = urlsplit(url)
+        target = f"{base.rstrip('/')}/{parts.netloc}{parts.path}"
+    started = time.perf_counter()
+    resp = requests.get(target, params=params, timeout=timeout)
+    if current == 'record':
+        recorded = {"status": resp.status_code,
+                    "headers": {h: resp.headers[h] for h in KEPT_HEADERS if h in resp.headers}}
+        try:
+            recorded["json"] = resp.json()
+        except ValueError:
+            recorded["text"] = resp.text
+        get_fixtures().save(provider, http_request(url, params), recorded, time.perf_counter() - started)
+    return resp
+
+
+# -- Gemini ------------------------------------------------------------------
+
+class ReplayedReply:
+    """Stands in for a ``GenerateContentResponse``: only ``text`` is used."""
+
+    def __init__(self, text):
+        self.text = text
+
+
+def generate_content(model, prompt, **kwargs):
+    """``model.generate_content(prompt, **kwargs)`` under UPSTREAM_MODE."""
+    current = mode()
+    if current == 'replay':
+        entry, delay, error = _replay('gemini', llm_request(model, prompt, kwargs))
+        time.sleep(delay)
+        if error:
+            raise InjectedFault(f"injected {error}")
+        return ReplayedReply(entry["response"]["text"])
+    started = time.perf_counter()
+    reply = model.generate_content(prompt, **kwargs)
+    if current == 'record':
+        get_fixtures().save('gemini', llm_request(model, prompt, kwargs), {"text": reply.text},
+                            time.perf_counter() - started)
+    return reply
+
+
+# -- fake provider server ----------------------------------------------------
+
+def provider_hosts():
+    from providers import SEATGEEK_URL, SERPAPI_URL, TICKETMASTER_URL
+    return {urlsplit(url).netloc: name for name, url in
+            (('ticketmaster', TICKETMASTER_URL), ('seatgeek', SEATGEEK_URL), ('serpapi', SERPAPI_URL))}
+
+
+def make_server(host='127.0.0.1', port=8901):
+    """A threading HTTP server answering ``GET /<provider host>/<path>?<params>`` from the fixtures."""
+    # imported here so the app does not pay for http.server at startup
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from providers import DEFAULT_TIMEOUT
+
+    hosts = provider_hosts()
+
+    class ReplayHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            host, _, path = parts.path.lstrip('/').partition('/')
+            provider = hosts.get(host)
+            if provider is None:
+                return self._send({"status": 404, "json": {"error": f"unknown provider host {host!r}"}})
+            request = http_request(f'https://{host}/{path}', dict(parse_qsl(parts.query, keep_blank_values=True)))
+            try:
+                entry, delay, error = _replay(provider, request)
+            except FixtureMissing as ex:
+                return self._send({"status": 404, "json": {"error": str(ex)}})
+            if error == 'timeout':
+                # longer than the client's timeout: it gives up first
+                time.sleep(DEFAULT_TIMEOUT + 1)
+                return self._send(_error_body(504))
+            time.sleep(delay)
+            if error == 'connection':
+                self.close_connection = True
+                return
+            self._send(_error_body(int(error)) if error else entry["response"])
+
+        def _send(self, response):
+            body = _body(response)
+            self.send_response(response["status"])
+            for name, value in (response.get("headers") or {}).items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), ReplayHandler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve recorded provider responses over HTTP.')
+    parser.add_argument('command', choices=['serve'])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8901)
+    parser.add_argument('--fixtures', help='fixture directory (default: UPSTREAM_FIXTURES)')
+    parser.add_argument('--latency-ms', help='UPSTREAM_LATENCY_MS for this server')
+    parser.add_argument('--error-rate', help='UPSTREAM_ERROR_RATE for this server')
+    parser.add_argument('--error', help='UPSTREAM_ERROR for this server')
+    parser.add_argument('--miss', choices=['error', 'nearest'], help='UPSTREAM_REPLAY_MISS for this server')
+    args = parser.parse_args()
+    for name, value in (('UPSTREAM_FIXTURES', args.fixtures), ('UPSTREAM_LATENCY_MS', args.latency_ms),
+                        ('UPSTREAM_ERROR_RATE', args.error_rate), ('UPSTREAM_ERROR', args.error),
+                        ('UPSTREAM_REPLAY_MISS', args.miss)):
+        if value is not None:
+            os.environ[name] = value
+    server = make_server(args.host, args.port)
+    fixtures = get_fixtures()
+    print(f"serving {len(fixtures.entries())} recordings from {fixtures.directory} "
+          f"on http://{args.host}:{server.server_port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Per-process cache of user records keyed by JWT identity.
+
+``/me`` and ``/refresh`` run on nearly every page load and only need a
+handful of columns from a row that almost never changes. ``UserCache``
+keeps a small snapshot per identity for ``USER_CACHE_TTL`` seconds
+(default 60). Entries are dropped explicitly whenever the user row is
+updated or deleted in this process; the TTL bounds how long other worker
+processes can serve a stale snapshot.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class UserCache:
+    def __init__(self, ttl=60.0, max_entries=10000, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        """Cached value for ``key``, or None if absent or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= self._clock():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return value
+        with self._lock:
+            self._entries[key] = (value, self._clock() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}